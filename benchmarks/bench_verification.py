@@ -0,0 +1,240 @@
+"""
+Benchmark the Lean verification path against a fake Lean toolchain.
+
+Usage:
+  python benchmarks/bench_verification.py [options]
+
+Description:
+  - Puts `lean`/`lake`/`repl` shims for tests/fixtures/fake_lean.py first on PATH, so LeanRPC's
+    normal toolchain detection is exercised without Mathlib, elan or network access
+  - Runs every variant (file, fail_fast, persistent, pool, async, cached, batch) at each
+    concurrency level over the same deterministic candidate list
+  - Reports calls/sec, p50/p99 per-call latency and CPU use (cores busy, Python + Lean children)
+
+Options:
+  --calls N           Candidates per run (default: 64)
+  --concurrency LIST  Comma-separated concurrency levels (default: 1,2,4,8)
+  --variants LIST     Comma-separated subset of variants (default: all)
+  --import-sec S      Simulated import cost per Lean process (default: 0.2)
+  --elab-sec S        Simulated elaboration cost per command (default: 0.02)
+  --error-rate F      Fraction of candidates that fail (default: 0.5)
+  --timeout-rate F    Fraction of candidates that hang until the timeout (default: 0)
+  --timeout-sec N     LeanRPC timeout in seconds (default: 2)
+  --busy              Spend simulated costs on the CPU instead of sleeping
+  --json PATH         Also write results as JSON
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from qednet.io.async_lean_rpc import AsyncLeanRPC  # noqa: E402
+from qednet.io.lean_pool import LeanPool  # noqa: E402
+from qednet.io.lean_rpc import LeanRPC, StepResult  # noqa: E402
+from qednet.io.verify_cache import VerificationCache  # noqa: E402
+
+FAKE_LEAN = ROOT / "tests" / "fixtures" / "fake_lean.py"
+VARIANTS = ("file", "fail_fast", "persistent", "pool", "async", "cached", "batch")
+GOAL = "True"
+
+
+@dataclass
+class BenchResult:
+    variant: str
+    concurrency: int
+    calls: int
+    wall_sec: float
+    calls_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    cpu_cores: float  # (user + sys CPU of this process and reaped children) / wall
+    invalid: int
+
+
+def install_fake_toolchain(bindir: Path) -> None:
+    """Writes `lean`, `lake` and `repl` shims for the fake and puts them first on PATH."""
+    bindir.mkdir(parents=True, exist_ok=True)
+    for name in ("lean", "lake", "repl"):
+        shim = bindir / name
+        shim.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_LEAN}" "$@"\n', encoding="utf-8")
+        shim.chmod(0o755)
+    os.environ["PATH"] = f"{bindir}{os.pathsep}{os.environ.get('PATH', '')}"
+    os.environ.pop("QEDNET_LEAN_REPL", None)
+
+
+def candidates(n: int, distinct: Optional[int] = None) -> List[str]:
+    distinct = distinct or n
+    return [f"simp -- candidate {i % distinct}" for i in range(n)]
+
+
+def _cpu_seconds() -> float:
+    me = resource.getrusage(resource.RUSAGE_SELF)
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return me.ru_utime + me.ru_stime + kids.ru_utime + kids.ru_stime
+
+
+def _percentile(xs: Sequence[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, max(0, math.ceil(q * len(xs)) - 1))]
+
+
+# ---------------- variants: each returns (per-call latencies in seconds, results) ----------------
+
+def _threaded(make: Callable[[], LeanRPC], scripts: List[str], c: int) -> Tuple[List[float], List[StepResult]]:
+    """One LeanRPC per thread, `c` threads pulling candidates."""
+    rpcs: Dict[int, LeanRPC] = {}
+
+    def one(script: str) -> Tuple[float, StepResult]:
+        rpc = rpcs.setdefault(threading.get_ident(), make())
+        t0 = time.perf_counter()
+        res = rpc.check_tactic(GOAL, script)
+        return time.perf_counter() - t0, res
+
+    try:
+        with ThreadPoolExecutor(max_workers=c) as ex:
+            out = list(ex.map(one, scripts))
+    finally:
+        for rpc in rpcs.values():
+            rpc.close()
+    return [t for t, _ in out], [r for _, r in out]
+
+
+def run_variant(variant: str, scripts: List[str], c: int, timeout_sec: int) -> Tuple[List[float], List[StepResult]]:
+    if variant == "file":
+        return _threaded(lambda: LeanRPC(timeout_sec=timeout_sec), scripts, c)
+    if variant == "fail_fast":
+        return _threaded(lambda: LeanRPC(timeout_sec=timeout_sec, fail_fast=True), scripts, c)
+    if variant == "persistent":
+        return _threaded(lambda: LeanRPC(timeout_sec=timeout_sec, persistent=True), scripts, c)
+    if variant == "cached":
+        cache = VerificationCache()
+        return _threaded(lambda: LeanRPC(timeout_sec=timeout_sec, cache=cache), scripts, c)
+    if variant == "pool":
+        with LeanPool(size=c, timeout_sec=timeout_sec) as pool:
+            res = pool.check_tactics(GOAL, scripts)
+        return [r.elapsed_sec or 0.0 for r in res], res
+    if variant == "async":
+        async def go() -> List[Tuple[float, StepResult]]:
+            rpc = AsyncLeanRPC(timeout_sec=timeout_sec)
+            # Gate outside the call so queueing does not eat into each call's deadline.
+            gate = asyncio.Semaphore(c)
+
+            async def one(script: str) -> Tuple[float, StepResult]:
+                async with gate:
+                    t0 = time.perf_counter()
+                    res = await rpc.check_tactic(GOAL, script)
+                    return time.perf_counter() - t0, res
+
+            return list(await asyncio.gather(*(one(s) for s in scripts)))
+
+        out = asyncio.run(go())
+        return [t for t, _ in out], [r for _, r in out]
+    if variant == "batch":
+        size = math.ceil(len(scripts) / c)
+        chunks = [scripts[i:i + size] for i in range(0, len(scripts), size)]
+        with ThreadPoolExecutor(max_workers=c) as ex:
+            parts = list(ex.map(
+                lambda chunk: LeanRPC(timeout_sec=timeout_sec).check_tactic_batch([(GOAL, s) for s in chunk],
+                                                                                   chunk_size=size),
+                chunks,
+            ))
+        res = [r for part in parts for r in part]
+        return [r.elapsed_sec or 0.0 for r in res], res
+    raise ValueError(f"unknown variant {variant!r}")
+
+
+def bench(
+    variants: Sequence[str] = VARIANTS,
+    levels: Sequence[int] = (1, 2, 4, 8),
+    calls: int = 64,
+    timeout_sec: int = 2,
+) -> List[BenchResult]:
+    """Runs every (variant, level) pair; assumes install_fake_toolchain() and FAKE_LEAN_* are set."""
+    out: List[BenchResult] = []
+    for variant in variants:
+        scripts = candidates(calls, distinct=max(1, calls // 4) if variant == "cached" else None)
+        for c in levels:
+            cpu0, t0 = _cpu_seconds(), time.perf_counter()
+            lat, res = run_variant(variant, scripts, c, timeout_sec)
+            wall = time.perf_counter() - t0
+            cpu = _cpu_seconds() - cpu0
+            out.append(BenchResult(
+                variant=variant,
+                concurrency=c,
+                calls=len(res),
+                wall_sec=wall,
+                calls_per_sec=len(res) / wall if wall > 0 else float("inf"),
+                p50_ms=1000 * statistics.median(lat),
+                p99_ms=1000 * _percentile(lat, 0.99),
+                cpu_cores=cpu / wall if wall > 0 else 0.0,
+                invalid=sum(not r.valid for r in res),
+            ))
+    return out
+
+
+def format_table(rows: List[BenchResult]) -> str:
+    head = f"{'variant':<11} {'conc':>4} {'calls':>5} {'calls/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'cpu':>6} {'bad':>4}"
+    lines = [head, "-" * len(head)]
+    for r in rows:
+        lines.append(
+            f"{r.variant:<11} {r.concurrency:>4} {r.calls:>5} {r.calls_per_sec:>9.1f} "
+            f"{r.p50_ms:>9.1f} {r.p99_ms:>9.1f} {r.cpu_cores:>6.2f} {r.invalid:>4}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark LeanRPC variants against a fake Lean toolchain.")
+    ap.add_argument("--calls", type=int, default=64)
+    ap.add_argument("--concurrency", default="1,2,4,8")
+    ap.add_argument("--variants", default=",".join(VARIANTS))
+    ap.add_argument("--import-sec", type=float, default=0.2)
+    ap.add_argument("--elab-sec", type=float, default=0.02)
+    ap.add_argument("--error-rate", type=float, default=0.5)
+    ap.add_argument("--timeout-rate", type=float, default=0.0)
+    ap.add_argument("--timeout-sec", type=int, default=2)
+    ap.add_argument("--busy", action="store_true")
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    os.environ.update({
+        "FAKE_LEAN_IMPORT_SEC": str(args.import_sec),
+        "FAKE_LEAN_ELAB_SEC": str(args.elab_sec),
+        "FAKE_LEAN_ERROR_RATE": str(args.error_rate),
+        "FAKE_LEAN_TIMEOUT_RATE": str(args.timeout_rate),
+        "FAKE_LEAN_BUSY": "1" if args.busy else "0",
+    })
+    with tempfile.TemporaryDirectory(prefix="qednet_fake_lean_") as tmp:
+        install_fake_toolchain(Path(tmp))
+        rows = bench(
+            variants=[v.strip() for v in args.variants.split(",") if v.strip()],
+            levels=[int(x) for x in args.concurrency.split(",") if x.strip()],
+            calls=args.calls,
+            timeout_sec=args.timeout_sec,
+        )
+
+    print(format_table(rows))
+    if args.json:
+        Path(args.json).write_text(json.dumps([asdict(r) for r in rows], indent=2), encoding="utf-8")
+        print(f"[done] wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
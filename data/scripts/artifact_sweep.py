@@ -0,0 +1,281 @@
+"""
+Artifact sweep engine for export_mathlib4_statements_traces.py.
+
+Finds declaration-shaped rows (see maybe_decl) in LeanDojo *.json/*.jsonl artifacts:
+  - .json is parsed incrementally: top-level arrays (and the arrays inside a top-level
+    object) are decoded one element at a time with JSONDecoder.raw_decode over a growing
+    read buffer, so a multi-GB artifact never exists as one Python object
+  - .jsonl is parsed line by line; malformed lines are counted, not fatal
+  - files fan out over a process (or thread) pool; results come back in input order
+  - every file gets a timing, and every skipped file a reason (SweepStats)
+"""
+
+from __future__ import annotations
+import json, time
+from collections import Counter, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Callable, IO, Iterable, Iterator
+
+
+# Top-level object keys whose arrays hold declaration rows (same order as the legacy sweep).
+CONTAINERS = ("decls", "constants", "items", "rows")
+# Keys maybe_decl reads from a top-level object; arrays under these are kept whole.
+DECL_KEYS = ("full_name", "name", "decl_name", "constant", "type", "ty", "signature", "kind", "k", "decl_kind", "declType")
+
+_CHUNK = 1 << 20
+_WS = " \t\r\n"
+
+
+def maybe_decl(obj) -> dict | None:
+  """Declaration-shaped row from an artifact object, or None."""
+  if not isinstance(obj, dict):
+    return None
+  # Try common key variants LeanDojo/artifacts use
+  full = obj.get("full_name") or obj.get("name") or obj.get("decl_name") or obj.get("constant")
+  typ  = obj.get("type") or obj.get("ty") or obj.get("signature")
+  kind = obj.get("kind") or obj.get("k") or obj.get("decl_kind") or obj.get("declType")
+  if isinstance(full, str) and (typ is not None or kind is not None):
+    return {"full_name": full, "type": typ, "kind": kind}
+  return None
+
+
+@dataclass
+class FileResult:
+  path: Path
+  rows: list[dict]
+  seconds: float = 0.0
+  skipped: str | None = None  # reason, when the file yielded nothing usable
+  bad_lines: int = 0
+  cached: bool = False
+
+
+@dataclass
+class SweepStats:
+  files: int = 0
+  cached: int = 0
+  rows: int = 0
+  bad_lines: int = 0
+  seconds: float = 0.0
+  skipped: Counter = field(default_factory=Counter)
+  timings: list[tuple[str, float]] = field(default_factory=list)
+
+  def add(self, res: FileResult):
+    self.files += 1
+    self.cached += res.cached
+    self.rows += len(res.rows)
+    self.bad_lines += res.bad_lines
+    if res.skipped:
+      self.skipped[res.skipped] += 1
+    if not res.cached:
+      self.seconds += res.seconds
+      self.timings.append((str(res.path), res.seconds))
+
+  def summary(self, top: int = 5) -> str:
+    slow = ", ".join(f"{Path(p).name}={s:.2f}s" for p, s in sorted(self.timings, key=lambda t: -t[1])[:top])
+    skipped = ", ".join(f"{k}={v}" for k, v in sorted(self.skipped.items())) or "none"
+    return (
+      f"files={self.files} (cached {self.cached}) rows={self.rows} bad_lines={self.bad_lines} "
+      f"parse={self.seconds:.1f}s skipped: {skipped}; slowest: {slow or '-'}"
+    )
+
+
+# ---------------- incremental JSON ----------------
+
+class _Stream:
+  """raw_decode over a file read in growing chunks; values are decoded one at a time."""
+
+  def __init__(self, f: IO[str]):
+    self.f = f
+    self.buf = ""
+    self.pos = 0
+    self.eof = False
+    self.dec = json.JSONDecoder()
+
+  def _fill(self, want: int = _CHUNK) -> bool:
+    if self.eof:
+      return False
+    if self.pos:
+      self.buf, self.pos = self.buf[self.pos:], 0
+    data = self.f.read(max(want, _CHUNK))
+    if not data:
+      self.eof = True
+      return False
+    self.buf += data
+    return True
+
+  def peek(self) -> str:
+    while True:
+      while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+        self.pos += 1
+      if self.pos < len(self.buf):
+        return self.buf[self.pos]
+      if not self._fill():
+        return ""
+
+  def expect(self, ch: str):
+    if self.peek() != ch:
+      raise json.JSONDecodeError(f"Expecting {ch!r}", self.buf, self.pos)
+    self.pos += 1
+
+  def value(self):
+    self.peek()
+    while True:
+      try:
+        obj, end = self.dec.raw_decode(self.buf, self.pos)
+      except json.JSONDecodeError:
+        # Most likely the value runs past the buffer: double it (amortized linear) and retry.
+        if not self._fill(len(self.buf)):
+          raise
+        continue
+      # A number/literal ending exactly at the buffer edge may continue in the next chunk.
+      if end == len(self.buf) and not self.eof and self._fill():
+        continue
+      self.pos = end
+      return obj
+
+  def array(self) -> Iterator:
+    """Elements of the array starting at the current position."""
+    self.expect("[")
+    if self.peek() == "]":
+      self.pos += 1
+      return
+    while True:
+      yield self.value()
+      ch = self.peek()
+      self.pos += 1
+      if ch == "]":
+        return
+      if ch != ",":
+        raise json.JSONDecodeError("Expecting ',' delimiter", self.buf, self.pos - 1)
+
+
+def iter_json_rows(f: IO[str], decl: Callable = maybe_decl) -> Iterator[dict]:
+  """
+  Declaration rows of one .json artifact, in the legacy order: array elements; or for a
+  top-level object, rows from CONTAINERS (in that key order) then the object itself.
+  Only declaration rows are buffered, never the artifact.
+  """
+  s = _Stream(f)
+  ch = s.peek()
+  if ch == "[":
+    for item in s.array():
+      row = decl(item)
+      if row is not None:
+        yield row
+  elif ch == "{":
+    s.pos += 1
+    head: dict = {}
+    found: dict[str, list[dict]] = {}
+    if s.peek() == "}":
+      s.pos += 1
+    else:
+      while True:
+        key = s.value()
+        s.expect(":")
+        if s.peek() == "[" and key not in DECL_KEYS:
+          rows = found.setdefault(key, []) if key in CONTAINERS else None
+          for item in s.array():
+            row = decl(item) if rows is not None else None
+            if row is not None:
+              rows.append(row)
+        else:
+          head[key] = s.value()
+        ch = s.peek()
+        s.pos += 1
+        if ch == "}":
+          break
+        if ch != ",":
+          raise json.JSONDecodeError("Expecting ',' delimiter", s.buf, s.pos - 1)
+    for key in CONTAINERS:
+      yield from found.get(key, ())
+    row = decl(head)
+    if row is not None:
+      yield row
+  else:
+    s.value()  # scalar document: valid JSON, no rows (an empty file raises like json.load)
+  if s.peek():
+    raise json.JSONDecodeError("Extra data", s.buf, s.pos)
+
+
+def sweep_file(path: Path, decl: Callable = maybe_decl) -> FileResult:
+  """Rows of one artifact plus timing; parse failures become a skip reason, not an exception."""
+  t0 = time.perf_counter()
+  res = FileResult(path=path, rows=[])
+  try:
+    with path.open("r", encoding="utf-8") as f:
+      if path.suffix.lower() == ".jsonl":
+        for line in f:
+          line = line.strip()
+          if not line:
+            continue
+          try:
+            row = decl(json.loads(line))
+          except json.JSONDecodeError:
+            res.bad_lines += 1
+            continue
+          if row is not None:
+            res.rows.append(row)
+      else:
+        res.rows.extend(iter_json_rows(f, decl))
+  except json.JSONDecodeError:
+    res.rows, res.skipped = [], "invalid_json"
+  except UnicodeDecodeError:
+    res.rows, res.skipped = [], "not_utf8"
+  except OSError as e:
+    res.rows, res.skipped = [], f"unreadable:{type(e).__name__}"
+  res.seconds = time.perf_counter() - t0
+  return res
+
+
+# ---------------- engine ----------------
+
+def find_artifacts(root: Path, suffixes: tuple[str, ...] = (".json", ".jsonl")) -> Iterator[Path]:
+  for p in root.rglob("*"):
+    if p.suffix.lower() in suffixes and p.is_file():
+      yield p
+
+
+class ArtifactSweep:
+  """
+  Sweeps many artifacts over a pool; run() yields FileResults in input order.
+    workers <= 1      -> inline (no pool)
+    executor="process" (default; JSON parsing holds the GIL) or "thread"
+  `cached(path)` may return rows for a path, which then skips parsing entirely.
+  """
+
+  def __init__(self, workers: int = 1, executor: str = "process", window: int = 4):
+    self.workers = max(1, workers)
+    self.executor = executor
+    self.window = max(1, window) * self.workers
+    self.stats = SweepStats()
+
+  def run(self, paths: Iterable[Path], cached: Callable[[Path], list[dict] | None] | None = None) -> Iterator[FileResult]:
+    pool: Executor | None = None
+    if self.workers > 1:
+      pool = (ProcessPoolExecutor if self.executor == "process" else ThreadPoolExecutor)(max_workers=self.workers)
+
+    def start(p: Path):
+      rows = cached(p) if cached is not None else None
+      if rows is not None:
+        return FileResult(path=p, rows=rows, cached=True)
+      return sweep_file(p) if pool is None else pool.submit(sweep_file, p)
+
+    try:
+      pending: deque = deque()
+      todo = iter(paths)
+      for p in islice(todo, self.window):
+        pending.append(start(p))
+      while pending:
+        res = pending.popleft()
+        if isinstance(res, Future):
+          res = res.result()
+        for p in islice(todo, 1):
+          pending.append(start(p))
+        self.stats.add(res)
+        yield res
+    finally:
+      if pool is not None:
+        pool.shutdown(cancel_futures=True)
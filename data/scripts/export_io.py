@@ -0,0 +1,228 @@
+"""
+Output writers and the incremental cache for export_mathlib4_statements_traces.py.
+
+Two formats share one interface (add(kind, record) ... finish(meta)):
+  - JsonPayloadWriter: the original single JSON file {"statements", "traces", "meta"}
+  - ShardedJsonlWriter: one record per line, rolled into numbered shards per kind
+    (<out_dir>/<kind>-00000.jsonl[.gz]) plus a small manifest.json holding meta/counts,
+    so peak memory does not grow with the corpus
+
+ExportCache keeps per-file fingerprints and extracted records between runs (--incremental).
+"""
+
+from __future__ import annotations
+import gzip, hashlib, json
+from pathlib import Path
+from typing import IO, Iterator
+
+
+MANIFEST = "manifest.json"
+
+
+class JsonPayloadWriter:
+  """Buffers everything and writes the legacy single-file payload on finish()."""
+
+  def __init__(self, out: Path):
+    self.out = out
+    self.records: dict[str, list[dict]] = {"statements": [], "traces": []}
+
+  def add(self, kind: str, rec: dict):
+    self.records.setdefault(kind, []).append(rec)
+
+  def counts(self) -> dict[str, int]:
+    return {k: len(v) for k, v in self.records.items()}
+
+  def finish(self, meta: dict) -> Path:
+    payload = {**self.records, "meta": {**meta, "counts": self.counts()}}
+    with self.out.open("w", encoding="utf-8") as f:
+      json.dump(payload, f, ensure_ascii=False, indent=2)
+    return self.out
+
+
+class ShardedJsonlWriter:
+  """Streams records to <out_dir>/<kind>-NNNNN.jsonl[.gz], `shard_size` records per shard."""
+
+  def __init__(self, out_dir: Path, shard_size: int = 50_000, compress: bool = True):
+    self.out_dir = out_dir
+    self.shard_size = max(1, shard_size)
+    self.compress = compress
+    self.out_dir.mkdir(parents=True, exist_ok=True)
+    self._open: dict[str, IO[str]] = {}
+    self._in_shard: dict[str, int] = {}
+    self._counts: dict[str, int] = {}
+    self.shards: dict[str, list[str]] = {}
+
+  def add(self, kind: str, rec: dict):
+    f = self._open.get(kind)
+    if f is None or self._in_shard[kind] >= self.shard_size:
+      f = self._roll(kind)
+    f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+    f.write("\n")
+    self._in_shard[kind] += 1
+    self._counts[kind] = self._counts.get(kind, 0) + 1
+
+  def counts(self) -> dict[str, int]:
+    return dict(self._counts)
+
+  def finish(self, meta: dict) -> Path:
+    for f in self._open.values():
+      f.close()
+    self._open.clear()
+    manifest = {
+      **meta,
+      "format": "jsonl",
+      "compression": "gzip" if self.compress else None,
+      "counts": {k: self._counts.get(k, 0) for k in ("statements", "traces")} | self._counts,
+      "shards": self.shards,
+    }
+    path = self.out_dir / MANIFEST
+    path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+  def _roll(self, kind: str) -> IO[str]:
+    old = self._open.pop(kind, None)
+    if old is not None:
+      old.close()
+    names = self.shards.setdefault(kind, [])
+    name = f"{kind}-{len(names):05d}.jsonl" + (".gz" if self.compress else "")
+    names.append(name)
+    path = self.out_dir / name
+    if self.compress:
+      f = gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    else:
+      f = path.open("w", encoding="utf-8")
+    self._open[kind] = f
+    self._in_shard[kind] = 0
+    return f
+
+
+def read_shards(out_dir: Path, kind: str) -> Iterator[dict]:
+  """Yields the records of one kind from a sharded export, in write order."""
+  manifest = json.loads((out_dir / MANIFEST).read_text(encoding="utf-8"))
+  for name in manifest["shards"].get(kind, []):
+    path = out_dir / name
+    opener = gzip.open if name.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+      for line in f:
+        if line.strip():
+          yield json.loads(line)
+
+
+class ExportCache:
+  """
+  Fingerprints + extracted records from previous exports, for --incremental runs.
+
+  <root>/index.json maps
+    - source files  -> {"key": fingerprint, "blob": file holding that file's trace records}
+    - artifact files -> {"sha256": content hash, "blob": file holding its declaration rows}
+  plus a stat table (size, mtime_ns -> sha256) so unchanged files are not even re-read.
+  A different `salt` (toolchain / dependency revisions, export version) discards everything.
+  """
+
+  VERSION = 1
+
+  def __init__(self, root: Path, salt: str):
+    self.root = root
+    self.salt = salt
+    self.reused = 0
+    self.refreshed = 0
+    (root / "blobs").mkdir(parents=True, exist_ok=True)
+    index = {}
+    path = root / "index.json"
+    if path.exists():
+      index = json.loads(path.read_text(encoding="utf-8"))
+    if index.get("version") != self.VERSION or index.get("salt") != salt:
+      index = {}
+    self._stats: dict[str, list] = index.get("stats", {})
+    self._sources: dict[str, dict] = index.get("sources", {})
+    self._artifacts: dict[str, dict] = index.get("artifacts", {})
+    self._seen_sources: set[str] = set()
+    self._seen_artifacts: set[str] = set()
+    self._digested: set[str] = set()
+
+  def digest(self, path: Path) -> str | None:
+    """sha256 of a file's bytes (None if missing), skipping the read when size+mtime are unchanged."""
+    try:
+      st = path.stat()
+    except OSError:
+      return None
+    key = str(path)
+    self._digested.add(key)
+    old = self._stats.get(key)
+    if old is not None and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+      return old[2]
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+      for block in iter(lambda: f.read(1 << 20), b""):
+        h.update(block)
+    self._stats[key] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+    return h.hexdigest()
+
+  def get_traces(self, rel: str, key: str | None, ids: list[str]) -> list[dict] | None:
+    """Cached trace records for `ids` (in that order) if `rel` still has fingerprint `key`."""
+    self._seen_sources.add(rel)
+    ent = self._sources.get(rel)
+    if key is None or ent is None or ent["key"] != key:
+      return None
+    by_id = {r["theorem_id"]: r for r in self._read(ent["blob"])}
+    if not all(i in by_id for i in ids):
+      return None
+    self.reused += 1
+    return [by_id[i] for i in ids]
+
+  def put_traces(self, rel: str, key: str | None, recs: list[dict]):
+    self.refreshed += 1
+    if key is None:
+      return
+    ent = self._sources.get(rel)
+    merged = {}
+    if ent is not None and ent["key"] == key:
+      merged = {r["theorem_id"]: r for r in self._read(ent["blob"])}
+    merged.update((r["theorem_id"], r) for r in recs)
+    self._sources[rel] = {"key": key, "blob": self._write("src", rel, list(merged.values()))}
+
+  def get_rows(self, rel: str, path: Path) -> list[dict] | None:
+    self._seen_artifacts.add(rel)
+    ent = self._artifacts.get(rel)
+    if ent is None or ent["sha256"] != self.digest(path):
+      return None
+    self.reused += 1
+    return list(self._read(ent["blob"])) if ent["blob"] else []
+
+  def put_rows(self, rel: str, path: Path, rows: list[dict]):
+    self.refreshed += 1
+    sha = self.digest(path)
+    if sha is not None:
+      self._artifacts[rel] = {"sha256": sha, "blob": self._write("art", rel, rows) if rows else None}
+
+  def save(self):
+    """Writes the index, dropping entries (and blobs) for files that no longer exist."""
+    self._sources = {k: v for k, v in self._sources.items() if k in self._seen_sources}
+    self._artifacts = {k: v for k, v in self._artifacts.items() if k in self._seen_artifacts}
+    live = {e["blob"] for e in (*self._sources.values(), *self._artifacts.values()) if e["blob"]}
+    for p in (self.root / "blobs").iterdir():
+      if f"blobs/{p.name}" not in live:
+        p.unlink()
+    index = {
+      "version": self.VERSION,
+      "salt": self.salt,
+      "sources": self._sources,
+      "artifacts": self._artifacts,
+      "stats": {k: v for k, v in self._stats.items() if k in self._digested},
+    }
+    tmp = self.root / "index.json.tmp"
+    tmp.write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(self.root / "index.json")
+
+  def _write(self, kind: str, rel: str, recs: list[dict]) -> str:
+    name = f"blobs/{kind}-{hashlib.sha1(rel.encode('utf-8')).hexdigest()}.jsonl.gz"
+    with gzip.open(self.root / name, "wt", encoding="utf-8", compresslevel=6) as f:
+      for rec in recs:
+        f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+        f.write("\n")
+    return name
+
+  def _read(self, name: str) -> Iterator[dict]:
+    with gzip.open(self.root / name, "rt", encoding="utf-8") as f:
+      for line in f:
+        yield json.loads(line)
@@ -8,15 +8,35 @@ Description:
   - Ensures a LeanDojo traced repo exists (traces if missing, reuses if present)
   - Builds a unified "statements" list from:
     - Traced theorems/lemmas (via TracedRepo API)
-    - Any declaration rows found in LeanDojo artifact JSON/JSONL files (defs, axioms, inductives, ...)
-  - Builds a "traces" list (tactic steps) for declarations that actually have traced proofs
-  - Writes a single JSON to data/exports/mathlib4/mathlib4_statements_traces.json
+    - Any declaration rows found in LeanDojo artifact JSON/JSONL files (defs, axioms, inductives, ...),
+      parsed incrementally (see artifact_sweep.py); skipped files and the slowest ones are reported
+  - Builds a "traces" list (tactic steps) for declarations that actually have traced proofs;
+    with --workers N the extraction is sharded by source file over N forked processes and
+    merged back in serial order (output is byte-identical to --workers 1)
+  - With --incremental, keeps per-source-file and per-artifact content hashes (plus the
+    extracted records) and re-processes only what changed since the previous export
+  - With --state-store, each distinct pretty-printed state is stored once (compressed) and
+    trace steps refer to it by id (qednet.data.state_store)
+  - Writes a single JSON to data/exports/mathlib4/mathlib4_statements_traces.json, or with
+    --format jsonl streams records one at a time into sharded (gzip) JSONL files plus a
+    manifest.json holding the meta/counts, so memory stays flat on full mathlib4
 
 Options:
   --repo URL       Git URL (default: https://github.com/leanprover-community/mathlib4)
   --commit HASH    Commit hash (default: latest on remote)
   --dst PATH       Traced repo directory (default: data/traces/mathlib4)
-  --out PATH       Output JSON (default: data/exports/mathlib4/mathlib4_statements_traces.json)
+  --out PATH       Output JSON (default: data/exports/mathlib4/mathlib4_statements_traces.json);
+                   with --format jsonl, the output directory (a trailing .json is dropped)
+  --format FMT     json (single payload, default) | jsonl (sharded, streamed)
+  --shard-size N   Records per JSONL shard (default: 50000)
+  --no-compress    Write plain .jsonl shards instead of .jsonl.gz
+  --workers N      Processes for tactic extraction and the artifact sweep
+                   (default: 1 = serial; extraction needs fork, i.e. Linux/macOS)
+  --incremental    Only re-process source files / artifacts whose content hash changed since the
+                   last export; everything else is reused from the cache
+  --cache-dir PATH Incremental cache (default: <out dir>/.export_cache)
+  --state-store P  Intern state_before/state_after into a content-addressed store (SQLite) at P;
+                   traces then carry "hash:..." ids instead of the pretty-printed states
   --test           Cap statements+traces to 10 items
   --limit N        Cap statements+traces to N items (overrides --test)
   --force          Delete --dst if it exists and retrace (DANGEROUS)
@@ -27,10 +47,18 @@ Requirements:
 """
 
 from __future__ import annotations
-import argparse, json, os, sys
+import argparse, json, multiprocessing, os, sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from itertools import islice
-from typing import Iterable
+from itertools import batched, groupby, islice
+from typing import Iterable, Iterator
+
+from artifact_sweep import ArtifactSweep, find_artifacts
+from export_io import ExportCache, JsonPayloadWriter, ShardedJsonlWriter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+from qednet.data.state_store import StateStore
 
 from lean_dojo.data_extraction.lean import LeanGitRepo, get_latest_commit
 from lean_dojo.data_extraction.trace import trace
@@ -40,6 +68,8 @@ from lean_dojo.data_extraction.traced_data import TracedRepo
 REPO = os.getenv("REPO")
 GITHUB_ACCESS_TOKEN = os.getenv("GITHUB_ACCESS_TOKEN")
 COMMIT = os.getenv("COMMIT")
+# Bump when record layout changes: --incremental caches from older versions are discarded.
+EXPORT_VERSION = 1
 
 
 def limited(iterable: Iterable, limit: int | None):
@@ -64,63 +94,21 @@ def infer_mod_and_name(full: str) -> tuple[str, str]:
   return mod, name
 
 
-def load_jsonl(p: Path):
-  out = []
-  with p.open("r", encoding="utf-8") as f:
-    for line in f:
-      line = line.strip()
-      if not line:
-        continue
-      try:
-        out.append(json.loads(line))
-      except Exception:
-        out.append({"_raw": line})
-  return out
-
-
-def sweep_artifacts(traced_root: Path):
+def sweep_artifacts(traced_root: Path, cache: ExportCache | None = None, workers: int = 1) -> Iterator[dict]:
   """
   Collect any *.json/*.jsonl artifacts under traced_root.
-  Return list of rows (dicts) that look like declarations.
+  Yield rows (dicts) that look like declarations; artifacts are parsed incrementally over
+  `workers` processes, and with a cache unchanged artifacts are not parsed again.
   """
-  rows = []
-
-  def maybe_decl(obj):
-    if not isinstance(obj, dict):
-      return
-    # Try common key variants LeanDojo/artifacts use
-    full = obj.get("full_name") or obj.get("name") or obj.get("decl_name") or obj.get("constant")
-    typ  = obj.get("type") or obj.get("ty") or obj.get("signature")
-    kind = obj.get("kind") or obj.get("k") or obj.get("decl_kind") or obj.get("declType")
-    if isinstance(full, str) and (typ is not None or kind is not None):
-      rows.append({"full_name": full, "type": typ, "kind": kind})
-
-  for p in traced_root.rglob("*"):
-    if not p.is_file():
-      continue
-    suf = p.suffix.lower()
-    try:
-      if suf == ".json":
-        payload = json.load(p.open("r", encoding="utf-8"))
-        if isinstance(payload, list):
-          for item in payload:
-            maybe_decl(item)
-        elif isinstance(payload, dict):
-          # Common nested containers
-          for key in ("decls", "constants", "items", "rows"):
-            if key in payload and isinstance(payload[key], list):
-              for item in payload[key]:
-                maybe_decl(item)
-          # Or single object
-          maybe_decl(payload)
-      elif suf == ".jsonl":
-        for item in load_jsonl(p):
-          maybe_decl(item)
-    except Exception:
-      # Ignore unreadable/mismatched artifacts
-      continue
-
-  return rows
+  sweep = ArtifactSweep(workers=workers)
+  cached = None
+  if cache is not None:
+    cached = lambda p: cache.get_rows(str(p.relative_to(traced_root)), p)
+  for res in sweep.run(find_artifacts(traced_root), cached):
+    if cache is not None and not res.cached and not (res.skipped or "").startswith("unreadable"):
+      cache.put_rows(str(res.path.relative_to(traced_root)), res.path, res.rows)
+    yield from res.rows
+  print(f"[sweep] {sweep.stats.summary()}")
 
 
 def build_statement_record(full_name: str, typ: str | None, kind: str | None):
@@ -135,12 +123,181 @@ def build_statement_record(full_name: str, typ: str | None, kind: str | None):
   }
 
 
+def build_trace_record(th, the_id: str):
+  steps = []
+  i = 0
+  try:
+    for t in th.get_traced_tactics(atomic_only=False):
+      try:
+        tact_annot, prem = t.get_annotated_tactic()
+      except Exception:
+        tact_annot, prem = None, None
+      steps.append({
+        "i": i,
+        "state_before": getattr(t, "state_before", None),
+        "state_after": getattr(t, "state_after", None),
+        "action": getattr(t, "tactic", None),
+        "tactic_annotated": tact_annot,
+        "premises": prem,
+      })
+      i += 1
+  except Exception as e:
+    steps.append({"_tactics_error": f"{type(e).__name__}: {e}"})
+
+  return {
+    "theorem_id": the_id,
+    "steps": steps
+  }
+
+
+# Traced theorems shared with forked extraction workers (inherited copy-on-write, never pickled).
+_THEOREMS: list = []
+
+
+def _extract_shard(idxs: list[int]) -> list[dict]:
+  return [build_trace_record(_THEOREMS[i], f"lean:{_THEOREMS[i].theorem.full_name}") for i in idxs]
+
+
+def traced_ast_paths(traced_root: Path, rel: Path) -> list[Path]:
+  """LeanDojo's <module>.ast.json for a traced source file (dependencies live under .lake/packages/<pkg>)."""
+  base = traced_root
+  if rel.parts[:2] == (".lake", "packages") and len(rel.parts) > 3:
+    base, rel = traced_root.joinpath(*rel.parts[:3]), Path(*rel.parts[3:])
+  stem = str(rel.with_suffix(""))
+  found = [b / "ir" / f"{stem}.ast.json" for b in (base / ".lake" / "build", base / "build")]
+  return [p for p in found if p.exists()][:1]
+
+
+def source_key(cache: ExportCache, traced_root: Path, rel: str) -> str | None:
+  """
+  Fingerprint of one source file: its text plus its .ast.json, which holds the pretty-printed
+  tactic states (so a notation change upstream also invalidates its dependents' traces).
+  """
+  src = cache.digest(traced_root / rel)
+  if src is None:
+    return None
+  return ":".join([src, *(cache.digest(p) or "" for p in traced_ast_paths(traced_root, Path(rel)))])
+
+
+def export_salt(traced_root: Path) -> str:
+  """Anything that invalidates every cached record: export layout, toolchain, dependency revs."""
+  parts = [f"export-v{EXPORT_VERSION}", str(REPO)]
+  toolchain = traced_root / "lean-toolchain"
+  if toolchain.exists():
+    parts.append(toolchain.read_text(encoding="utf-8").strip())
+  manifest = traced_root / "lake-manifest.json"
+  if manifest.exists():
+    pkgs = json.loads(manifest.read_text(encoding="utf-8")).get("packages", [])
+    parts += sorted(f"{p.get('name')}@{p.get('rev')}" for p in pkgs)
+  return "\n".join(parts)
+
+
+def iter_traces(
+  traced_theorems: list,
+  wanted: list[int],
+  workers: int = 1,
+  cache: ExportCache | None = None,
+  traced_root: Path | None = None,
+) -> Iterator[dict]:
+  """
+  Yields build_trace_record() for traced_theorems[i], i in `wanted`, in that order.
+  Shards are consecutive runs of the same source file. A shard whose file fingerprint is
+  unchanged comes from the cache; the rest are extracted (in a fork pool when workers > 1).
+  At most 4 shards per worker are in flight, and results are released strictly in order.
+  """
+  shards = [
+    (path, [i for i, _ in run])
+    for path, run in groupby(((i, str(traced_theorems[i].theorem.file_path)) for i in wanted), key=lambda t: t[1])
+  ]
+  _THEOREMS[:] = traced_theorems
+  pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) if workers > 1 else None
+
+  def start(shard):
+    path, idxs = shard
+    key = recs = None
+    if cache is not None:
+      key = source_key(cache, traced_root, path)
+      recs = cache.get_traces(path, key, [f"lean:{traced_theorems[i].theorem.full_name}" for i in idxs])
+    if recs is not None:
+      return path, key, False, recs
+    return path, key, True, _extract_shard(idxs) if pool is None else pool.submit(_extract_shard, idxs)
+
+  try:
+    pending: deque = deque()
+    todo = iter(shards)
+    for shard in islice(todo, 4 * workers):
+      pending.append(start(shard))
+    while pending:
+      path, key, fresh, recs = pending.popleft()
+      if isinstance(recs, Future):
+        recs = recs.result()
+      if fresh and cache is not None:
+        cache.put_traces(path, key, recs)
+      for shard in islice(todo, 1):
+        pending.append(start(shard))
+      yield from recs
+  finally:
+    if pool is not None:
+      pool.shutdown(cancel_futures=True)
+    _THEOREMS.clear()
+
+
+def iter_statements(
+  traced_theorems: list,
+  traced_root: Path,
+  limit: int | None,
+  cache: ExportCache | None = None,
+  workers: int = 1,
+) -> Iterator[dict]:
+  """Union of traced theorems + artifact decls, deduplicated by id, at most `limit` records."""
+  seen_ids: set[str] = set()
+
+  def fresh(rec):
+    if rec["id"] in seen_ids or (limit is not None and len(seen_ids) >= limit):
+      return False
+    seen_ids.add(rec["id"])
+    return True
+
+  # A) from traced theorems/lemmas (high confidence, includes propositions)
+  for th in limited(traced_theorems, limit):
+    full = th.theorem.full_name
+    # LeanDojo exposes the formal statement/proposition:
+    stmt_txt = th.get_theorem_statement()
+    rec = build_statement_record(full, stmt_txt, kind="thm")
+    if fresh(rec):
+      yield rec
+
+  if limit is not None and len(seen_ids) >= limit:
+    return
+
+  # B) sweep artifacts to include ALL other decl kinds (defs, axioms, inductives, etc.)
+  for row in sweep_artifacts(traced_root, cache, workers):
+    rec = build_statement_record(row["full_name"], row.get("type"), row.get("kind"))
+    if fresh(rec):
+      yield rec
+
+
+def make_writer(args, out: Path):
+  if args.format == "jsonl":
+    out_dir = out.with_suffix("") if out.suffix == ".json" else out
+    return ShardedJsonlWriter(out_dir, shard_size=args.shard_size, compress=not args.no_compress)
+  out.parent.mkdir(parents=True, exist_ok=True)
+  return JsonPayloadWriter(out)
+
+
 def main():
   ap = argparse.ArgumentParser(description="Export mathlib4 statements (all decl kinds) + traces.")
   ap.add_argument("--dst", default="data/traces/mathlib4")
   ap.add_argument("--out", default="data/exports/mathlib4/mathlib4_statements_traces.json")
   ap.add_argument("--test", action="store_true", help="Cap outputs to 10 items")
   ap.add_argument("--limit", type=int, default=None, help="Cap outputs to N items (overrides --test)")
+  ap.add_argument("--format", choices=("json", "jsonl"), default="json", help="Single JSON payload or sharded JSONL")
+  ap.add_argument("--shard-size", type=int, default=50_000, help="Records per JSONL shard")
+  ap.add_argument("--no-compress", action="store_true", help="Plain .jsonl shards (default: gzip)")
+  ap.add_argument("--workers", type=int, default=1, help="Processes for tactic extraction and the artifact sweep")
+  ap.add_argument("--incremental", action="store_true", help="Reuse records of unchanged files from the last export")
+  ap.add_argument("--cache-dir", default=None, help="Incremental cache (default: <out dir>/.export_cache)")
+  ap.add_argument("--state-store", default=None, help="Write states to this store; traces keep hash ids")
   args = ap.parse_args()
 
   if not os.getenv("GITHUB_ACCESS_TOKEN"):
@@ -152,7 +309,7 @@ def main():
   dst.parent.mkdir(parents=True, exist_ok=True)
 
   out = Path(args.out)
-  out.parent.mkdir(parents=True, exist_ok=True)
+  writer = make_writer(args, out)
 
   # resolve commit and build lean repo
   repo = LeanGitRepo(REPO, COMMIT)
@@ -171,95 +328,48 @@ def main():
   if args.limit is not None:
     limit = max(0, args.limit)
 
-  # ---------------- statements (union of traced theorems + artifact decls) ----------------
-  statements: list[dict] = []
-  seen_ids: set[str] = set()
+  cache = None
+  if args.incremental:
+    cache = ExportCache(Path(args.cache_dir) if args.cache_dir else out.parent / ".export_cache", export_salt(traced_root))
 
-  # A) from traced theorems/lemmas (high confidence, includes propositions)
+  # ---------------- statements (union of traced theorems + artifact decls) ----------------
+  # Records go straight to the writer; only the ids are kept to align the traces below.
   traced_theorems = list(trepo.get_traced_theorems())
-  for th in limited(traced_theorems, limit):
-    full = th.theorem.full_name
-    # LeanDojo exposes the formal statement/proposition:
-    stmt_txt = th.get_theorem_statement()
-    rec = build_statement_record(full, stmt_txt, kind="thm")
-    if rec["id"] not in seen_ids:
-      statements.append(rec)
-      seen_ids.add(rec["id"])
-
-  # B) sweep artifacts to include ALL other decl kinds (defs, axioms, inductives, etc.)
-  decl_rows = sweep_artifacts(traced_root)
-  for row in decl_rows:
-    full = row["full_name"]
-    typ  = row.get("type")
-    kind = row.get("kind")
-    rec = build_statement_record(full, typ, kind)
-    if rec["id"] not in seen_ids:
-      statements.append(rec)
-      seen_ids.add(rec["id"])
-
-  # If a limit is set, trim the final statements to at most limit (useful for --test)
-  if limit is not None:
-    statements = statements[:limit]
+  allowed_ids: set[str] = set()
+  for rec in iter_statements(traced_theorems, traced_root, limit, cache, args.workers):
+    writer.add("statements", rec)
+    allowed_ids.add(rec["id"])
 
   # ---------------- traces (for items that actually have proof traces) ----------------
-  traces: list[dict] = []
-  # Use a fresh iterator (or reuse list) and align with final statements set
-  allowed_ids = {s["id"] for s in statements}
-  count = 0
-  for th in traced_theorems:
-    full = th.theorem.full_name
-    the_id = f"lean:{full}"
-    if the_id not in allowed_ids:
-      continue  # only include traces for statements we kept
-    # Build step list
-    steps = []
-    i = 0
-    try:
-      for t in th.get_traced_tactics(atomic_only=False):
-        try:
-          tact_annot, prem = t.get_annotated_tactic()
-        except Exception:
-          tact_annot, prem = None, None
-        steps.append({
-          "i": i,
-          "state_before": getattr(t, "state_before", None),
-          "state_after": getattr(t, "state_after", None),
-          "action": getattr(t, "tactic", None),
-          "tactic_annotated": tact_annot,
-          "premises": prem,
-        })
-        i += 1
-    except Exception as e:
-      steps.append({"_tactics_error": f"{type(e).__name__}: {e}"})
-
-    traces.append({
-      "theorem_id": the_id,
-      "steps": steps
-    })
-
-    count += 1
-    if limit is not None and count >= limit:
-      break
-
-  # ---------------- payload ----------------
-  payload = {
-    "statements": statements,
-    "traces": traces,
-    "meta": {
-      "repo": REPO,
-      "repo_commit": COMMIT,
-      "traced_root": str(traced_root),
-      "counts": {
-        "statements": len(statements),
-        "traces": len(traces)
-      }
-    }
+  # only include traces for statements we kept
+  wanted = [i for i, th in enumerate(traced_theorems) if f"lean:{th.theorem.full_name}" in allowed_ids]
+  wanted = list(limited(wanted, limit))
+  if args.workers > 1:
+    print(f"[traces] {len(wanted)} theorems over {args.workers} workers")
+  store = StateStore(args.state_store) if args.state_store else None
+  for recs in batched(iter_traces(traced_theorems, wanted, args.workers, cache, traced_root), 256):
+    if store is not None:
+      store.intern_steps(st for rec in recs for st in rec["steps"])
+    for rec in recs:
+      writer.add("traces", rec)
+
+  if cache is not None:
+    cache.save()
+    print(f"[incremental] reused {cache.reused} files, re-processed {cache.refreshed}")
+
+  # ---------------- payload / manifest ----------------
+  meta = {
+    "repo": REPO,
+    "repo_commit": COMMIT,
+    "traced_root": str(traced_root),
   }
+  if store is not None:
+    meta["state_store"] = str(Path(args.state_store).resolve())
+    print(f"[states] {store.stats()}")
+    store.close()
+  written = writer.finish(meta)
 
-  with out.open("w", encoding="utf-8") as f:
-    json.dump(payload, f, ensure_ascii=False, indent=2)
-
-  print(f"[done] wrote {out}")
+  print(f"[done] wrote {written}")
 
 if __name__ == "__main__":
   main()
@@ -1,6 +1,9 @@
-def main():
-    print("Hello from qednet!")
+import sys
+from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+
+from qednet.cli.main import main  # noqa: E402
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,189 @@
+# src/qednet/cli/main.py
+from __future__ import annotations
+
+import argparse
+import collections
+import json
+import shlex
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..io.governor import AdaptiveBudget, ResourceLimits
+from ..io.lean_pool import LeanPool
+from ..io.lean_rpc import _LEAN_TIMEOUT_SEC, StepResult
+from ..io.reverify import reverify
+from ..io.verify_cache import VerificationCache, step_to_dict
+from ..io.verify_server import VerificationClient, VerificationServer, default_address, parse_address
+
+Submit = Callable[[str, str, str], "Future[StepResult]"]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    `qednet serve` (shared verification server) / `qednet verify` (JSONL stdin -> stdout) /
+    `qednet reverify` (replay every exported trace, resumable).
+    """
+    ap = argparse.ArgumentParser(prog="qednet", description="QEDNet command line tools.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    serve = sub.add_parser("serve", help="Run a local verification server over a pool of warm Lean workers.")
+    serve.add_argument("--listen", default=None, help="Unix socket path or host:port (default: $QEDNET_SOCKET "
+                                                      "or a per-user socket in the temp dir).")
+    serve.add_argument("--max-inflight", type=int, default=None, help="Requests dispatched to the pool at once.")
+    _pool_args(serve)
+
+    verify = sub.add_parser("verify", help="Verify JSONL {goal, script[, theorem_name, id]} records from stdin.")
+    verify.add_argument("--connect", default=None, help="Use a running `qednet serve` at this address "
+                                                        "instead of starting a local pool.")
+    verify.add_argument("--window", type=int, default=None, help="Records in flight (default: 4 x workers).")
+    verify.add_argument("--with-output", action="store_true", help="Keep Lean's stdout/stderr in the records.")
+    _pool_args(verify)
+
+    rev = sub.add_parser("reverify", help="Replay the traced proofs of an export; one pass/fail/timeout "
+                                          "record per theorem. Re-running with the same --out resumes.")
+    rev.add_argument("export", type=Path, help="Exporter output: a JSON payload or a sharded JSONL directory.")
+    rev.add_argument("--out", type=Path, required=True, help="Results JSONL (also the checkpoint).")
+    rev.add_argument("--group-size", type=int, default=16, help="Theorems per submitted group / checkpoint.")
+    rev.add_argument("--shard", default="0/1", help="K/N: only theorems with crc32(id) %% N == K.")
+    _pool_args(rev)
+
+    args = ap.parse_args(argv)
+    if args.cmd == "serve":
+        return _serve(args)
+    if args.cmd == "reverify":
+        return _reverify(args)
+    return _verify(args, sys.stdin, sys.stdout)
+
+
+# ---------- Internals ----------
+
+def _pool_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--workers", type=int, default=None, help="Lean workers (default: CPU count).")
+    p.add_argument("--imports", nargs="+", default=None, help="Modules imported by every worker (default: Mathlib).")
+    p.add_argument("--workdir", type=Path, default=None, help="Lake project to run Lean in.")
+    p.add_argument("--timeout", type=int, default=_LEAN_TIMEOUT_SEC, help="Per-request Lean timeout (s).")
+    p.add_argument("--repl-cmd", default=None, help="Lean REPL command line (default: `lake exe repl`).")
+    p.add_argument("--cache", type=Path, default=None, help="VerificationCache SQLite file shared across runs.")
+    p.add_argument("--memory-mb", type=int, default=None, help="Address-space cap of each Lean process.")
+    p.add_argument("--max-requests", type=int, default=None, help="Recycle a worker after this many requests.")
+    p.add_argument("--max-rss-mb", type=int, default=None, help="Recycle a worker once its RSS passes this.")
+    p.add_argument("--adaptive", action="store_true", help="Per-goal timeouts / heartbeats from observed times "
+                                                           "(--timeout becomes the ceiling).")
+
+
+def _pool(args: argparse.Namespace) -> LeanPool:
+    return LeanPool(
+        size=args.workers,
+        imports=args.imports,
+        workdir=args.workdir,
+        timeout_sec=args.timeout,
+        repl_cmd=shlex.split(args.repl_cmd) if args.repl_cmd else None,
+        cache=VerificationCache(args.cache) if args.cache else None,
+        limits=ResourceLimits(memory_mb=args.memory_mb, max_requests=args.max_requests, max_rss_mb=args.max_rss_mb),
+        budget=AdaptiveBudget(max_timeout_sec=args.timeout) if args.adaptive else None,
+    )
+
+
+def _serve(args: argparse.Namespace) -> int:
+    address = parse_address(args.listen) if args.listen else default_address()
+    with _pool(args) as pool:
+        server = VerificationServer(pool, address, max_inflight=args.max_inflight)
+        print(f"qednet: serving {pool.size} Lean workers on {address}", file=sys.stderr, flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def _verify(args: argparse.Namespace, stdin: IO[str], stdout: IO[str]) -> int:
+    """Streams results in input order, keeping `window` records in flight."""
+    if args.connect:
+        client = VerificationClient(parse_address(args.connect))
+        submit: Submit = client.submit
+        window = args.window or 64
+        close: Callable[[], None] = client.close
+    else:
+        pool = _pool(args)
+        window = args.window or 4 * pool.size
+        ex = ThreadPoolExecutor(max_workers=window, thread_name_prefix="qednet-verify")
+
+        def submit(goal: str, script: str, name: str) -> "Future[StepResult]":
+            job = lambda rpc: rpc.check_tactic(goal, script, theorem_name=name)
+            return ex.submit(lambda: pool.map([job])[0])
+
+        def close() -> None:
+            ex.shutdown()
+            pool.close()
+
+    pending: Deque[Tuple[dict, "Future[StepResult] | StepResult"]] = collections.deque()
+
+    def emit() -> None:
+        head, res = pending.popleft()
+        if isinstance(res, Future):
+            try:
+                res = res.result()
+            except Exception as e:
+                res = StepResult(valid=False, error=f"{type(e).__name__}: {e}")
+        out = {**head, **step_to_dict(res)}
+        if not args.with_output:
+            out.pop("stdout", None)
+            out.pop("stderr", None)
+        stdout.write(json.dumps(out, ensure_ascii=False) + "\n")
+
+    try:
+        for i, line in enumerate(stdin):
+            if not line.strip():
+                continue
+            head: dict = {"i": i}
+            try:
+                rec = json.loads(line)
+                if "id" in rec:
+                    head["id"] = rec["id"]
+                res = submit(rec["goal"], rec["script"], str(rec.get("theorem_name") or "__tmp"))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                res = StepResult(valid=False, error=f"Bad request: {type(e).__name__}: {e}")
+            pending.append((head, res))
+            while len(pending) >= window or (pending and _done(pending[0][1])):
+                emit()
+        while pending:
+            emit()
+        stdout.flush()
+    finally:
+        close()
+    return 0
+
+
+def _reverify(args: argparse.Namespace) -> int:
+    k, _, n = args.shard.partition("/")
+    args.cache = None  # results of the previous toolchain must not answer a re-verification
+    t0 = last = time.perf_counter()
+
+    def progress(counts: Dict[str, int]) -> None:
+        nonlocal last
+        now = time.perf_counter()
+        if now - last >= 10:
+            last = now
+            rate = counts["checked"] / (now - t0)
+            print(f"[reverify] {_summary(counts)} ({rate:.1f} theorems/s)", file=sys.stderr, flush=True)
+
+    with _pool(args) as pool:
+        counts = reverify(pool, args.export, args.out, group_size=args.group_size, shard=(int(k), int(n or 1)),
+                          progress=progress)
+    print(f"[reverify] {_summary(counts)} in {time.perf_counter() - t0:.1f}s -> {args.out}", file=sys.stderr)
+    return 0
+
+
+def _summary(counts: Dict[str, int]) -> str:
+    return " ".join(f"{k}={v}" for k, v in counts.items())
+
+
+def _done(res: "Future[StepResult] | StepResult") -> bool:
+    return not isinstance(res, Future) or res.done()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
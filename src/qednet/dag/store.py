@@ -0,0 +1,346 @@
+# src/qednet/dag/store.py
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Pending (not yet compacted) edges of a type are scanned linearly; compact past this share.
+_PENDING_RATIO = 0.125
+_MIN_PENDING = 1024
+
+Nodes = Union[int, str, Sequence[int], Sequence[str], np.ndarray]
+
+
+class _Buffer:
+    """Append-only int64 array with amortized O(1) growth."""
+
+    __slots__ = ("data", "n")
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.data = np.empty(capacity, dtype=np.int64)
+        self.n = 0
+
+    def extend(self, values: np.ndarray) -> None:
+        k = len(values)
+        if self.n + k > len(self.data):
+            grown = np.empty(max(2 * len(self.data), self.n + k), dtype=np.int64)
+            grown[: self.n] = self.data[: self.n]
+            self.data = grown
+        self.data[self.n : self.n + k] = values
+        self.n += k
+
+    @property
+    def view(self) -> np.ndarray:
+        return self.data[: self.n]
+
+
+class _EdgeSet:
+    """Edges of one type: insertion-order COO plus CSR (by src) / CSC (by dst) of a compacted prefix."""
+
+    def __init__(self) -> None:
+        self.src = _Buffer()
+        self.dst = _Buffer()
+        self.compacted = 0
+        empty = np.zeros(1, dtype=np.int64)
+        self.out_ptr, self.out_idx = empty, empty[:0]
+        self.in_ptr, self.in_idx = empty, empty[:0]
+
+    def __len__(self) -> int:
+        return self.src.n
+
+    def compact(self, num_nodes: int) -> None:
+        src, dst = self.src.view, self.dst.view
+        self.out_ptr, self.out_idx = _csr(src, dst, num_nodes)
+        self.in_ptr, self.in_idx = _csr(dst, src, num_nodes)
+        self.compacted = len(src)
+
+    def neighbors(self, nodes: np.ndarray, reverse: bool, num_nodes: int) -> np.ndarray:
+        pending = len(self) - self.compacted
+        if pending > max(_MIN_PENDING, _PENDING_RATIO * self.compacted):
+            self.compact(num_nodes)
+            pending = 0
+        ptr, idx = (self.in_ptr, self.in_idx) if reverse else (self.out_ptr, self.out_idx)
+        out = _gather(ptr, idx, nodes)
+        if pending:
+            key = (self.dst if reverse else self.src).view[self.compacted :]
+            val = (self.src if reverse else self.dst).view[self.compacted :]
+            out = np.concatenate([out, val[np.isin(key, nodes)]])
+        return out
+
+
+class DagStore:
+    """
+    Proof DAG with integer-interned nodes and per-edge-type CSR/CSC adjacency.
+    - add_nodes(ids, types) / add_edges(src, dst, etype) / add_record(dag_record): appends.
+    - successors / predecessors / descendants / ancestors(nodes, etypes, max_depth): vectorized
+      neighbourhood queries over node sets -> sorted int64 node arrays.
+    - frontier(node_type, etypes): nodes of a type that nothing points to yet (open goals).
+    - edge_index(etypes) / batch(node_sets, etypes): (2, E) int64 edge indices + edge types,
+      ready for torch.from_numpy / PyG.
+    Notes:
+      * Appends go to per-type COO buffers; queries read the CSR/CSC of a compacted prefix and
+        scan the short uncompacted tail, which is folded in (one stable sort per direction) once
+        it exceeds 1/8 of the type's edges. Appending during search therefore stays cheap.
+      * Edges form a multiset; queries return unique nodes, edge exports keep duplicates.
+      * Node ids are strings (see add_record for `dag` records); every query also takes ints.
+    """
+
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.type_names: List[str] = []
+        self.etype_names: List[str] = []
+        self._types: Dict[str, int] = {}
+        self._node_type = _Buffer()
+        self._edges: Dict[str, _EdgeSet] = {}
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.names)
+
+    @property
+    def num_edges(self) -> int:
+        return sum(len(e) for e in self._edges.values())
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.ids
+
+    # ---------- Building ----------
+
+    def add_nodes(self, ids: Iterable[str], types: Union[None, str, Iterable[Optional[str]]] = None) -> np.ndarray:
+        """Interns node ids (existing ones keep their index and type) -> their int ids."""
+        ids = list(ids)
+        tlist = [types] * len(ids) if types is None or isinstance(types, str) else list(types)
+        out = np.empty(len(ids), dtype=np.int64)
+        fresh_types: List[int] = []
+        for j, (name, t) in enumerate(zip(ids, tlist)):
+            i = self.ids.get(name)
+            if i is None:
+                i = self.ids[name] = len(self.names)
+                self.names.append(name)
+                fresh_types.append(self._type_id(t))
+            out[j] = i
+        self._node_type.extend(np.asarray(fresh_types, dtype=np.int64))
+        return out
+
+    def add_edges(self, src: Nodes, dst: Nodes, etype: str) -> None:
+        """Appends edges src[i] -> dst[i]; string endpoints are interned (untyped) on the fly."""
+        s = self._intern(src)
+        d = self._intern(dst)
+        if len(s) != len(d):
+            raise ValueError(f"add_edges: {len(s)} sources vs {len(d)} destinations.")
+        es = self._edges.get(etype)
+        if es is None:
+            es = self._edges[etype] = _EdgeSet()
+            self.etype_names.append(etype)
+        es.src.extend(s)
+        es.dst.extend(d)
+
+    def add_record(self, rec: Mapping[str, Any]) -> None:
+        """
+        Adds one exporter `dag` record ({theorem_id, nodes: [{id, type, ref?}], edges: [{src, dst,
+        etype}]}). Nodes with a `ref` (lemmas) are shared across theorems under that ref; the rest
+        are scoped as "<theorem_id>#<id>".
+        """
+        tid = rec.get("theorem_id") or ""
+        nodes = rec.get("nodes") or []
+        local = {n["id"]: n.get("ref") or f"{tid}#{n['id']}" for n in nodes}
+        self.add_nodes([local[n["id"]] for n in nodes], [n.get("type") for n in nodes])
+        by_type: Dict[str, Tuple[List[str], List[str]]] = {}
+        for e in rec.get("edges") or []:
+            s, d = by_type.setdefault(e.get("etype") or "edge", ([], []))
+            s.append(local.get(e["src"], f"{tid}#{e['src']}"))
+            d.append(local.get(e["dst"], f"{tid}#{e['dst']}"))
+        for etype, (s, d) in by_type.items():
+            self.add_edges(s, d, etype)
+
+    def compact(self) -> None:
+        """Folds every pending edge into CSR/CSC now (queries otherwise do it lazily)."""
+        for es in self._edges.values():
+            es.compact(self.num_nodes)
+
+    # ---------- Queries ----------
+
+    def node_ids(self, nodes: Nodes) -> np.ndarray:
+        """Int ids of existing nodes (strings looked up; KeyError for unknown names)."""
+        if isinstance(nodes, str) or np.isscalar(nodes):
+            nodes = [nodes]
+        if isinstance(nodes, np.ndarray) and nodes.dtype.kind in "iu":
+            return nodes.astype(np.int64, copy=False)
+        items = list(nodes)
+        if items and isinstance(items[0], str):
+            try:
+                return np.fromiter((self.ids[n] for n in items), dtype=np.int64, count=len(items))
+            except KeyError as e:
+                raise KeyError(f"Unknown DAG node: {e.args[0]}") from None
+        return np.asarray(items, dtype=np.int64)
+
+    def node_types(self, nodes: Optional[Nodes] = None) -> np.ndarray:
+        """Type codes (index into type_names, -1 = untyped) of `nodes` (default: all)."""
+        types = self._node_type.view
+        return types if nodes is None else types[self.node_ids(nodes)]
+
+    def successors(self, nodes: Nodes, etypes: Optional[Iterable[str]] = None) -> np.ndarray:
+        return np.unique(self._step(self.node_ids(nodes), etypes, reverse=False))
+
+    def predecessors(self, nodes: Nodes, etypes: Optional[Iterable[str]] = None) -> np.ndarray:
+        return np.unique(self._step(self.node_ids(nodes), etypes, reverse=True))
+
+    def descendants(
+        self, nodes: Nodes, etypes: Optional[Iterable[str]] = None, max_depth: Optional[int] = None
+    ) -> np.ndarray:
+        """Nodes reachable from `nodes` (excluded unless on a cycle), level-synchronous BFS."""
+        return self._reach(self.node_ids(nodes), etypes, max_depth, reverse=False)
+
+    def ancestors(
+        self, nodes: Nodes, etypes: Optional[Iterable[str]] = None, max_depth: Optional[int] = None
+    ) -> np.ndarray:
+        """Nodes that reach `nodes`; e.g. every goal a lemma (transitively) justifies or rewrites."""
+        return self._reach(self.node_ids(nodes), etypes, max_depth, reverse=True)
+
+    def in_degree(self, etypes: Optional[Iterable[str]] = None) -> np.ndarray:
+        return self._degree(etypes, reverse=True)
+
+    def out_degree(self, etypes: Optional[Iterable[str]] = None) -> np.ndarray:
+        return self._degree(etypes, reverse=False)
+
+    def frontier(self, node_type: Optional[str] = "goal", etypes: Optional[Iterable[str]] = None) -> np.ndarray:
+        """Nodes of `node_type` (None = any) with no incoming `etypes` edge: goals nothing closes yet."""
+        mask = self.in_degree(etypes) == 0
+        if node_type is not None:
+            code = self._types.get(node_type)
+            if code is None:
+                return np.zeros(0, dtype=np.int64)
+            mask &= self._node_type.view == code
+        return np.flatnonzero(mask)
+
+    # ---------- Export ----------
+
+    def edge_index(self, etypes: Optional[Iterable[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """((2, E) int64 [src; dst], (E,) int64 edge-type codes into etype_names), insertion order."""
+        parts, codes = [], []
+        for name in self._select(etypes):
+            es = self._edges[name]
+            parts.append(np.stack([es.src.view, es.dst.view]))
+            codes.append(np.full(len(es), self.etype_names.index(name), dtype=np.int64))
+        if not parts:
+            return np.zeros((2, 0), dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(parts, axis=1), np.concatenate(codes)
+
+    def subgraph(self, nodes: Nodes, etypes: Optional[Iterable[str]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Induced subgraph on `nodes` -> (node ids, local (2, E) edge index, edge types)."""
+        keep = np.unique(self.node_ids(nodes))
+        ei, et = self.edge_index(etypes)
+        local = np.full(self.num_nodes, -1, dtype=np.int64)
+        local[keep] = np.arange(len(keep))
+        mapped = local[ei]
+        inside = (mapped >= 0).all(axis=0)
+        return keep, mapped[:, inside], et[inside]
+
+    def batch(
+        self, node_sets: Sequence[Nodes], etypes: Optional[Iterable[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Several induced subgraphs as one disjoint graph (PyG-style batching): node ids, node
+        types, (2, E) edge index offset per graph, edge types, and the graph index of each node.
+        """
+        ei, et = self.edge_index(etypes)
+        nodes, edges, etys, batch = [], [], [], []
+        offset = 0
+        local = np.full(self.num_nodes, -1, dtype=np.int64)
+        for g, ns in enumerate(node_sets):
+            keep = np.unique(self.node_ids(ns))
+            local[keep] = np.arange(len(keep))
+            mapped = local[ei]
+            inside = (mapped >= 0).all(axis=0)
+            local[keep] = -1
+            nodes.append(keep)
+            edges.append(mapped[:, inside] + offset)
+            etys.append(et[inside])
+            batch.append(np.full(len(keep), g, dtype=np.int64))
+            offset += len(keep)
+        node_ids = np.concatenate(nodes) if nodes else np.zeros(0, dtype=np.int64)
+        return {
+            "node_ids": node_ids,
+            "node_type": self._node_type.view[node_ids],
+            "edge_index": np.concatenate(edges, axis=1) if edges else np.zeros((2, 0), dtype=np.int64),
+            "edge_type": np.concatenate(etys) if etys else np.zeros(0, dtype=np.int64),
+            "batch": np.concatenate(batch) if batch else np.zeros(0, dtype=np.int64),
+        }
+
+    # ---------- Internals ----------
+
+    def _type_id(self, t: Optional[str]) -> int:
+        if t is None:
+            return -1
+        code = self._types.get(t)
+        if code is None:
+            code = self._types[t] = len(self.type_names)
+            self.type_names.append(t)
+        return code
+
+    def _intern(self, nodes: Nodes) -> np.ndarray:
+        if isinstance(nodes, str):
+            nodes = [nodes]
+        if isinstance(nodes, np.ndarray) and nodes.dtype.kind in "iu":
+            ids = nodes.astype(np.int64, copy=False)
+        else:
+            items = list(nodes)
+            if items and isinstance(items[0], str):
+                return self.add_nodes(items)
+            ids = np.asarray(items, dtype=np.int64)
+        if len(ids) and (ids.min() < 0 or ids.max() >= self.num_nodes):
+            raise IndexError("add_edges: integer endpoint out of range; add the node first.")
+        return ids
+
+    def _select(self, etypes: Optional[Iterable[str]]) -> List[str]:
+        if etypes is None:
+            return list(self.etype_names)
+        if isinstance(etypes, str):
+            etypes = [etypes]
+        return [e for e in etypes if e in self._edges]
+
+    def _step(self, nodes: np.ndarray, etypes: Optional[Iterable[str]], reverse: bool) -> np.ndarray:
+        parts = [self._edges[e].neighbors(nodes, reverse, self.num_nodes) for e in self._select(etypes)]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def _reach(
+        self, start: np.ndarray, etypes: Optional[Iterable[str]], max_depth: Optional[int], reverse: bool
+    ) -> np.ndarray:
+        seen = np.zeros(self.num_nodes, dtype=bool)
+        frontier = np.unique(start)
+        depth = 0
+        while len(frontier) and (max_depth is None or depth < max_depth):
+            nxt = self._step(frontier, etypes, reverse)
+            nxt = np.unique(nxt[~seen[nxt]])
+            seen[nxt] = True
+            frontier = nxt
+            depth += 1
+        return np.flatnonzero(seen)
+
+    def _degree(self, etypes: Optional[Iterable[str]], reverse: bool) -> np.ndarray:
+        deg = np.zeros(self.num_nodes, dtype=np.int64)
+        for name in self._select(etypes):
+            es = self._edges[name]
+            deg += np.bincount((es.dst if reverse else es.src).view, minlength=self.num_nodes)
+        return deg
+
+
+def _csr(keys: np.ndarray, vals: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """`vals` grouped by `keys` (stable) as indptr (n + 1) / indices."""
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=ptr[1:])
+    return ptr, vals[np.argsort(keys, kind="stable")]
+
+
+def _gather(ptr: np.ndarray, idx: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """Concatenated CSR rows of `nodes`; nodes added after the CSR was built have no row yet."""
+    nodes = nodes[nodes < len(ptr) - 1]
+    starts = ptr[nodes]
+    lens = ptr[nodes + 1] - starts
+    total = int(lens.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    pos = np.repeat(starts - (np.cumsum(lens) - lens), lens) + np.arange(total)
+    return idx[pos]
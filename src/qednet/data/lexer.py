@@ -0,0 +1,25 @@
+# src/qednet/data/lexer.py
+from __future__ import annotations
+
+import re
+
+_NAME = r"[^\W\d][\w'!?]*"
+# Lexical tokens of pretty-printed Lean, shared by the retriever (lean_tokens) and the encoders.
+LEAN_TOKEN = re.compile(
+    rf"{_NAME}(?:\.{_NAME})*"  # identifiers and dotted names (Nat.succ_le_iff, α, h₁, mul_comm')
+    r"|\d+"  # numerals
+    r"|[-+*/^<>=|&%~]+"  # ASCII operators (<=, ->, ^, ...)
+    r"|[^\w\s\x00-\x7f]"  # one unicode symbol each (∀, →, ≤, ⊢, ∑, ...)
+)
+# LEAN_TOKEN plus multi-character unicode notation, `:=` and brackets: the case-preserved
+# tokens of goals and hypotheses. The multi-character symbols come before the one-symbol
+# class, otherwise `f⁻¹` would lex as f, ⁻, ¹ and `x✝¹` as x, ✝, ¹.
+STATE_TOKEN = re.compile(
+    rf"{_NAME}(?:\.{_NAME})*"
+    r"|\d+"
+    r"|[-+*/^<>=|&%~]+"
+    r"|⁻¹"  # inverse
+    r"|✝[⁰¹²³⁴⁵⁶⁷⁸⁹]*"  # inaccessible-name suffix with its index (x✝, a✝¹)
+    r"|[^\w\s\x00-\x7f]"
+    r"|:=|[()\[\]{},:]"
+)
@@ -0,0 +1,496 @@
+# src/qednet/data/shards.py
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+_FORMAT_VERSION = 1
+_MANIFEST = "manifest.json"
+# Index key per record kind, unless given explicitly: the first of these fields holding a
+# string ("id" for statements). Every record of the kind must then agree on it.
+_KEY_FIELDS = ("theorem_id", "id")
+# Per-value presence codes, stored only for columns that have any non-present value.
+_PRESENT, _NULL, _ABSENT = 0, 1, 2
+_MISSING = object()
+
+Column = Union[np.ndarray, "StringColumn"]
+
+
+class StringColumn:
+    """
+    Variable-length UTF-8 strings: one byte blob plus int64 offsets (n + 1 of them).
+    - col[i] -> str | None; col[a:b] -> StringColumn sharing the same mapped blob (zero-copy).
+    - raw(i) -> memoryview of the encoded bytes, without decoding.
+    """
+
+    __slots__ = ("offsets", "blob", "codes")
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray, codes: Optional[np.ndarray] = None) -> None:
+        self.offsets = offsets
+        self.blob = blob
+        self.codes = codes
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[Optional[str], "StringColumn"]:
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                raise ValueError("StringColumn slices must be contiguous.")
+            stop = max(start, stop)
+            codes = self.codes[start:stop] if self.codes is not None else None
+            return StringColumn(self.offsets[start : stop + 1], self.blob, codes)
+        if idx < 0:
+            idx += len(self)
+        if self.codes is not None and self.codes[idx] != _PRESENT:
+            return None
+        return bytes(self.raw(idx)).decode("utf-8")
+
+    def raw(self, idx: int) -> memoryview:
+        return memoryview(self.blob[self.offsets[idx] : self.offsets[idx + 1]])
+
+    def to_list(self) -> List[Optional[str]]:
+        return [self[i] for i in range(len(self))]
+
+
+class Table:
+    """
+    One flattened record table of one shard (the records of a kind, or a nested list field).
+    - column(key) -> np.ndarray (memmap) | StringColumn; nested lists are child tables with
+      CSR offsets: rows of child(key) for parent row i are offsets[i]:offsets[i + 1].
+    - record(i) -> the original dict, rebuilt from the columns.
+    """
+
+    def __init__(self, root: Path, prefix: str, meta: Dict[str, Any]) -> None:
+        self.root = root
+        self.prefix = prefix
+        self.meta = meta
+        self.rows: int = meta["rows"]
+        self._cols: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self.meta["columns"])
+
+    def column(self, key: str) -> Column:
+        col = self._cols.get(key)
+        if col is None:
+            col = self._cols[key] = self._open(key)
+        return col
+
+    def child(self, key: str) -> Tuple["Table", np.ndarray]:
+        """(child table, int64 offsets of length rows + 1) for a nested list column."""
+        return self.column(key)
+
+    def codes(self, key: str) -> Optional[np.ndarray]:
+        """Presence codes (0 value, 1 null, 2 absent) or None when every row has a value."""
+        if not self.meta["columns"][key].get("codes"):
+            return None
+        codes = self._cols.get(f"{key}\0codes")
+        if codes is None:
+            codes = self._cols[f"{key}\0codes"] = load_array(self.root / f"{_fname(self.prefix, key)}.codes.npy")
+        return codes
+
+    def record(self, i: int) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for key, cm in self.meta["columns"].items():
+            codes = self.codes(key)
+            if codes is not None and codes[i] != _PRESENT:
+                if codes[i] == _NULL:
+                    out[key] = None
+                continue
+            out[key] = self._value(key, cm, i)
+        return out
+
+    # ---------- Internals ----------
+
+    def _value(self, key: str, cm: Dict[str, Any], i: int) -> Any:
+        kind = cm["type"]
+        if kind == "null":
+            return None
+        if kind == "table":
+            sub, off = self.column(key)
+            rows = range(int(off[i]), int(off[i + 1]))
+            if cm["scalar"]:
+                return [sub.record(j).get("value") for j in rows]
+            return [sub.record(j) for j in rows]
+        col = self.column(key)
+        if kind == "str":
+            return col[i]
+        if kind == "json":
+            return json.loads(col[i])
+        if kind == "bool":
+            return bool(col[i])
+        if kind == "int":
+            return int(col[i])
+        return float(col[i])
+
+    def _open(self, key: str) -> Any:
+        cm = self.meta["columns"][key]
+        base = self.root / _fname(self.prefix, key)
+        kind = cm["type"]
+        if kind == "table":
+            sub = Table(self.root, _fname(self.prefix, key), cm["table"])
+            return sub, load_array(Path(f"{base}.off.npy"))
+        if kind in ("str", "json"):
+            codes = self.codes(key)
+            return StringColumn(load_array(Path(f"{base}.off.npy")), load_blob(Path(f"{base}.bin")), codes)
+        if kind == "null":
+            return np.zeros(self.rows, dtype=np.uint8)
+        return load_array(Path(f"{base}.npy"))
+
+
+class RecordSet:
+    """
+    All records of one kind across its shards.
+    - len(rs), rs[i] -> dict (direct row access; the shard is a bisect over the shard starts).
+    - find(key) -> global row numbers whose theorem_id/id equals `key` (on-disk sorted hash index).
+    - shard(s) -> Table, for column-wise, zero-copy access.
+    """
+
+    def __init__(self, root: Path, kind: str, meta: Dict[str, Any]) -> None:
+        self.root = root
+        self.kind = kind
+        self.meta = meta
+        self.key_field: Optional[str] = meta.get("key")
+        self._starts = np.cumsum([0, *[s["rows"] for s in meta["shards"]]])
+        self._shards: Dict[int, Table] = {}
+        self._index: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return int(self._starts[-1])
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        s = int(np.searchsorted(self._starts, i, side="right")) - 1
+        return self.shard(s).record(i - int(self._starts[s]))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for s in range(len(self.meta["shards"])):
+            t = self.shard(s)
+            for i in range(len(t)):
+                yield t.record(i)
+
+    @property
+    def num_shards(self) -> int:
+        return len(self.meta["shards"])
+
+    def shard(self, s: int) -> Table:
+        t = self._shards.get(s)
+        if t is None:
+            d = self.root / self.kind / self.meta["shards"][s]["dir"]
+            t = self._shards[s] = Table(d, "", _read_json(d / "meta.json"))
+        return t
+
+    def find(self, key: str) -> List[int]:
+        if self.key_field is None:
+            raise ValueError(f"Record kind '{self.kind}' has no theorem_id/id index.")
+        if self._index is None:
+            d = self.root / self.kind
+            self._index = (load_array(d / "index.hash.npy"), load_array(d / "index.row.npy"))
+        hashes, rows = self._index
+        h = np.uint64(_hash64(key))
+        lo, hi = np.searchsorted(hashes, h, side="left"), np.searchsorted(hashes, h, side="right")
+        out = []
+        for r in rows[lo:hi]:
+            # 64-bit hashes can collide: confirm against the stored key.
+            s = int(np.searchsorted(self._starts, r, side="right")) - 1
+            col = self.shard(s).column(self.key_field)
+            if col[int(r) - int(self._starts[s])] == key:
+                out.append(int(r))
+        return sorted(out)
+
+
+class ShardDataset:
+    """
+    Read side of the columnar format: opening reads one small manifest; every column is a
+    lazily opened np.memmap, so workers forked/spawned by a data loader share the page cache.
+    - ds["traces"] -> RecordSet; ds.by_theorem(theorem_id) -> {kind: [records]}.
+    Notes:
+      * Pickles as just its root path (cheap to ship to DataLoader workers).
+    """
+
+    def __init__(self, root: Union[str, Path]) -> None:
+        self.root = Path(root)
+        self.manifest = _read_json(self.root / _MANIFEST)
+        if self.manifest.get("version") != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported shard format version: {self.manifest.get('version')}")
+        self._sets: Dict[str, RecordSet] = {}
+
+    @property
+    def kinds(self) -> List[str]:
+        return list(self.manifest["kinds"])
+
+    def __contains__(self, kind: str) -> bool:
+        return kind in self.manifest["kinds"]
+
+    def __getitem__(self, kind: str) -> RecordSet:
+        rs = self._sets.get(kind)
+        if rs is None:
+            rs = self._sets[kind] = RecordSet(self.root, kind, self.manifest["kinds"][kind])
+        return rs
+
+    def by_theorem(self, theorem_id: str) -> Dict[str, List[Dict[str, Any]]]:
+        out = {}
+        for kind in self.kinds:
+            rs = self[kind]
+            if rs.key_field is not None:
+                hits = rs.find(theorem_id)
+                if hits:
+                    out[kind] = [rs[i] for i in hits]
+        return out
+
+    def __reduce__(self):
+        return (ShardDataset, (str(self.root),))
+
+
+class ShardWriter:
+    """
+    Streams records into the columnar format.
+    - add(kind, record) ... close(); or use as a context manager.
+    Layout:
+      <root>/manifest.json
+      <root>/<kind>/shard-NNNNN/meta.json + one file per column:
+        numbers/bools -> .npy; strings -> .bin blob + .off.npy offsets;
+        nested lists -> child table files + .off.npy row offsets (CSR)
+      <root>/<kind>/index.hash.npy, index.row.npy (sorted 64-bit key hashes -> global rows)
+    Notes:
+      * Memory is bounded by one buffered shard per kind (`rows_per_shard` records).
+      * Column types are inferred per shard: bool, int, float, str, nested list, else JSON text.
+      * keys={kind: field} names a kind's index key; other kinds use the first of theorem_id /
+        id their records hold. A record without a string in its kind's key field (or, for an
+        inferred key, keyed by another field) raises ValueError instead of going unindexed.
+    """
+
+    def __init__(
+        self, root: Union[str, Path], rows_per_shard: int = 100_000, keys: Optional[Dict[str, str]] = None
+    ) -> None:
+        self.root = Path(root)
+        self.rows_per_shard = max(1, rows_per_shard)
+        self.keys = dict(keys or {})
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._buf: Dict[str, List[Dict[str, Any]]] = {}
+        self._kinds: Dict[str, Dict[str, Any]] = {}
+        self._keys: Dict[str, List[Tuple[int, int]]] = {}
+
+    def add(self, kind: str, record: Dict[str, Any]) -> None:
+        buf = self._buf.setdefault(kind, [])
+        buf.append(record)
+        if len(buf) >= self.rows_per_shard:
+            self._flush(kind)
+
+    def add_many(self, kind: str, records: Iterable[Dict[str, Any]]) -> None:
+        for rec in records:
+            self.add(kind, rec)
+
+    def close(self) -> Path:
+        for kind in list(self._buf):
+            self._flush(kind)
+        for kind, meta in self._kinds.items():
+            pairs = self._keys.pop(kind, [])
+            if meta["key"] is None:
+                continue
+            arr = np.array(pairs, dtype=np.uint64).reshape(-1, 2)
+            order = np.argsort(arr[:, 0], kind="stable")
+            np.save(self.root / kind / "index.hash.npy", arr[order, 0])
+            np.save(self.root / kind / "index.row.npy", arr[order, 1].astype(np.int64))
+        path = self.root / _MANIFEST
+        path.write_text(json.dumps({"version": _FORMAT_VERSION, "kinds": self._kinds}, indent=2), encoding="utf-8")
+        return path
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # ---------- Internals ----------
+
+    def _flush(self, kind: str) -> None:
+        rows = self._buf.pop(kind, [])
+        if not rows:
+            return
+        meta = self._kinds.get(kind)
+        if meta is None:
+            key = self.keys.get(kind) or next(filter(None, map(_key_field, rows)), None)
+            meta = self._kinds[kind] = {"rows": 0, "key": key, "shards": []}
+        self._check_keys(kind, meta["key"], meta["rows"], rows)
+        name = f"shard-{len(meta['shards']):05d}"
+        d = self.root / kind / name
+        d.mkdir(parents=True, exist_ok=True)
+        table = _write_table(d, "", rows)
+        (d / "meta.json").write_text(json.dumps(table), encoding="utf-8")
+        if meta["key"] is not None:
+            keys = self._keys.setdefault(kind, [])
+            for i, rec in enumerate(rows):
+                k = rec.get(meta["key"])
+                if isinstance(k, str):
+                    keys.append((_hash64(k), meta["rows"] + i))
+        meta["shards"].append({"dir": name, "rows": len(rows)})
+        meta["rows"] += len(rows)
+
+    def _check_keys(self, kind: str, key: Optional[str], start: int, rows: List[Dict[str, Any]]) -> None:
+        explicit = kind in self.keys
+        for i, rec in enumerate(rows):
+            ok = isinstance(rec.get(key), str) if explicit else _key_field(rec) == key
+            if not ok:
+                raise ValueError(
+                    f"'{kind}' record {start + i} is not keyed by {key!r} like the rest of its kind "
+                    f"(key fields: {', '.join(f'{f}={rec.get(f)!r}' for f in _KEY_FIELDS)})."
+                )
+
+
+# ---------- Public API ----------
+
+
+def iter_export(src: Union[str, Path], kinds: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    (kind, record) pairs from exporter output: a single JSON payload ({"statements": [...],
+    ..., "meta": {...}}, as in data/example.json) or a sharded JSONL directory with manifest.json.
+    With `kinds`, only those record kinds are yielded (other JSONL shards are not opened).
+    """
+    src = Path(src)
+    wanted = set(kinds) if kinds is not None else None
+    if src.is_dir():
+        manifest = _read_json(src / _MANIFEST)
+        for kind, names in manifest.get("shards", {}).items():
+            if wanted is not None and kind not in wanted:
+                continue
+            for name in names:
+                opener = gzip.open if name.endswith(".gz") else open
+                with opener(src / name, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            yield kind, json.loads(line)
+        return
+    payload = _read_json(src)
+    for kind, records in payload.items():
+        if kind != "meta" and isinstance(records, list) and (wanted is None or kind in wanted):
+            for rec in records:
+                yield kind, rec
+
+
+def convert_export(
+    src: Union[str, Path], dst: Union[str, Path], rows_per_shard: int = 100_000, keys: Optional[Dict[str, str]] = None
+) -> ShardDataset:
+    """Converts exporter output (see iter_export) into a ShardDataset at `dst` (keys: see ShardWriter)."""
+    with ShardWriter(dst, rows_per_shard=rows_per_shard, keys=keys) as w:
+        for kind, rec in iter_export(src):
+            w.add(kind, rec)
+    return ShardDataset(dst)
+
+
+def load_array(path: Union[str, Path]) -> np.ndarray:
+    """A .npy array, memory-mapped read-only."""
+    return np.load(path, mmap_mode="r")
+
+
+def load_blob(path: Union[str, Path]) -> np.ndarray:
+    """A raw byte file as a read-only uint8 memmap (an empty array for an empty file)."""
+    # np.memmap refuses empty files.
+    if Path(path).stat().st_size == 0:
+        return np.empty(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+# ---------- Internals ----------
+
+
+def _write_table(d: Path, prefix: str, rows: List[Any], scalar: bool = False) -> Dict[str, Any]:
+    if scalar:
+        rows = [{"value": v} for v in rows]
+    keys: Dict[str, None] = {}
+    for r in rows:
+        keys.update(dict.fromkeys(r))
+    columns = {}
+    for key in keys:
+        vals = [r.get(key, _MISSING) for r in rows]
+        columns[key] = _write_column(d, _fname(prefix, key), vals)
+    return {"rows": len(rows), "columns": columns}
+
+
+def _write_column(d: Path, base: str, vals: List[Any]) -> Dict[str, Any]:
+    codes = np.array(
+        [_ABSENT if v is _MISSING else _NULL if v is None else _PRESENT for v in vals], dtype=np.uint8
+    )
+    present = [v for v in vals if v is not _MISSING and v is not None]
+    cm: Dict[str, Any] = {"type": _infer(present), "codes": bool(codes.any())}
+    if cm["codes"]:
+        np.save(d / f"{base}.codes.npy", codes)
+    kind = cm["type"]
+    if kind == "null":
+        return cm
+    if kind == "table":
+        items = [v if isinstance(v, list) else [] for v in vals]
+        cm["scalar"] = not any(isinstance(x, dict) for v in items for x in v)
+        off = np.zeros(len(items) + 1, dtype=np.int64)
+        np.cumsum([len(v) for v in items], out=off[1:])
+        np.save(d / f"{base}.off.npy", off)
+        cm["table"] = _write_table(d, base, [x for v in items for x in v], scalar=cm["scalar"])
+        return cm
+    if kind in ("str", "json"):
+        enc = [
+            (v if kind == "str" else json.dumps(v, ensure_ascii=False)).encode("utf-8")
+            if v is not _MISSING and v is not None
+            else b""
+            for v in vals
+        ]
+        off = np.zeros(len(enc) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in enc], out=off[1:])
+        np.save(d / f"{base}.off.npy", off)
+        (d / f"{base}.bin").write_bytes(b"".join(enc))
+        return cm
+    dtype, fill = {"bool": (np.uint8, 0), "int": (np.int64, 0), "float": (np.float64, np.nan)}[kind]
+    arr = np.array([fill if v is _MISSING or v is None else v for v in vals], dtype=dtype)
+    np.save(d / f"{base}.npy", arr)
+    return cm
+
+
+def _infer(present: List[Any]) -> str:
+    if not present:
+        return "null"
+    if all(isinstance(v, bool) for v in present):
+        return "bool"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "int" if all(-(1 << 63) <= v < (1 << 63) for v in present) else "json"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "float"
+    if all(isinstance(v, str) for v in present):
+        return "str"
+    if all(isinstance(v, list) for v in present):
+        # Lists of dicts or of scalars become child tables; mixed/nested lists stay JSON text.
+        items = [x for v in present for x in v]
+        if all(isinstance(x, dict) for x in items) or all(not isinstance(x, (dict, list)) for x in items):
+            return "table"
+    return "json"
+
+
+def _key_field(rec: Dict[str, Any]) -> Optional[str]:
+    return next((f for f in _KEY_FIELDS if isinstance(rec.get(f), str)), None)
+
+
+def _fname(prefix: str, key: str) -> str:
+    # Fixed-width escapes (any code point fits in 6 hex digits), so distinct keys never share a file.
+    safe = re.sub(r"[^A-Za-z0-9_]", lambda m: f"%{ord(m.group()):06x}", key)
+    return f"{prefix}.{safe}" if prefix else safe
+
+
+def _hash64(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text(encoding="utf-8"))
@@ -0,0 +1,194 @@
+# src/qednet/data/state_store.py
+from __future__ import annotations
+
+import collections
+import hashlib
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS states (
+    id       TEXT PRIMARY KEY,
+    data     BLOB NOT NULL,
+    raw_size INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+PREFIX = "hash:"
+# Step fields holding one pretty-printed state / a list of hypotheses (traces, replay, verifier).
+STATE_FIELDS = ("state_before", "state_after", "goal", "state")
+LIST_FIELDS = ("ctx",)
+_SQL_BATCH = 500
+
+
+def state_id(text: str) -> str:
+    """Stable id of a pretty-printed state: "hash:" + blake2b-128 of its UTF-8 bytes."""
+    return PREFIX + hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def is_state_id(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(PREFIX) and len(value) == len(PREFIX) + 32
+
+
+class StateStore:
+    """
+    Content-addressed, deduplicated store for pretty-printed goals / contexts.
+    - put(text) / put_many(texts) -> "hash:..." ids; each distinct text is stored once.
+    - get(id) / get_many(ids) -> texts, one batched SELECT per 500 ids.
+    - intern_steps(steps) / resolve_steps(steps): swap step fields (STATE_FIELDS, LIST_FIELDS)
+      between text and ids in place, with one round-trip per call.
+    Notes:
+      * Blobs are zlib-compressed in SQLite (WAL, busy timeout), so several exporter/trainer
+        processes can share one store; path=None keeps everything in memory.
+      * Ids depend only on the text, so equal states have equal ids across runs and machines:
+        comparing two states is a string compare on 37 characters.
+    """
+
+    def __init__(
+        self, path: Optional[Union[str, Path]] = None, level: int = 6, max_memory_items: int = 100_000
+    ) -> None:
+        self.path = Path(path) if path else None
+        self.level = level
+        self.max_memory_items = max_memory_items
+        self.puts = 0
+        self.dedup_hits = 0
+        self._lock = threading.Lock()
+        # Recently written/read ids -> text: consecutive steps share states, so most repeats stop here.
+        self._lru: "collections.OrderedDict[str, str]" = collections.OrderedDict()
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            str(self.path) if self.path else ":memory:", timeout=30, check_same_thread=False, isolation_level=None
+        )
+        if self.path is not None:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    # ---------- Public API ----------
+
+    def put(self, text: str) -> str:
+        return self.put_many([text])[0]
+
+    def put_many(self, texts: Sequence[str]) -> List[str]:
+        ids = [state_id(t) for t in texts]
+        with self._lock:
+            self.puts += len(texts)
+            fresh: Dict[str, str] = {}
+            for sid, text in zip(ids, texts):
+                if sid in self._lru:
+                    self._lru.move_to_end(sid)
+                    self.dedup_hits += 1
+                elif sid in fresh:
+                    self.dedup_hits += 1
+                else:
+                    fresh[sid] = text
+            if fresh:
+                rows = []
+                for sid, text in fresh.items():
+                    raw = text.encode("utf-8")
+                    rows.append((sid, zlib.compress(raw, self.level), len(raw)))
+                self._db.execute("BEGIN")
+                try:
+                    cur = self._db.executemany("INSERT OR IGNORE INTO states(id, data, raw_size) VALUES (?, ?, ?)", rows)
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+                self.dedup_hits += len(rows) - max(cur.rowcount, 0)
+                for sid, text in fresh.items():
+                    self._remember(sid, text)
+        return ids
+
+    def get(self, sid: str) -> str:
+        return self.get_many([sid])[0]
+
+    def get_many(self, ids: Sequence[str]) -> List[str]:
+        """Texts for `ids` in order; raises KeyError for an id the store has never seen."""
+        with self._lock:
+            found: Dict[str, str] = {}
+            missing = []
+            for sid in dict.fromkeys(ids):
+                text = self._lru.get(sid)
+                if text is None:
+                    missing.append(sid)
+                else:
+                    found[sid] = text
+            for i in range(0, len(missing), _SQL_BATCH):
+                chunk = missing[i : i + _SQL_BATCH]
+                q = f"SELECT id, data FROM states WHERE id IN ({','.join('?' * len(chunk))})"
+                for sid, data in self._db.execute(q, chunk):
+                    found[sid] = zlib.decompress(data).decode("utf-8")
+                    self._remember(sid, found[sid])
+        try:
+            return [found[sid] for sid in ids]
+        except KeyError as e:
+            raise KeyError(f"Unknown state id: {e.args[0]}") from None
+
+    def __contains__(self, sid: str) -> bool:
+        with self._lock:
+            if sid in self._lru:
+                return True
+            return self._db.execute("SELECT 1 FROM states WHERE id = ?", (sid,)).fetchone() is not None
+
+    def intern_steps(self, steps: Iterable[Dict[str, Any]]) -> None:
+        """Replaces state text in `steps` (STATE_FIELDS, each entry of LIST_FIELDS) with ids."""
+        self._swap(steps, lambda s: isinstance(s, str) and not is_state_id(s), self.put_many)
+
+    def resolve_steps(self, steps: Iterable[Dict[str, Any]]) -> None:
+        """Inverse of intern_steps: replaces ids with their text."""
+        self._swap(steps, is_state_id, self.get_many)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            n, raw, stored = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM states"
+            ).fetchone()
+            return {
+                "states": n,
+                "raw_bytes": raw,
+                "stored_bytes": stored,
+                "puts": self.puts,
+                "dedup_hits": self.dedup_hits,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "StateStore":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # ---------- Internals ----------
+
+    def _remember(self, sid: str, text: str) -> None:
+        self._lru[sid] = text
+        self._lru.move_to_end(sid)
+        while len(self._lru) > self.max_memory_items:
+            self._lru.popitem(last=False)
+
+    @staticmethod
+    def _swap(steps: Iterable[Dict[str, Any]], want, convert) -> None:
+        steps = list(steps)
+        slots = []  # (step, field, list index or None)
+        for st in steps:
+            for f in STATE_FIELDS:
+                if want(st.get(f)):
+                    slots.append((st, f, None))
+            for f in LIST_FIELDS:
+                vals = st.get(f)
+                if isinstance(vals, list):
+                    slots.extend((st, f, i) for i, v in enumerate(vals) if want(v))
+        if not slots:
+            return
+        out = convert([st[f] if i is None else st[f][i] for st, f, i in slots])
+        for (st, f, i), v in zip(slots, out):
+            if i is None:
+                st[f] = v
+            else:
+                st[f][i] = v
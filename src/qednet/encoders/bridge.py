@@ -0,0 +1,258 @@
+# src/qednet/encoders/bridge.py
+from __future__ import annotations
+
+import collections
+import json
+import threading
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..data.lexer import STATE_TOKEN
+from ..io.lean_rpc import LeanState, parse_goal
+
+_VOCAB_VERSION = 1
+PAD, UNK, CLS, SEP = 0, 1, 2, 3
+_SPECIALS = ("[PAD]", "[UNK]", "[CLS]", "[SEP]")
+# Lean notation and core names every vocabulary starts with (ids are stable across corpora).
+_LEAN_SYMBOLS = (
+    "⊢", "∀", "∃", "λ", "fun", "↦", "=>", "→", "←", "↔", "∧", "∨", "¬", "=", "≠", "<", ">", "≤", "≥",
+    "+", "-", "*", "/", "^", "%", "∣", "∈", "∉", "⊆", "⊂", "∪", "∩", "∅", "ᶜ", "⁻¹", "∘", "×", "•",
+    "∑", "∏", "∫", "∞", "↑", "⇑", "↥", "‖", "|", "⌊", "⌋", "⌈", "⌉", "⊤", "⊥", "⊔", "⊓", "≃", "≅", "≡", "∼",
+    "(", ")", "[", "]", "{", "}", "⟨", "⟩", "⦃", "⦄", ",", ":", ":=", "·", "✝",
+    "ℕ", "ℤ", "ℚ", "ℝ", "ℂ", "Prop", "Type", "Sort", "True", "False", "Nat", "Int", "Real", "Set", "Finset",
+    "List", "let", "have", "show", "from", "if", "then", "else", "match", "with", "at", "by",
+    "0", "1", "2",
+)
+Encodable = Union[LeanState, str]
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]  # (state text, hypothesis-graph edges)
+
+
+def state_tokens(text: str) -> List[str]:
+    """
+    Lexical tokens of a pretty-printed goal or hypothesis, in order and case-preserved:
+    (dotted) identifiers, numerals, operators, unicode symbols (⁻¹ and x✝¹'s ✝¹ are one token
+    each) and brackets.
+    """
+    return STATE_TOKEN.findall(text)
+
+
+class LeanVocab:
+    """
+    Token -> id map for Lean states: special tokens, the built-in Lean symbol table, then corpus
+    tokens (build / save), then `buckets` hashed ids shared by everything else.
+    - build(texts, max_size, min_freq): the most frequent tokens of a corpus.
+    - ids(tokens) -> List[int]; len(vocab) sizes an embedding table.
+    Notes:
+      * An unknown dotted name (Nat.succ_le_iff) is encoded by its components when the whole
+        name is not in the vocabulary, each known or hashed (crc32) into a bucket, so unseen
+        lemma names still share ids with their namespaces.
+      * LeanVocab(path) reads the file on first use, not at construction.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, buckets: int = 1024) -> None:
+        self.path = Path(path) if path is not None else None
+        self.buckets = buckets
+        self._index: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    # ---------- Public API ----------
+
+    @classmethod
+    def build(cls, texts: Iterable[str], max_size: int = 32_000, min_freq: int = 2, buckets: int = 1024) -> "LeanVocab":
+        counts: Counter = Counter()
+        for text in texts:
+            counts.update(state_tokens(text))
+        vocab = cls(buckets=buckets)
+        index = vocab._base()
+        for tok, n in counts.most_common():
+            if len(index) >= max_size or n < min_freq:
+                break
+            index.setdefault(tok, len(index))
+        vocab._index = index
+        return vocab
+
+    def save(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        index = self._terms()
+        terms = sorted(index, key=index.__getitem__)
+        payload = {"version": _VOCAB_VERSION, "buckets": self.buckets, "terms": terms}
+        path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        return path
+
+    @property
+    def loaded(self) -> bool:
+        return self._index is not None
+
+    def __len__(self) -> int:
+        return len(self._terms()) + self.buckets
+
+    def __contains__(self, token: str) -> bool:
+        return token in self._terms()
+
+    def ids(self, tokens: Iterable[str]) -> List[int]:
+        index = self._terms()
+        out: List[int] = []
+        for tok in tokens:
+            i = index.get(tok)
+            if i is not None:
+                out.append(i)
+            elif "." in tok.strip("."):
+                out.extend(index[p] if p in index else self._bucket(index, p) for p in tok.split(".") if p)
+            else:
+                out.append(self._bucket(index, tok))
+        return out
+
+    # ---------- Internals ----------
+
+    def _terms(self) -> Dict[str, int]:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._read() if self.path is not None else self._base()
+        return self._index
+
+    def _read(self) -> Dict[str, int]:
+        assert self.path is not None
+        payload = json.loads(self.path.read_text(encoding="utf-8"))
+        if payload.get("version") != _VOCAB_VERSION:
+            raise ValueError(f"Unsupported vocabulary version: {payload.get('version')}")
+        self.buckets = int(payload["buckets"])
+        return {t: i for i, t in enumerate(payload["terms"])}
+
+    @staticmethod
+    def _base() -> Dict[str, int]:
+        index: Dict[str, int] = {}
+        for tok in (*_SPECIALS, *_LEAN_SYMBOLS):
+            index.setdefault(tok, len(index))
+        return index
+
+    def _bucket(self, index: Dict[str, int], tok: str) -> int:
+        if self.buckets <= 0:
+            return UNK
+        return len(index) + zlib.crc32(tok.encode("utf-8")) % self.buckets
+
+
+class StateEncoder:
+    """
+    Batched encoder: LeanStates (or pretty-printed "hyps / ⊢ goal" strings) -> padded arrays.
+    - encode_batch(states) -> {"tokens", "mask", "token_node", "lengths", "num_nodes",
+      "edge_index", "batch"} (see encode_batch).
+    - encode(state) -> (token ids, token node ids, (2, e) local edges, node count) of one state.
+    Notes:
+      * A state is laid out as [CLS] goal [SEP] hyp_1 [SEP] ... hyp_n [SEP], truncated to
+        max_len; graph node 0 is the goal ("⊢"), node i is hypothesis i (one per pp_ctx entry).
+      * Hypothesis-graph edges come from LeanState.hyp_graph_edges: (a, b) becomes a -> b
+        between the nodes declaring a and b.
+      * Per-state encodings are memoized in an LRU cache keyed by the normalized state text
+        and its edges; search and replay see the same states over and over. Thread-safe.
+    """
+
+    def __init__(self, vocab: Optional[LeanVocab] = None, max_len: int = 512, cache_size: int = 65_536) -> None:
+        self.vocab = vocab if vocab is not None else LeanVocab()
+        self.max_len = max_len
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: "collections.OrderedDict[_Key, Tuple[np.ndarray, np.ndarray, np.ndarray, int]]" = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    # ---------- Public API ----------
+
+    def encode_batch(self, states: Sequence[Encodable]) -> Dict[str, np.ndarray]:
+        """
+        tokens (B, L) int32 padded with PAD, mask (B, L) bool, token_node (B, L) int32 (node of
+        each token within its state, -1 on padding), lengths (B,), num_nodes (B,), and the
+        states' hypothesis graphs batched PyG-style: edge_index (2, E) int64 over the
+        concatenated nodes and batch (N,) int64, the state index of every node.
+        L is the longest encoded state of the batch.
+        """
+        encoded = [self.encode(s) for s in states]
+        lengths = np.array([len(e[0]) for e in encoded], dtype=np.int64)
+        num_nodes = np.array([e[3] for e in encoded], dtype=np.int64)
+        width = int(lengths.max()) if len(encoded) else 0
+        mask = np.arange(width) < lengths[:, None]
+        tokens = np.full((len(encoded), width), PAD, dtype=np.int32)
+        token_node = np.full((len(encoded), width), -1, dtype=np.int32)
+        if len(encoded):
+            tokens[mask] = np.concatenate([e[0] for e in encoded])
+            token_node[mask] = np.concatenate([e[1] for e in encoded])
+        offsets = np.concatenate([[0], np.cumsum(num_nodes)[:-1]]).astype(np.int64)
+        edge_counts = np.array([e[2].shape[1] for e in encoded], dtype=np.int64)
+        if edge_counts.sum():
+            edge_index = np.concatenate([e[2] for e in encoded], axis=1) + np.repeat(offsets, edge_counts)
+        else:
+            edge_index = np.zeros((2, 0), dtype=np.int64)
+        return {
+            "tokens": tokens,
+            "mask": mask,
+            "token_node": token_node,
+            "lengths": lengths,
+            "num_nodes": num_nodes,
+            "edge_index": edge_index,
+            "batch": np.repeat(np.arange(len(encoded), dtype=np.int64), num_nodes),
+        }
+
+    def encode(self, state: Encodable) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        goal, ctx, edges = self._parts(state)
+        # The edges are part of the value, so they are part of the key: a LeanState may carry
+        # edges that differ from the ones parse_goal would derive from the same text.
+        key = ("\n".join([*ctx, "⊢ " + goal]), tuple((a, b) for a, b in edges))
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return hit
+            self.misses += 1
+        enc = self._encode(goal, ctx, edges)
+        with self._lock:
+            self._cache[key] = enc
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return enc
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self._cache), "vocab": len(self.vocab)}
+
+    # ---------- Internals ----------
+
+    @staticmethod
+    def _parts(state: Encodable) -> Tuple[str, List[str], Sequence[Tuple[str, str]]]:
+        if isinstance(state, str):
+            state = parse_goal(state)
+        goal = " ".join(state.pp_goal.split())
+        return goal, [" ".join(h.split()) for h in state.pp_ctx], state.hyp_graph_edges
+
+    def _encode(
+        self, goal: str, ctx: List[str], edges: Sequence[Tuple[str, str]]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        ids: List[int] = [CLS]
+        nodes: List[int] = [0]
+        for node, text in enumerate([goal, *ctx]):
+            part = self.vocab.ids(state_tokens(text))
+            ids += part + [SEP]
+            nodes += [node] * (len(part) + 1)
+            if len(ids) >= self.max_len:
+                break
+        owner: Dict[str, int] = {"⊢": 0}
+        for i, hyp in enumerate(ctx):
+            names, sep, _ = hyp.partition(" : ")
+            for name in names.split() if sep else ():
+                owner.setdefault(name, i + 1)
+        # One edge per node pair: `a b : ℕ` declares two names on one node.
+        pairs = list(dict.fromkeys((owner[a], owner[b]) for a, b in edges if a in owner and b in owner))
+        arrays = (
+            np.array(ids[: self.max_len], dtype=np.int32),
+            np.array(nodes[: self.max_len], dtype=np.int32),
+            np.array(pairs, dtype=np.int64).T.reshape(2, -1),
+        )
+        for a in arrays:
+            a.flags.writeable = False  # shared through the cache
+        return (*arrays, len(ctx) + 1)
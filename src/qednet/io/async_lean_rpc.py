@@ -0,0 +1,126 @@
+# src/qednet/io/async_lean_rpc.py
+from __future__ import annotations
+
+import asyncio
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from .lean_rpc import _LEAN_TIMEOUT_SEC, LeanRPC, LeanState, StepResult
+
+
+class AsyncLeanRPC:
+    """
+    asyncio-native counterpart of LeanRPC (one `lean <file>` subprocess per call).
+    - await fetch_goal(theorem_name) / await check_tactic(goal_type, script): same results as LeanRPC.
+    - Every call takes its own budget: `timeout_sec` (relative) and/or `deadline` (absolute,
+      on the running loop's clock, i.e. `loop.time()`); the earlier one wins.
+    Notes:
+      * Cancelling the awaiting task kills the Lean process immediately, so a pruned branch
+        stops burning CPU as soon as the controller gives up on it.
+      * `max_concurrency` caps live Lean processes; time spent waiting for a slot counts
+        against the call's deadline.
+    """
+
+    def __init__(
+        self,
+        imports: Optional[List[str]] = None,
+        extra_prelude: str = "",
+        workdir: Optional[Path] = None,
+        timeout_sec: float = _LEAN_TIMEOUT_SEC,
+        lean_cmd: Optional[List[str]] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> None:
+        # Source generation and output parsing are shared with the blocking client.
+        self._rpc = LeanRPC(
+            imports=imports,
+            extra_prelude=extra_prelude,
+            workdir=workdir,
+            lean_cmd=lean_cmd,
+        )
+        self.timeout_sec = timeout_sec
+        self._slots = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    # ---------- Public API ----------
+
+    async def fetch_goal(
+        self, theorem_name: str, timeout_sec: Optional[float] = None, deadline: Optional[float] = None
+    ) -> LeanState:
+        src = self._rpc._preamble() + f"\n#check {theorem_name}\n"
+        ok, out, err = await self._run_lean(src, f"check_{theorem_name}", timeout_sec, deadline)
+        return LeanRPC._goal_from_output(theorem_name, ok, out, err)
+
+    async def check_tactic(
+        self,
+        goal_type: str,
+        tactic_script: str,
+        theorem_name: str = "__tmp",
+        timeout_sec: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ) -> StepResult:
+        src = self._rpc._preamble() + "\n" + self._rpc._check_body(goal_type, tactic_script, theorem_name)
+        ok, out, err = await self._run_lean(src, f"prove_{theorem_name}", timeout_sec, deadline)
+        return LeanRPC._step_from_output(goal_type, theorem_name, ok, out, err)
+
+    async def check_tactics(
+        self,
+        goal_type: str,
+        scripts: Sequence[str],
+        theorem_name: str = "__tmp",
+        timeout_sec: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ) -> List[StepResult]:
+        """Checks all scripts concurrently; results are in input order."""
+        return list(await asyncio.gather(*(
+            self.check_tactic(goal_type, s, theorem_name, timeout_sec=timeout_sec, deadline=deadline)
+            for s in scripts
+        )))
+
+    # ---------- Internals ----------
+
+    def _deadline(self, timeout_sec: Optional[float], deadline: Optional[float]) -> float:
+        now = asyncio.get_running_loop().time()
+        when = now + (self.timeout_sec if timeout_sec is None else timeout_sec)
+        return when if deadline is None else min(when, deadline)
+
+    async def _run_lean(
+        self, lean_source: str, label: str, timeout_sec: Optional[float], deadline: Optional[float]
+    ) -> Tuple[bool, str, str]:
+        """
+        Async twin of LeanRPC._run_lean. Returns (ok, stdout, stderr).
+        """
+        when = self._deadline(timeout_sec, deadline)
+        budget = when - asyncio.get_running_loop().time()
+        with tempfile.TemporaryDirectory(prefix="qednet_lean_") as tmpdir:
+            src_path = Path(tmpdir) / f"{label}.lean"
+            src_path.write_text(lean_source, encoding="utf-8")
+            cmd = [*self._rpc._lean_cmd, str(src_path)]
+            try:
+                async with asyncio.timeout_at(when):
+                    if self._slots is None:
+                        return await self._spawn(cmd)
+                    async with self._slots:
+                        return await self._spawn(cmd)
+            except TimeoutError:
+                return False, "", f"Lean timed out after {max(budget, 0):.3g}s running {cmd}"
+            except OSError as e:
+                return False, "", f"Failed to run Lean: {e}"
+
+    async def _spawn(self, cmd: List[str]) -> Tuple[bool, str, str]:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=str(self._rpc.workdir) if self._rpc.workdir else None,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            out_b, err_b = await proc.communicate()
+        except asyncio.CancelledError:
+            # Deadline hit or caller cancelled: don't let Lean keep elaborating.
+            if proc.returncode is None:
+                proc.kill()
+            await asyncio.shield(proc.wait())
+            raise
+        out = out_b.decode("utf-8", errors="replace")
+        err = err_b.decode("utf-8", errors="replace")
+        return proc.returncode == 0, out, err
@@ -0,0 +1,216 @@
+# src/qednet/io/governor.py
+from __future__ import annotations
+
+import collections
+import contextlib
+import os
+import shutil
+import subprocess
+import threading
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+# StepResult.reason values for failed results.
+REASON_TIMEOUT = "timeout"        # wall-clock budget exceeded (worker / process killed)
+REASON_HEARTBEATS = "heartbeats"  # Lean's deterministic maxHeartbeats limit
+REASON_OOM = "oom"                # memory cap hit: the allocator failed inside Lean
+REASON_CRASH = "crash"            # runner failure unrelated to the script's cost
+REASON_ERROR = "error"            # an ordinary elaboration error: the script is wrong
+
+_DEFAULT_HEARTBEATS = 200_000
+_RECENT = 1024
+_MAX_GOALS = 100_000
+
+
+def failure_reason(error: Optional[str]) -> str:
+    """Classifies a failed StepResult's error text into one of the REASON_* values."""
+    text = error or ""
+    low = text.lower()
+    if "maximum number of heartbeats" in low or "(deterministic) timeout" in low:
+        return REASON_HEARTBEATS
+    if "out of memory" in low or "bad_alloc" in low or "cannot allocate memory" in low:
+        return REASON_OOM
+    # SIGXCPU: RLIMIT_CPU's soft limit, i.e. the CPU budget ran out. A bare SIGKILL (-9 / 137)
+    # may be the OOM killer, the CPU hard limit or anyone else: it stays a crash.
+    if text.startswith("Lean timed out") or "exit code -24)" in low or "exit code 152)" in low:
+        return REASON_TIMEOUT
+    if text.startswith(("Lean worker failed", "Failed to run Lean")):
+        return REASON_CRASH
+    return REASON_ERROR
+
+
+def tree_rss_bytes(pid: int) -> int:
+    """Resident memory of `pid` and its descendants (`lake env repl` runs Lean as a child); Linux /proc."""
+    page = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    todo, seen = [pid], set()
+    while todo:
+        p = todo.pop()
+        if p in seen:
+            continue
+        seen.add(p)
+        try:
+            with open(f"/proc/{p}/statm", "rb") as f:
+                total += int(f.read().split()[1]) * page
+            for tid in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{tid}/children", "rb") as f:
+                    todo.extend(int(c) for c in f.read().split())
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+
+@dataclass
+class ResourceLimits:
+    """
+    Caps for Lean processes (LeanRPC / LeanWorker / LeanPool `limits=`).
+    - memory_mb: RLIMIT_AS of every Lean process; allocations beyond it fail inside Lean (-> "oom").
+    - cpu_sec: RLIMIT_CPU (SIGXCPU -> "timeout"); counts over a process's whole life, so pair
+      it with max_requests for persistent workers.
+    - Caps are applied by spawn(), through prlimit rather than a preexec_fn.
+    - max_requests / max_rss_mb: recycle a persistent worker after that many requests, or once
+      its process tree's RSS passes the threshold (checked before each request).
+    """
+
+    memory_mb: Optional[int] = None
+    cpu_sec: Optional[int] = None
+    max_requests: Optional[int] = None
+    max_rss_mb: Optional[int] = None
+
+    def rlimits(self) -> Dict[str, Tuple[int, int]]:
+        """{"as" | "cpu": (soft, hard)} for the caps that are set."""
+        out: Dict[str, Tuple[int, int]] = {}
+        if self.memory_mb is not None:
+            out["as"] = (self.memory_mb << 20, self.memory_mb << 20)
+        if self.cpu_sec is not None:
+            out["cpu"] = (self.cpu_sec, self.cpu_sec + 5)
+        return out
+
+    def command(self, cmd: Sequence[str]) -> List[str]:
+        """
+        `cmd` behind util-linux prlimit(1), which sets the caps and then execs it, so they hold
+        from the first instruction and are inherited by Lean under `lake env`. Unchanged when
+        there are no caps or no prlimit binary (see spawn()).
+        """
+        caps = self.rlimits()
+        exe = shutil.which("prlimit") if caps else None
+        if exe is None:
+            return list(cmd)
+        return [exe, *(f"--{k}={soft}:{hard}" for k, (soft, hard) in caps.items()), "--", *cmd]
+
+    def apply(self, pid: int) -> None:
+        """Sets the caps on a running process (prlimit(2)); a process that already exited is ignored."""
+        import resource
+
+        names = {"as": resource.RLIMIT_AS, "cpu": resource.RLIMIT_CPU}
+        for k, lim in self.rlimits().items():
+            with contextlib.suppress(ProcessLookupError):
+                resource.prlimit(pid, names[k], lim)
+
+    def recycle_reason(self, requests: int, pid: Optional[int]) -> Optional[str]:
+        if self.max_requests is not None and requests >= self.max_requests:
+            return "max_requests"
+        if self.max_rss_mb is not None and pid is not None and tree_rss_bytes(pid) > self.max_rss_mb << 20:
+            return "max_rss"
+        return None
+
+
+def spawn(cmd: Sequence[str], limits: Optional[ResourceLimits] = None, **kwargs: Any) -> subprocess.Popen:
+    """
+    subprocess.Popen(cmd, **kwargs) under `limits`' caps. No preexec_fn (unsafe to fork with
+    one while other threads run, as in LeanPool): the command goes through prlimit(1), or,
+    without that binary, the caps are set with prlimit(2) right after the spawn.
+    """
+    if limits is None or not limits.rlimits():
+        return subprocess.Popen(list(cmd), **kwargs)
+    wrapped = limits.command(cmd)
+    proc = subprocess.Popen(wrapped, **kwargs)
+    if wrapped == list(cmd):
+        limits.apply(proc.pid)
+    return proc
+
+
+class AdaptiveBudget:
+    """
+    Per-goal wall-time / heartbeat budgets from observed elaboration times (LeanRPC `budget=`).
+    - budget(goal) -> (timeout_sec, max_heartbeats); observe(goal, elapsed_sec, reason).
+    Notes:
+      * timeout = slack x max(the goal's EMA, global p90), clamped to [min_timeout_sec,
+        max_timeout_sec]; before min_samples observations everything gets max_timeout_sec.
+      * Heartbeats scale with the goal's EMA relative to the global median: goals that usually
+        elaborate fast get a tighter limit, so a runaway `simp` on them fails early, while slow
+        goals may go up to max_heartbeats. Unseen goals get base_heartbeats.
+      * Only completed runs (valid or an ordinary error) are observed; timeouts and resource
+        failures are censored samples and would only inflate the budget on retries.
+      * Thread-safe; share one instance across a LeanPool so every slot learns from the others.
+    """
+
+    def __init__(
+        self,
+        min_timeout_sec: float = 5.0,
+        max_timeout_sec: float = 60.0,
+        slack: float = 4.0,
+        base_heartbeats: int = _DEFAULT_HEARTBEATS,
+        min_heartbeats: int = 50_000,
+        max_heartbeats: int = 1_000_000,
+        min_samples: int = 20,
+        alpha: float = 0.3,
+    ) -> None:
+        self.min_timeout_sec = min_timeout_sec
+        self.max_timeout_sec = max_timeout_sec
+        self.slack = slack
+        self.base_heartbeats = base_heartbeats
+        self.min_heartbeats = min_heartbeats
+        self.max_heartbeats = max_heartbeats
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._recent: Deque[float] = collections.deque(maxlen=_RECENT)
+        self._goals: "collections.OrderedDict[str, float]" = collections.OrderedDict()
+        self._quantiles: Optional[Tuple[float, float]] = None  # (median, p90), recomputed lazily
+
+    # ---------- Public API ----------
+
+    def budget(self, goal: str) -> Tuple[float, int]:
+        key = " ".join(goal.split())
+        with self._lock:
+            ema = self._goals.get(key)
+            if len(self._recent) < self.min_samples:
+                return self.max_timeout_sec, self.base_heartbeats
+            median, p90 = self._stats()
+        timeout = self.slack * max(ema or 0.0, p90)
+        timeout = min(self.max_timeout_sec, max(self.min_timeout_sec, timeout))
+        return timeout, self.base_heartbeats if ema is None else self._heartbeats(ema, median)
+
+    def observe(self, goal: str, elapsed_sec: Optional[float], reason: Optional[str] = None) -> None:
+        if elapsed_sec is None or reason not in (None, REASON_ERROR):
+            return
+        key = " ".join(goal.split())
+        with self._lock:
+            self._recent.append(elapsed_sec)
+            self._quantiles = None
+            prev = self._goals.pop(key, None)
+            self._goals[key] = elapsed_sec if prev is None else (1 - self.alpha) * prev + self.alpha * elapsed_sec
+            while len(self._goals) > _MAX_GOALS:
+                self._goals.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            if not self._recent:
+                return {"samples": 0, "goals": len(self._goals)}
+            median, p90 = self._stats()
+            return {"samples": len(self._recent), "goals": len(self._goals), "median_sec": median, "p90_sec": p90}
+
+    # ---------- Internals ----------
+
+    def _stats(self) -> Tuple[float, float]:
+        if self._quantiles is None:
+            xs: List[float] = sorted(self._recent)
+            self._quantiles = (xs[len(xs) // 2], xs[min(len(xs) - 1, int(0.9 * len(xs)))])
+        return self._quantiles
+
+    def _heartbeats(self, ema: float, median: float) -> int:
+        if median <= 0:
+            return self.base_heartbeats
+        hb = int(self.base_heartbeats * ema / median)
+        return min(self.max_heartbeats, max(self.min_heartbeats, hb))
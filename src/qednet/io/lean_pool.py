@@ -0,0 +1,161 @@
+# src/qednet/io/lean_pool.py
+from __future__ import annotations
+
+import collections
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Deque, Iterable, List, Optional, Sequence, Tuple
+
+from .lean_rpc import _LEAN_TIMEOUT_SEC, LeanRPC, StepResult
+
+if TYPE_CHECKING:
+    from .governor import AdaptiveBudget, ResourceLimits
+    from .metrics import LeanMetrics
+    from .verify_cache import VerificationCache
+
+Job = Callable[[LeanRPC], StepResult]
+
+
+class _Batch:
+    """One caller's submission: jobs still to hand out and the slots their results land in."""
+
+    __slots__ = ("jobs", "results", "pending", "done")
+
+    def __init__(self, jobs: Sequence[Job]) -> None:
+        self.jobs: Deque[Tuple[int, Job]] = collections.deque(enumerate(jobs))
+        self.results: List[Optional[StepResult]] = [None] * len(jobs)
+        self.pending = len(jobs)
+        self.done = threading.Event()
+
+
+class LeanPool:
+    """
+    N Lean workers verifying candidates in parallel.
+    - check_tactics(goal_type, scripts): many candidate scripts against one goal.
+    - check_tactics_many([(goal_type, script), ...]): cross-goal batch.
+    Notes:
+      * Each slot owns one LeanRPC (persistent REPL by default) driven by one thread; the threads
+        only wait on Lean's pipes, so throughput scales with the number of Lean processes.
+      * Batches from concurrent callers are served round-robin, one job at a time, so a large
+        batch cannot starve a small one. Results always come back in input order.
+      * A shared VerificationCache / LeanMetrics / AdaptiveBudget (all thread-safe) is used by
+        every slot; ResourceLimits apply to each slot's Lean process.
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        imports: Optional[List[str]] = None,
+        extra_prelude: str = "",
+        workdir: Optional[Path] = None,
+        timeout_sec: int = _LEAN_TIMEOUT_SEC,
+        persistent: bool = True,
+        lean_cmd: Optional[List[str]] = None,
+        repl_cmd: Optional[List[str]] = None,
+        cache: Optional["VerificationCache"] = None,
+        metrics: Optional["LeanMetrics"] = None,
+        limits: Optional["ResourceLimits"] = None,
+        budget: Optional["AdaptiveBudget"] = None,
+    ) -> None:
+        self.size = max(1, size or os.cpu_count() or 1)
+        self._rpcs = [
+            LeanRPC(
+                imports=imports,
+                extra_prelude=extra_prelude,
+                workdir=workdir,
+                timeout_sec=timeout_sec,
+                persistent=persistent,
+                lean_cmd=lean_cmd,
+                repl_cmd=repl_cmd,
+                cache=cache,
+                metrics=metrics,
+                limits=limits,
+                budget=budget,
+            )
+            for _ in range(self.size)
+        ]
+        self._cond = threading.Condition()
+        self._batches: Deque[_Batch] = collections.deque()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._serve, args=(rpc,), name=f"lean-pool-{i}", daemon=True)
+            for i, rpc in enumerate(self._rpcs)
+        ]
+        for t in self._threads:
+            t.start()
+
+    # ---------- Public API ----------
+
+    def check_tactics(self, goal_type: str, scripts: Sequence[str], theorem_name: str = "__tmp") -> List[StepResult]:
+        """Verifies every script against `goal_type`; result i belongs to scripts[i]."""
+        return self.map([self._check_job(goal_type, s, theorem_name) for s in scripts])
+
+    def check_tactics_many(self, items: Iterable[Tuple[str, str]], theorem_name: str = "__tmp") -> List[StepResult]:
+        """Verifies (goal_type, script) pairs that may belong to different goals, in input order."""
+        return self.map([self._check_job(g, s, theorem_name) for g, s in items])
+
+    def map(self, jobs: Sequence[Job]) -> List[StepResult]:
+        """Runs `job(rpc)` for each job on some worker; blocks until all are done."""
+        if not jobs:
+            return []
+        batch = _Batch(jobs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("LeanPool is closed.")
+            self._batches.append(batch)
+            self._cond.notify_all()
+        batch.done.wait()
+        return list(batch.results)  # type: ignore[arg-type]
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join()
+
+    def __enter__(self) -> "LeanPool":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # ---------- Internals ----------
+
+    @staticmethod
+    def _check_job(goal_type: str, script: str, theorem_name: str) -> Job:
+        return lambda rpc: rpc.check_tactic(goal_type, script, theorem_name=theorem_name)
+
+    def _next_job(self) -> Optional[Tuple[_Batch, int, Job]]:
+        with self._cond:
+            while not self._batches and not self._closed:
+                self._cond.wait()
+            if not self._batches:
+                return None
+            batch = self._batches[0]
+            idx, job = batch.jobs.popleft()
+            if batch.jobs:
+                self._batches.rotate(-1)
+            else:
+                self._batches.popleft()
+            return batch, idx, job
+
+    def _serve(self, rpc: LeanRPC) -> None:
+        try:
+            while True:
+                nxt = self._next_job()
+                if nxt is None:
+                    return
+                batch, idx, job = nxt
+                try:
+                    res = job(rpc)
+                except Exception as e:
+                    res = StepResult(valid=False, error=f"{type(e).__name__}: {e}")
+                with self._cond:
+                    batch.results[idx] = res
+                    batch.pending -= 1
+                    if batch.pending == 0:
+                        batch.done.set()
+        finally:
+            rpc.close()
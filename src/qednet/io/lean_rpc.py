@@ -1,24 +1,59 @@
 # src/qednet/io/lean_rpc.py
 from __future__ import annotations
 
+import bisect
+import contextlib
+import functools
+import json
 import os
 import re
+import select
 import shutil
 import subprocess
 import tempfile
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Callable, ContextManager, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .governor import _DEFAULT_HEARTBEATS, failure_reason, spawn
+from .lean_worker import LeanWorker, LeanWorkerError, LeanWorkerTimeout
+
+if TYPE_CHECKING:
+    from .governor import AdaptiveBudget, ResourceLimits
+    from .metrics import LeanMetrics
+    from .verify_cache import VerificationCache
 
 _LEAN_TIMEOUT_SEC = 60
+_FAIL_FAST_MAX_OUTPUT = 64 * 1024
+_ERROR_LINE = re.compile(rb"(^|:\d+:\d+: )error:")
+_IDENT = re.compile(r"[^\s()\[\]{}⟨⟩,:]+")
+_HANDLE = re.compile(r"([0-9a-f]+)\.(\d+)\.(\d+)")  # <worker id>.<epoch>.<REPL proofState>, see _handle
+_NO_TIMING = contextlib.nullcontext()
+
+
+def _instrumented(op: str) -> Callable:
+    """Counts calls_<op> and times the whole call as phase `total` when metrics are enabled."""
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(self: "LeanRPC", *args: Any, **kwargs: Any) -> Any:
+            m = self.metrics
+            if m is None:
+                return fn(self, *args, **kwargs)
+            m.incr(f"calls_{op}")
+            with m.time("total", op):
+                return fn(self, *args, **kwargs)
+        return wrapper
+    return deco
 
 
 @dataclass
 class LeanState:
     name: str
-    pp_goal: str                  # pretty-printed goal (theorem type)
-    pp_ctx: List[str]             # pretty-printed local context (empty in this MVP)
-    hyp_graph_edges: List[Tuple[str, str]]  # MVP: empty; fill later from parser
+    pp_goal: str                  # pretty-printed goal (theorem type / target after ⊢)
+    pp_ctx: List[str]             # pretty-printed local context, one hypothesis per entry
+    hyp_graph_edges: List[Tuple[str, str]]  # (a, b): b's type mentions hypothesis a; b may be "⊢"
+    proof_state: Optional[str] = None  # opaque step() handle into the persistent worker
 
 
 @dataclass
@@ -28,17 +63,83 @@ class StepResult:
     error: Optional[str] = None
     stdout: Optional[str] = None
     stderr: Optional[str] = None
+    elapsed_sec: Optional[float] = None  # wall time of the Lean run that produced this result
+    goals: Optional[List[LeanState]] = None  # step() only: every remaining goal ([] = proof done)
+    saved_sec: Optional[float] = None    # fail-fast only: estimated wall time skipped by aborting
+    reason: Optional[str] = None         # failures only: timeout | heartbeats | oom | crash | error
+
+    def __post_init__(self) -> None:
+        if not self.valid and self.reason is None:
+            self.reason = failure_reason(self.error or self.stderr)
+
+
+@dataclass
+class GoalBatch:
+    states: Dict[str, LeanState]  # theorem name -> goal, for every name Lean resolved
+    errors: Dict[str, str]        # theorem name -> concise Lean error, for every name it did not
+
+
+def parse_goal(text: str, name: str = "") -> LeanState:
+    """
+    Splits a pretty-printed goal (`case tag` / hypotheses / `⊢ target`) into a LeanState.
+    Indented lines continue the previous hypothesis (or the target).
+    """
+    ctx: List[str] = []
+    target: List[str] = []
+    for ln in text.splitlines():
+        if ln.startswith("case ") and not ctx and not target:
+            continue
+        if ln.startswith("⊢"):
+            target.append(ln[1:].strip())
+        elif target:
+            target.append(ln.strip())
+        elif ln[:1].isspace() and ctx:
+            ctx[-1] += " " + ln.strip()
+        elif ln.strip():
+            ctx.append(ln.strip())
+    goal = " ".join(target)
+    return LeanState(name=name, pp_goal=goal, pp_ctx=ctx, hyp_graph_edges=hyp_edges(ctx, goal))
+
+
+def hyp_edges(ctx: List[str], goal: str) -> List[Tuple[str, str]]:
+    """(a, b) for every hypothesis a whose name occurs in the type of b (or of the target "⊢")."""
+    typed: List[Tuple[List[str], str]] = []
+    for hyp in ctx:
+        names, sep, ty = hyp.partition(" : ")
+        if sep:
+            typed.append((names.split(), ty))
+    known = {n for names, _ in typed for n in names}
+    edges: List[Tuple[str, str]] = []
+    for names, ty in typed + [(["⊢"], goal)]:
+        mentioned = known.intersection(_IDENT.findall(ty))
+        edges += [(a, b) for b in names for a in sorted(mentioned) if a != b]
+    return edges
 
 
 class LeanRPC:
     """
     Minimal Lean runner used by QEDNet MVP.
     - fetch_goal(theorem_name): returns theorem type (as pp_goal).
+    - fetch_goal_many(names): resolves many theorem types per Lean run (chunked).
     - check_tactic(goal_type, script): verifies a tactic script that proves `goal_type`.
+    - check_tactic_batch([(goal_type, script), ...]): many candidates per Lean run, one result each.
+    - start_proof(goal_type) / step(state, tactic): incremental stepping (persistent=True only);
+      each step elaborates one tactic on a snapshot kept in the worker, not the whole prefix.
     Notes:
-      * This does NOT speak LSP/JSON-RPC. It shells out to Lean/Lake with temp files.
+      * This does NOT speak LSP/JSON-RPC. By default it shells out to Lean/Lake with temp files.
       * For Mathlib4 availability, we try `lake env lean` first (if inside a Lake project),
         else fallback to `lean` on PATH (must have mathlib precompiled in that toolchain).
+      * persistent=True keeps one Lean REPL process alive (see LeanWorker): the imports +
+        extra_prelude header is loaded once and every call only pays for its own elaboration.
+      * cache=VerificationCache(...) answers repeated (goal, script) / theorem lookups without Lean.
+      * fail_fast=True (file mode) streams Lean's output, kills it at the first `error:` and keeps
+        at most `max_output_bytes` per stream; most search candidates are wrong, so this skips
+        elaborating the rest of the file and its cascading errors.
+      * metrics=LeanMetrics() records per-phase timings and counters (see qednet.io.metrics).
+      * limits=ResourceLimits(...) caps Lean's memory / CPU and recycles the persistent worker;
+        budget=AdaptiveBudget() sets check_tactic's timeout and maxHeartbeats (step's timeout)
+        per goal from observed elaboration times (see qednet.io.governor). Failed results carry
+        a structured `reason`, so search can penalize timeouts/OOMs instead of retrying them.
     """
 
     def __init__(
@@ -47,23 +148,285 @@ class LeanRPC:
         extra_prelude: str = "",
         workdir: Optional[Path] = None,
         timeout_sec: int = _LEAN_TIMEOUT_SEC,
+        persistent: bool = False,
+        lean_cmd: Optional[List[str]] = None,
+        repl_cmd: Optional[List[str]] = None,
+        cache: Optional["VerificationCache"] = None,
+        fail_fast: bool = False,
+        max_output_bytes: int = _FAIL_FAST_MAX_OUTPUT,
+        metrics: Optional["LeanMetrics"] = None,
+        limits: Optional["ResourceLimits"] = None,
+        budget: Optional["AdaptiveBudget"] = None,
     ) -> None:
         self.imports = imports or ["Mathlib"]
         self.extra_prelude = extra_prelude
         self.workdir = Path(workdir) if workdir else None
         self.timeout_sec = timeout_sec
-        self._lean_cmd = self._detect_lean_cmd()
+        self.persistent = persistent
+        self.repl_cmd = repl_cmd
+        self.cache = cache
+        self.fail_fast = fail_fast
+        self.max_output_bytes = max_output_bytes
+        self.metrics = metrics
+        self.limits = limits
+        self.budget = budget
+        self._lean_cmd = list(lean_cmd) if lean_cmd else (None if persistent else self._detect_lean_cmd())
+        self._lean_worker: Optional[LeanWorker] = None
+        # Timing of the latest run, and a running estimate of a full (un-aborted) run.
+        self._last_run: Dict[str, Any] = {}
+        self._full_run_sec: Optional[float] = None
 
     # ---------- Public API ----------
 
+    @_instrumented("fetch_goal")
     def fetch_goal(self, theorem_name: str) -> LeanState:
         """
         Uses `#check <name>` to retrieve the theorem's type.
         Returns LeanState with pp_goal set to the type; ctx/graph empty in MVP.
         """
-        src = self._preamble() + f"\n#check {theorem_name}\n"
-        ok, out, err = self._run_lean(src, label=f"check_{theorem_name}")
+        key = None
+        if self.cache is not None:
+            key = self.cache.key("goal", self.imports, self.extra_prelude, theorem_name)
+            hit = self._cached(self.cache.get_state, key)
+            if hit is not None:
+                return hit
+
+        ok, out, err = self._run(f"#check {theorem_name}\n", label=f"check_{theorem_name}")
+        with self._timed("parse"):
+            st = self._goal_from_output(theorem_name, ok, out, err)
+        if key is not None:
+            self.cache.put_state(key, st)
+        return st
+
+    @_instrumented("fetch_goal_many")
+    def fetch_goal_many(self, theorem_names: Iterable[str], chunk_size: int = 1000) -> GoalBatch:
+        """
+        Emits one `#check @<name>` line per theorem, `chunk_size` names per Lean run (or per
+        command when persistent). Each diagnostic is routed back to its name by source line,
+        so an unknown name only lands in `errors`; a chunk whose run dies is bisected.
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        batch = GoalBatch(states={}, errors={})
+        todo: List[str] = []
+        for name in dict.fromkeys(theorem_names):
+            if self.cache is not None:
+                hit = self._cached(self.cache.get_state, self.cache.key("goal", self.imports, self.extra_prelude, name))
+                if hit is not None:
+                    batch.states[name] = hit
+                    continue
+            todo.append(name)
+        for i in range(0, len(todo), chunk_size):
+            self._fetch_chunk(todo[i:i + chunk_size], batch)
+        return batch
+
+    @_instrumented("check_tactic")
+    def check_tactic(self, goal_type: str, tactic_script: str, theorem_name: str = "__tmp") -> StepResult:
+        """
+        Compiles a small Lean file:
+            theorem __tmp : <goal_type> := by
+              <tactic_script>
+        Returns StepResult(valid=...) and raw stdout/stderr for debugging.
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(
+                "tactic",
+                self.imports,
+                self.extra_prelude,
+                self.cache.normalize_goal(goal_type),
+                self.cache.normalize_script(tactic_script),
+                theorem_name,
+            )
+            hit = self._cached(self.cache.get_step, key)
+            if hit is not None:
+                return hit
+
+        timeout, heartbeats = self.budget.budget(goal_type) if self.budget is not None else (None, _DEFAULT_HEARTBEATS)
+        body = self._check_body(goal_type, tactic_script, theorem_name, heartbeats)
+        t0 = time.perf_counter()
+        ok, out, err = self._run(body, label=f"prove_{theorem_name}", timeout_sec=timeout)
+        with self._timed("parse"):
+            res = self._step_from_output(goal_type, theorem_name, ok, out, err)
+        res.elapsed_sec = time.perf_counter() - t0
+        res.saved_sec = self._last_run.get("saved_sec")
+        if self.budget is not None:
+            self.budget.observe(goal_type, res.elapsed_sec, res.reason)
+        if key is not None:
+            self.cache.put_step(key, res)
+        return res
+
+    @_instrumented("start_proof")
+    def start_proof(self, goal_type: str, theorem_name: str = "__tmp") -> LeanState:
+        """
+        Opens `theorem <name> : <goal_type> := by sorry` in the worker and returns its goal with a
+        `proof_state` handle for step().
+        """
+        if not self.persistent:
+            raise RuntimeError("start_proof/step require LeanRPC(persistent=True).")
+        worker = self._worker()
+        try:
+            resp = worker.command(self._check_body(goal_type, "sorry", theorem_name))
+        except LeanWorkerError as e:
+            raise RuntimeError(f"Lean worker failed while opening goal '{goal_type}': {e}") from e
+        ok, out, _ = self._render_repl_response(resp, f"prove_{theorem_name}")
+        sorries = resp.get("sorries") or []
+        if not ok or not sorries:
+            raise RuntimeError(f"Lean rejected goal '{goal_type}':\n{out or resp}")
+        st = parse_goal(sorries[0].get("goal", ""), theorem_name)
+        st.proof_state = self._handle(worker, sorries[0]["proofState"])
+        return st
+
+    @_instrumented("step")
+    def step(self, state: LeanState, tactic: str) -> StepResult:
+        """
+        Applies one tactic to `state.proof_state`. On success `goals` lists every remaining goal
+        (with local contexts) under a new handle and `new_state` is the first of them
+        (an empty pp_goal once the proof is complete).
+        """
+        if not self.persistent:
+            raise RuntimeError("start_proof/step require LeanRPC(persistent=True).")
+        worker = self._lean_worker
+        ps = self._resolve_handle(worker, state.proof_state)
+        if worker is None or ps is None:
+            return StepResult(valid=False, error="Stale or foreign proof_state handle (worker restarted?); "
+                                                 "re-open the goal with start_proof().")
+        timeout = self.budget.budget(state.pp_goal)[0] if self.budget is not None else self.timeout_sec
+        t0 = time.perf_counter()
+        try:
+            resp = worker.tactic(ps, self._dedent(tactic).strip(), timeout_sec=timeout)
+        except LeanWorkerTimeout as te:
+            return StepResult(valid=False, error=f"Lean timed out after {timeout:g}s running step: {te}",
+                              elapsed_sec=time.perf_counter() - t0)
+        except LeanWorkerError as e:
+            return StepResult(valid=False, error=f"Lean worker failed: {e}", elapsed_sec=time.perf_counter() - t0)
+        elapsed = time.perf_counter() - t0
+        if self.budget is not None:
+            self.budget.observe(state.pp_goal, elapsed)
+
+        if "message" in resp and "proofState" not in resp:
+            text = str(resp["message"])
+            text = text[len("Lean error:"):].strip() if text.startswith("Lean error:") else text
+            return StepResult(valid=False, error=self._first_lean_error(text), stdout=text, elapsed_sec=elapsed)
+        ok, out, _ = self._render_repl_response(resp, "step")
+        if not ok:
+            return StepResult(valid=False, error=self._first_lean_error(out), stdout=out, elapsed_sec=elapsed)
+
+        handle = self._handle(worker, resp["proofState"])
+        goals = [parse_goal(g, state.name) for g in resp.get("goals", [])]
+        for g in goals:
+            g.proof_state = handle
+        new_state = goals[0] if goals else LeanState(
+            name=state.name, pp_goal="", pp_ctx=[], hyp_graph_edges=[], proof_state=handle
+        )
+        return StepResult(valid=True, new_state=new_state, goals=goals, stdout=out, elapsed_sec=elapsed)
+
+    @_instrumented("check_tactic_batch")
+    def check_tactic_batch(
+        self,
+        items: Iterable[Tuple[str, str]],
+        isolation: str = "namespace",
+        chunk_size: int = 64,
+    ) -> List[StepResult]:
+        """
+        Verifies many (goal_type, script) pairs with one Lean run per `chunk_size` pairs:
+            namespace __qednet_b<i>            section
+            theorem __tmp : <goal> := by   or  theorem __tmp_<i> : <goal> := by
+              <script>                           <script>
+            end __qednet_b<i>                  end
+        Diagnostics are routed back to their block by line range. A block is valid only if it
+        has no error and no `declaration uses 'sorry'` warning. A run that dies is bisected.
+        elapsed_sec is the run's wall time split evenly across its blocks.
+        """
+        if isolation not in ("namespace", "section"):
+            raise ValueError(f"isolation must be 'namespace' or 'section', got {isolation!r}")
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        items = list(items)
+        results: List[Optional[StepResult]] = [None] * len(items)
+        keys: Dict[int, str] = {}
+        todo: List[int] = []
+        for i, (goal_type, script) in enumerate(items):
+            if self.cache is not None:
+                keys[i] = self.cache.key(
+                    f"batch:{isolation}",
+                    self.imports,
+                    self.extra_prelude,
+                    self.cache.normalize_goal(goal_type),
+                    self.cache.normalize_script(script),
+                )
+                hit = self._cached(self.cache.get_step, keys[i])
+                if hit is not None:
+                    results[i] = hit
+                    continue
+            todo.append(i)
+        for j in range(0, len(todo), chunk_size):
+            self._check_chunk(items, todo[j:j + chunk_size], isolation, results)
+        if self.cache is not None:
+            for i in todo:
+                self.cache.put_step(keys[i], results[i])
+        return results  # type: ignore[return-value]
+
+    def check_tactics(self, goal_type: str, scripts: List[str], theorem_name: str = "__tmp") -> List[StepResult]:
+        """
+        Sequential counterpart of LeanPool.check_tactics (same signature, one Lean at a time).
+        """
+        return [self.check_tactic(goal_type, s, theorem_name=theorem_name) for s in scripts]
+
+    def close(self) -> None:
+        """Stops the persistent worker, if any (a later call restarts it)."""
+        if self._lean_worker is not None:
+            self._lean_worker.close()
+            self._lean_worker = None
+
+    def __enter__(self) -> "LeanRPC":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # ---------- Internals ----------
+
+    def _timed(self, phase: str, op: str = "") -> ContextManager[Any]:
+        return self.metrics.time(phase, op) if self.metrics is not None else _NO_TIMING
+
+    def _count(self, event: str) -> None:
+        if self.metrics is not None:
+            self.metrics.incr(event)
+
+    def _cached(self, getter: Callable[[str], Any], key: str) -> Any:
+        hit = getter(key)
+        self._count("cache_hits" if hit is not None else "cache_misses")
+        return hit
+
+    def _check_body(
+        self, goal_type: str, tactic_script: str, theorem_name: str, heartbeats: int = _DEFAULT_HEARTBEATS
+    ) -> str:
+        body = "set_option maxRecDepth 10000\n"
+        body += f"set_option maxHeartbeats {heartbeats}\n\n"
+        # Normalize script indentation and ensure it's on new lines
+        script = self._dedent(tactic_script).rstrip() + "\n"
+        body += f"theorem {theorem_name} : {goal_type} := by\n"
+        body += self._indent(script, n=2)
+        return body
+
+    @classmethod
+    def _step_from_output(cls, goal_type: str, theorem_name: str, ok: bool, out: str, err: str) -> StepResult:
+        if ok:
+            # On success, we don’t yet have the next-state decomposition; return the same goal.
+            return StepResult(
+                valid=True,
+                new_state=LeanState(name=theorem_name, pp_goal=goal_type, pp_ctx=[], hyp_graph_edges=[]),
+                stdout=out,
+                stderr=err,
+            )
+        else:
+            # Extract a concise first error line for convenience.
+            concise = cls._first_lean_error(err or out)
+            return StepResult(valid=False, error=concise, stdout=out, stderr=err)
 
+    @staticmethod
+    def _goal_from_output(theorem_name: str, ok: bool, out: str, err: str) -> LeanState:
         if not ok:
             raise RuntimeError(f"Lean failed while fetching goal for '{theorem_name}':\n{err or out}")
 
@@ -96,37 +459,234 @@ class LeanRPC:
             hyp_graph_edges=[],
         )
 
-    def check_tactic(self, goal_type: str, tactic_script: str, theorem_name: str = "__tmp") -> StepResult:
+    def _fetch_chunk(self, names: List[str], batch: GoalBatch) -> None:
+        body = "".join(f"#check @{n}\n" for n in names)
+        msgs, failure, retryable = self._run_messages(body, label=f"check_many_{len(names)}")
+        if failure is not None:
+            if len(names) == 1 or not retryable:
+                # A lone name killed Lean, or the header itself is broken: nothing to bisect.
+                for n in names:
+                    batch.errors[n] = failure
+                return
+            mid = len(names) // 2
+            self._fetch_chunk(names[:mid], batch)
+            self._fetch_chunk(names[mid:], batch)
+            return
+
+        for msg in msgs:
+            line = (msg.get("pos") or {}).get("line", 0)
+            if not 1 <= line <= len(names):
+                continue
+            name = names[line - 1]
+            data = str(msg.get("data", ""))
+            if msg.get("severity") == "error":
+                col = (msg.get("pos") or {}).get("column", 0)
+                batch.errors.setdefault(name, f"{line}:{col}: error: {data}")
+            elif msg.get("severity") in ("info", "information") and name not in batch.states:
+                ty = self._split_signature(data)
+                if ty is not None:
+                    batch.states[name] = LeanState(name=name, pp_goal=ty, pp_ctx=[], hyp_graph_edges=[])
+        for name in names:
+            if name in batch.errors:
+                batch.states.pop(name, None)
+            elif name in batch.states:
+                if self.cache is not None:
+                    key = self.cache.key("goal", self.imports, self.extra_prelude, name)
+                    self.cache.put_state(key, batch.states[name])
+            else:
+                batch.errors[name] = f"Lean produced no type for `#check @{name}`"
+
+    def _check_chunk(
+        self,
+        items: List[Tuple[str, str]],
+        idxs: List[int],
+        isolation: str,
+        results: List[Optional[StepResult]],
+    ) -> None:
+        lines = ["set_option maxRecDepth 10000", f"set_option maxHeartbeats {_DEFAULT_HEARTBEATS}", ""]
+        spans: List[Tuple[int, int]] = []   # 1-based inclusive line range of each block
+        names: List[str] = []
+        for k, i in enumerate(idxs):
+            goal_type, script = items[i]
+            start = len(lines) + 1
+            if isolation == "namespace":
+                names.append("__tmp")
+                opener, closer = f"namespace __qednet_b{k}", f"end __qednet_b{k}"
+            else:
+                names.append(f"__tmp_{k}")
+                opener, closer = "section", "end"
+            block = f"theorem {names[-1]} : {goal_type} := by\n"
+            block += self._indent(self._dedent(script).rstrip() + "\n", n=2)
+            lines += [opener, *block.rstrip("\n").split("\n"), closer]
+            spans.append((start, len(lines)))
+            lines.append("")
+
+        label = f"prove_batch_{len(idxs)}"
+        t0 = time.perf_counter()
+        msgs, failure, retryable = self._run_messages("\n".join(lines) + "\n", label=label)
+        elapsed = (time.perf_counter() - t0) / len(idxs)
+        if failure is not None:
+            if len(idxs) == 1 or not retryable:
+                for i in idxs:
+                    results[i] = StepResult(valid=False, error=failure, stderr=failure, elapsed_sec=elapsed)
+                return
+            mid = len(idxs) // 2
+            self._check_chunk(items, idxs[:mid], isolation, results)
+            self._check_chunk(items, idxs[mid:], isolation, results)
+            return
+
+        starts = [a for a, _ in spans]
+        per_block: List[List[Dict[str, Any]]] = [[] for _ in idxs]
+        for msg in msgs:
+            line = (msg.get("pos") or {}).get("line", 0)
+            k = bisect.bisect_right(starts, line) - 1
+            if k >= 0 and line <= spans[k][1]:
+                per_block[k].append(msg)
+        for k, i in enumerate(idxs):
+            rendered = [self._format_message(m, label) for m in per_block[k]]
+            out = "\n".join(rendered) + ("\n" if rendered else "")
+            bad = [
+                r for m, r in zip(per_block[k], rendered)
+                if m.get("severity") == "error"
+                or (m.get("severity") == "warning" and "declaration uses 'sorry'" in str(m.get("data", "")))
+            ]
+            if bad:
+                results[i] = StepResult(valid=False, error=bad[0].splitlines()[0], stdout=out, elapsed_sec=elapsed)
+            else:
+                st = LeanState(name=names[k], pp_goal=items[i][0], pp_ctx=[], hyp_graph_edges=[])
+                results[i] = StepResult(valid=True, new_state=st, stdout=out, elapsed_sec=elapsed)
+
+    def _run_messages(self, body: str, label: str = "tmp") -> Tuple[List[Dict[str, Any]], Optional[str], bool]:
         """
-        Compiles a small Lean file:
-            theorem __tmp : <goal_type> := by
-              <tactic_script>
-        Returns StepResult(valid=...) and raw stdout/stderr for debugging.
+        Like _run, but returns Lean's structured messages (REPL JSON / `lean --json`) with lines
+        relative to `body`, plus (failure, retryable). failure is set when the run as a whole
+        broke; retryable says whether the body (not the header/setup) is to blame.
         """
-        body = self._preamble() + "\n"
-        body += "set_option maxRecDepth 10000\n"
-        body += "set_option maxHeartbeats 200000\n\n"
-        # Normalize script indentation and ensure it's on new lines
-        script = self._dedent(tactic_script).rstrip() + "\n"
-        body += f"theorem {theorem_name} : {goal_type} := by\n"
-        body += self._indent(script, n=2)
+        if self.persistent:
+            worker = self._worker()
+            try:
+                worker.start()
+            except LeanWorkerError as e:
+                return [], f"Lean worker failed: {e}", False
+            try:
+                resp = worker.command(body)
+            except LeanWorkerTimeout as te:
+                return [], f"Lean timed out after {self.timeout_sec}s running {label}: {te}", True
+            except LeanWorkerError as e:
+                return [], f"Lean worker failed: {e}", True
+            if "message" in resp and "env" not in resp:
+                return [], f"{label}.lean: error: {resp['message']}", True
+            return list(resp.get("messages", [])), None, False
 
-        ok, out, err = self._run_lean(body, label=f"prove_{theorem_name}")
+        preamble = self._preamble() + "\n"
+        offset = preamble.count("\n")
+        ok, out, err = self._run_lean(preamble + body, label=label, flags=["--json"], fail_fast=False)
+        msgs: List[Dict[str, Any]] = []
+        outside: List[str] = []
+        for ln in out.splitlines():
+            if not ln.startswith("{"):
+                continue
+            try:
+                msg = json.loads(ln)
+            except ValueError:
+                continue
+            pos = dict(msg.get("pos") or {})
+            pos["line"] = pos.get("line", 0) - offset
+            msg["pos"] = pos
+            msgs.append(msg)
+            if msg.get("severity") == "error" and pos["line"] < 1:
+                outside.append(str(msg.get("data", "")))
+        if outside:
+            return msgs, f"{label}.lean: error: " + "\n".join(outside), False
+        if not ok and not any(m.get("severity") == "error" for m in msgs):
+            return [], self._first_lean_error(err or out) or f"Lean exited with an error running {label}", True
+        return msgs, None, False
 
-        if ok:
-            # On success, we don’t yet have the next-state decomposition; return the same goal.
-            return StepResult(
-                valid=True,
-                new_state=LeanState(name=theorem_name, pp_goal=goal_type, pp_ctx=[], hyp_graph_edges=[]),
-                stdout=out,
-                stderr=err,
+    @staticmethod
+    def _handle(worker: LeanWorker, proof_state: int) -> str:
+        return f"{id(worker):x}.{worker.epoch}.{proof_state}"
+
+    @staticmethod
+    def _resolve_handle(worker: Optional[LeanWorker], handle: Optional[str]) -> Optional[int]:
+        if not handle:
+            return None
+        m = _HANDLE.fullmatch(handle)
+        if m is None:
+            raise ValueError(f"Malformed proof_state handle {handle!r}: expected one from start_proof() or step().")
+        wid, epoch, ps = m.groups()
+        if worker is None or wid != f"{id(worker):x}" or int(epoch) != worker.epoch or not worker.alive:
+            return None
+        return int(ps)
+
+    @staticmethod
+    def _split_signature(data: str) -> Optional[str]:
+        """`name : type` -> type, splitting at the first ` : ` outside brackets."""
+        depth = 0
+        for i, ch in enumerate(data):
+            if ch in "([{⟨⦃":
+                depth += 1
+            elif ch in ")]}⟩⦄":
+                depth -= 1
+            elif depth == 0 and data.startswith(" : ", i):
+                return data[i + 3:].strip()
+        return None
+
+    def _run(self, body: str, label: str = "tmp", timeout_sec: Optional[float] = None) -> Tuple[bool, str, str]:
+        """
+        Elaborates `body` below the preamble, via the persistent worker or a fresh Lean process.
+        Returns (ok, stdout, stderr) in the same shape either way.
+        """
+        self._last_run = {}
+        if self.persistent:
+            return self._run_worker(body, label=label, timeout_sec=timeout_sec)
+        return self._run_lean(self._preamble() + "\n" + body, label=label, timeout_sec=timeout_sec)
+
+    def _worker(self) -> LeanWorker:
+        if self._lean_worker is None:
+            self._lean_worker = LeanWorker(
+                header=self._preamble(),
+                repl_cmd=self.repl_cmd,
+                workdir=self.workdir,
+                timeout_sec=self.timeout_sec,
+                metrics=self.metrics,
+                limits=self.limits,
             )
-        else:
-            # Extract a concise first error line for convenience.
-            concise = self._first_lean_error(err or out)
-            return StepResult(valid=False, error=concise, stdout=out, stderr=err)
+        return self._lean_worker
 
-    # ---------- Internals ----------
+    def _run_worker(self, body: str, label: str = "tmp", timeout_sec: Optional[float] = None) -> Tuple[bool, str, str]:
+        """
+        Sends `body` to the long-lived REPL; the worker restarts itself after a crash/timeout.
+        REPL messages are rendered like `lean <file>` output so downstream parsing is shared.
+        """
+        timeout = self.timeout_sec if timeout_sec is None else timeout_sec
+        try:
+            resp = self._worker().command(body, timeout_sec=timeout)
+        except LeanWorkerTimeout as te:
+            return False, "", f"Lean timed out after {timeout:g}s running {label}: {te}"
+        except LeanWorkerError as e:
+            return False, "", f"Lean worker failed: {e}"
+        return self._render_repl_response(resp, label)
+
+    @staticmethod
+    def _render_repl_response(resp: Dict[str, Any], label: str) -> Tuple[bool, str, str]:
+        if "message" in resp and "env" not in resp:
+            # REPL-level failure (bad env id, parse error of the request itself, ...)
+            return False, "", f"{label}.lean: error: {resp['message']}"
+        msgs = resp.get("messages", [])
+        ok = not any(m.get("severity") == "error" for m in msgs)
+        lines = [LeanRPC._format_message(m, label) for m in msgs]
+        out = "\n".join(lines) + ("\n" if lines else "")
+        return ok, out, ""
+
+    @staticmethod
+    def _format_message(msg: Dict[str, Any], label: str) -> str:
+        """One REPL / `lean --json` message in `lean <file>` style (info is printed bare)."""
+        sev = msg.get("severity", "info")
+        data = str(msg.get("data", ""))
+        if sev in ("info", "information"):
+            return data
+        pos = msg.get("pos") or {}
+        return f"{label}.lean:{pos.get('line', 0)}:{pos.get('column', 0)}: {sev}: {data}"
 
     def _preamble(self) -> str:
         imps = "\n".join(f"import {m}" for m in self.imports)
@@ -146,11 +706,19 @@ class LeanRPC:
             return [lean]
         raise EnvironmentError("Neither `lake` nor `lean` was found on PATH. Install Lean 4 / Mathlib toolchain.")
 
-    def _run_lean(self, lean_source: str, label: str = "tmp") -> Tuple[bool, str, str]:
+    def _run_lean(
+        self,
+        lean_source: str,
+        label: str = "tmp",
+        flags: Sequence[str] = (),
+        fail_fast: Optional[bool] = None,
+        timeout_sec: Optional[float] = None,
+    ) -> Tuple[bool, str, str]:
         """
         Writes `lean_source` to a temporary .lean file and runs Lean compiler on it.
         Returns (ok, stdout, stderr).
         """
+        t_write = time.perf_counter()
         tmpdir_ctx = tempfile.TemporaryDirectory(prefix="qednet_lean_")
         tmpdir = Path(tmpdir_ctx.name)
 
@@ -162,32 +730,130 @@ class LeanRPC:
 
         src_path = tmpdir / f"{label}.lean"
         src_path.write_text(lean_source, encoding="utf-8")
+        if self.metrics is not None:
+            self.metrics.observe("write", time.perf_counter() - t_write)
 
-        cmd = [*self._lean_cmd, str(src_path)]
+        cmd = [*self._lean_cmd, *flags, str(src_path)]
+        stream = self.fail_fast if fail_fast is None else fail_fast
+        timeout = self.timeout_sec if timeout_sec is None else timeout_sec
         try:
-            proc = subprocess.run(
+            if stream:
+                return self._stream_lean(cmd, timeout)
+            return self._communicate_lean(cmd, timeout)
+        except subprocess.TimeoutExpired as te:
+            self._count("timeouts")
+            return False, "", f"Lean timed out after {timeout:g}s running {cmd}: {te}"
+        except Exception as e:
+            self._count("crashes")
+            return False, "", f"Failed to run Lean: {e}"
+        finally:
+            with self._timed("cleanup"):
+                tmpdir_ctx.cleanup()
+
+    def _communicate_lean(self, cmd: List[str], timeout_sec: float) -> Tuple[bool, str, str]:
+        """Blocking run with separate spawn / run timings (same semantics as subprocess.run)."""
+        with self._timed("spawn"):
+            proc = spawn(
                 cmd,
+                self.limits,
                 cwd=str(self.workdir) if self.workdir else None,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                timeout=self.timeout_sec,
-                check=False,
                 text=True,
             )
-        except subprocess.TimeoutExpired as te:
-            tmpdir_ctx.cleanup()
-            return False, "", f"Lean timed out after {self.timeout_sec}s running {cmd}: {te}"
-        except Exception as e:
-            tmpdir_ctx.cleanup()
-            return False, "", f"Failed to run Lean: {e}"
+        with proc, self._timed("run"):
+            try:
+                out, err = proc.communicate(timeout=timeout_sec)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                raise
+        if proc.returncode < 0:
+            # Killed by a signal we did not send (OOM killer, segfault, ...).
+            self._count("crashes")
+        return proc.returncode == 0, out or "", self._exit_note(proc.returncode, out, err) + (err or "")
 
-        out = proc.stdout or ""
-        err = proc.stderr or ""
-        ok = proc.returncode == 0
+    def _stream_lean(self, cmd: List[str], timeout_sec: float) -> Tuple[bool, str, str]:
+        """
+        Runs Lean reading stdout/stderr as they arrive; kills it at the first error diagnostic.
+        Captures at most `max_output_bytes` per stream (the first error line is always kept).
+        """
+        t0 = time.perf_counter()
+        with self._timed("spawn"):
+            proc = spawn(
+                cmd,
+                self.limits,
+                cwd=str(self.workdir) if self.workdir else None,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        captured = {proc.stdout.fileno(): bytearray(), proc.stderr.fileno(): bytearray()}
+        partial = {fd: b"" for fd in captured}
+        open_fds = set(captured)
+        first_error: Optional[bytes] = None
+        deadline = time.monotonic() + timeout_sec
+        try:
+            while open_fds and first_error is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(cmd, timeout_sec)
+                ready, _, _ = select.select(list(open_fds), [], [], remaining)
+                for fd in ready:
+                    chunk = os.read(fd, 1 << 16)
+                    if not chunk:
+                        open_fds.discard(fd)
+                        continue
+                    buf = captured[fd]
+                    buf += chunk[: max(0, self.max_output_bytes - len(buf))]
+                    *lines, partial[fd] = (partial[fd] + chunk).split(b"\n")
+                    first_error = next((ln for ln in lines if _ERROR_LINE.search(ln)), None)
+                    if first_error is not None:
+                        break
+        finally:
+            if proc.poll() is None and (first_error is not None or open_fds):
+                proc.kill()
+            proc.wait()
+            proc.stdout.close()
+            proc.stderr.close()
+
+        elapsed = time.perf_counter() - t0
+        aborted = first_error is not None and bool(open_fds)
+        if self.metrics is not None:
+            self.metrics.observe("run", elapsed)
+            if aborted:
+                self.metrics.incr("fail_fast_aborts")
+        if aborted:
+            # Lean would have kept elaborating; estimate from runs we let finish.
+            saved = max(0.0, self._full_run_sec - elapsed) if self._full_run_sec is not None else None
+        else:
+            saved = None
+            ema = self._full_run_sec
+            self._full_run_sec = elapsed if ema is None else 0.8 * ema + 0.2 * elapsed
+        self._last_run = {"elapsed_sec": elapsed, "aborted": aborted, "saved_sec": saved}
 
-        tmpdir_ctx.cleanup()
+        out_b, err_b = (bytes(b) for b in captured.values())
+        if first_error is not None and first_error not in out_b + err_b:
+            out_b += b"\n" + first_error
+        ok = first_error is None and proc.returncode == 0
+        out, err = out_b.decode("utf-8", errors="replace"), err_b.decode("utf-8", errors="replace")
+        if first_error is None:  # otherwise we killed it ourselves
+            err = self._exit_note(proc.returncode, out, err) + err
         return ok, out, err
 
+    @staticmethod
+    def _exit_note(returncode: int, out: Optional[str], err: Optional[str]) -> str:
+        """
+        First stderr line describing an abnormal exit, in LeanWorker's "(exit code N)" format so
+        failure_reason can classify it: a signal (RLIMIT_CPU's SIGXCPU, the OOM killer's SIGKILL,
+        ...; `lake env` reports it as 128 + N) or a failure without any output.
+        """
+        if returncode < 0 or returncode > 128:
+            sig = -returncode if returncode < 0 else returncode - 128
+            return f"Lean killed by signal {sig} (exit code {returncode})\n"
+        if returncode != 0 and not (out or "").strip() and not (err or "").strip():
+            return f"Lean exited without output (exit code {returncode})\n"
+        return ""
+
     @staticmethod
     def _dedent(s: str) -> str:
         # Simple dedent without importing textwrap to keep deps tiny.
@@ -208,6 +874,8 @@ class LeanRPC:
     def _first_lean_error(stream: str) -> str:
         if not stream:
             return ""
+        if stream.startswith(("Lean killed by signal", "Lean exited without output")):
+            return stream.splitlines()[0]  # see _exit_note: the exit explains whatever came before
         # Grab first line that looks like an error location or message.
         for ln in stream.splitlines():
             if "error:" in ln or re.search(r":\d+:\d+: error:", ln):
@@ -0,0 +1,271 @@
+# src/qednet/io/lean_worker.py
+from __future__ import annotations
+
+import collections
+import json
+import os
+import select
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional
+
+from .governor import spawn
+
+if TYPE_CHECKING:
+    from .governor import ResourceLimits
+    from .metrics import LeanMetrics
+
+_LEAN_TIMEOUT_SEC = 60
+_HEADER_TIMEOUT_SEC = 600
+_STDERR_TAIL_LINES = 50
+
+
+class LeanWorkerError(RuntimeError):
+    """The REPL process died, answered garbage, or refused a command."""
+
+
+class LeanWorkerTimeout(LeanWorkerError):
+    """A command did not answer within its deadline; the process has been killed."""
+
+
+class LeanWorker:
+    """
+    Long-lived Lean REPL process (leanprover-community/repl protocol).
+    - The header (imports + prelude) is elaborated once; its env id is reused by every command.
+    - command(src): runs `src` on top of the header env and returns the REPL's JSON answer.
+    - tactic(proof_state, tac): runs one tactic on a proof state snapshot kept inside the REPL.
+    Notes:
+      * Requests/answers are JSON objects separated by a blank line on stdin/stdout.
+      * On crash or timeout the process is killed; the next call restarts it and reloads the header.
+        Proof-state ids die with the process: `epoch` changes on every (re)launch.
+      * limits=ResourceLimits(...) applies rlimits to the process and recycles it after
+        `max_requests` requests or past `max_rss_mb`. A due recycle waits for the next command();
+        only the RSS cap also interrupts a run of tactic() calls (their proof states die with it).
+      * Not thread-safe: use one worker per thread.
+    """
+
+    def __init__(
+        self,
+        header: str,
+        repl_cmd: Optional[List[str]] = None,
+        workdir: Optional[Path] = None,
+        timeout_sec: float = _LEAN_TIMEOUT_SEC,
+        header_timeout_sec: float = _HEADER_TIMEOUT_SEC,
+        metrics: Optional["LeanMetrics"] = None,
+        limits: Optional["ResourceLimits"] = None,
+    ) -> None:
+        self.header = header
+        self.repl_cmd = list(repl_cmd) if repl_cmd else self._detect_repl_cmd()
+        self.workdir = Path(workdir) if workdir else None
+        self.timeout_sec = timeout_sec
+        self.header_timeout_sec = header_timeout_sec
+        self.metrics = metrics
+        self.limits = limits
+        self.restarts = 0
+        self.recycles = 0
+        self.requests = 0  # since the current launch
+        self._launches = 0
+        self._proc: Optional[subprocess.Popen] = None
+        self._env: Optional[int] = None
+        self._buf = b""
+        self._stderr_tail: Deque[str] = collections.deque(maxlen=_STDERR_TAIL_LINES)
+
+    # ---------- Public API ----------
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    @property
+    def epoch(self) -> int:
+        """Launch counter; proof-state ids are only meaningful within one epoch."""
+        return self._launches
+
+    def command(self, src: str, timeout_sec: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Elaborates `src` in the header environment (the header itself is never re-imported).
+        Returns the raw REPL answer: {"env": .., "messages": [..], "sorries": [..]} or {"message": ..}.
+        """
+        self._maybe_recycle(rss_only=False)
+        self._ensure_started()
+        return self._request({"cmd": src, "env": self._env}, timeout_sec)
+
+    def tactic(self, proof_state: int, tactic: str, timeout_sec: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Applies `tactic` to REPL proof state `proof_state` (from a `sorry` or an earlier tactic).
+        Returns {"proofState": .., "goals": [..], "messages": [..]} or {"message": ..} on failure.
+        """
+        self._maybe_recycle(rss_only=True)
+        self._ensure_started()
+        return self._request({"tactic": tactic, "proofState": proof_state}, timeout_sec)
+
+    def start(self) -> None:
+        self._ensure_started()
+
+    def restart(self) -> None:
+        self.close()
+        self._ensure_started()
+
+    def close(self) -> None:
+        proc, self._proc = self._proc, None
+        self._env = None
+        self._buf = b""
+        if proc is None:
+            return
+        if proc.poll() is None:
+            proc.kill()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        for stream in (proc.stdin, proc.stdout, proc.stderr):
+            try:
+                if stream:
+                    stream.close()
+            except OSError:
+                pass
+
+    def __enter__(self) -> "LeanWorker":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    # ---------- Internals ----------
+
+    @staticmethod
+    def _detect_repl_cmd() -> List[str]:
+        """
+        `QEDNET_LEAN_REPL` (whitespace-separated command) wins; else a `repl` binary on PATH run
+        inside `lake env` so Mathlib resolves; else `lake exe repl` (REPL required in lakefile).
+        """
+        env = os.getenv("QEDNET_LEAN_REPL")
+        if env:
+            return env.split()
+        lake = shutil.which("lake")
+        repl = shutil.which("repl")
+        if lake and repl:
+            return [lake, "env", repl]
+        if repl:
+            return [repl]
+        if lake:
+            return [lake, "exe", "repl"]
+        raise EnvironmentError("Neither `lake` nor a Lean `repl` binary was found on PATH.")
+
+    def _maybe_recycle(self, rss_only: bool) -> None:
+        if self.limits is None or not self.alive:
+            return
+        assert self._proc is not None
+        why = self.limits.recycle_reason(0 if rss_only else self.requests, self._proc.pid)
+        if why is not None:
+            self.recycles += 1
+            if self.metrics is not None:
+                self.metrics.incr(f"recycles_{why}")
+            self.close()
+
+    def _ensure_started(self) -> None:
+        if self.alive and self._env is not None:
+            return
+        # Never started, killed after a timeout/crash, or died while idle: (re)launch.
+        self.close()
+        if self._launches:
+            self.restarts += 1
+        self._launches += 1
+        self._proc = spawn(
+            self.repl_cmd,
+            self.limits,
+            cwd=str(self.workdir) if self.workdir else None,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        threading.Thread(target=self._drain_stderr, args=(self._proc,), daemon=True).start()
+        if self.metrics is not None:
+            self.metrics.incr("worker_starts")
+        resp = self._request({"cmd": self.header}, self.header_timeout_sec, phase="header")
+        errors = [m for m in resp.get("messages", []) if m.get("severity") == "error"]
+        if "env" not in resp or errors:
+            detail = resp.get("message") or "\n".join(str(m.get("data", "")) for m in errors)
+            self.close()
+            raise LeanWorkerError(f"Lean REPL failed to load header:\n{detail}")
+        self._env = resp["env"]
+        self.requests = 0
+
+    def _request(
+        self, payload: Dict[str, Any], timeout_sec: Optional[float], phase: str = "elaborate"
+    ) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        self.requests += 1
+        try:
+            return self._roundtrip(payload, timeout_sec)
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe(phase, time.perf_counter() - t0)
+
+    def _roundtrip(self, payload: Dict[str, Any], timeout_sec: Optional[float]) -> Dict[str, Any]:
+        proc = self._proc
+        assert proc is not None and proc.stdin is not None
+        data = (json.dumps(payload, ensure_ascii=False) + "\n\n").encode("utf-8")
+        try:
+            proc.stdin.write(data)
+            proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self._crashed(f"Lean REPL closed its stdin: {e}")
+        raw = self._read_response(timeout_sec if timeout_sec is not None else self.timeout_sec)
+        try:
+            return json.loads(raw)
+        except ValueError:
+            self._crashed(f"Lean REPL sent malformed JSON:\n{raw[:2000]}")
+        raise AssertionError("unreachable")
+
+    def _read_response(self, timeout_sec: float) -> str:
+        proc = self._proc
+        assert proc is not None and proc.stdout is not None
+        fd = proc.stdout.fileno()
+        deadline = time.monotonic() + timeout_sec
+        while True:
+            # A response ends with an empty line; skip leading blank lines between responses.
+            self._buf = self._buf.lstrip(b"\r\n")
+            sep = self._buf.find(b"\n\n")
+            if sep >= 0:
+                raw, self._buf = self._buf[:sep], self._buf[sep + 2:]
+                return raw.decode("utf-8", errors="replace")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if self.metrics is not None:
+                    self.metrics.incr("timeouts")
+                self.close()
+                raise LeanWorkerTimeout(f"Lean REPL timed out after {timeout_sec}s; worker killed.")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 1 << 16)
+            if not chunk:
+                self._crashed("Lean REPL exited unexpectedly.")
+            self._buf += chunk
+
+    def _crashed(self, msg: str) -> None:
+        code = self._proc.poll() if self._proc else None
+        tail = "\n".join(self._stderr_tail)
+        if self.metrics is not None:
+            self.metrics.incr("crashes")
+        self.close()
+        raise LeanWorkerError(f"{msg} (exit code {code})\n{tail}".rstrip())
+
+    def _drain_stderr(self, proc: subprocess.Popen) -> None:
+        # Keep the pipe from filling up; remember the tail for crash reports.
+        try:
+            for line in iter(proc.stderr.readline, b""):
+                self._stderr_tail.append(line.decode("utf-8", errors="replace").rstrip())
+        except (OSError, ValueError):
+            pass
@@ -0,0 +1,133 @@
+# src/qednet/io/metrics.py
+from __future__ import annotations
+
+import bisect
+import contextlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Seconds; spans sub-millisecond REPL round-trips up to a cold Mathlib import.
+_DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# hook(kind, name, value, op): kind is "phase" (value = seconds) or "event" (value = increment).
+Hook = Callable[[str, str, float, str], None]
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "n")
+
+    def __init__(self, nbuckets: int) -> None:
+        self.counts = [0] * (nbuckets + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.n = 0
+
+
+class LeanMetrics:
+    """
+    Counters + latency histograms for the Lean verification path (shared by LeanRPC/LeanPool).
+    - observe(phase, seconds, op=""): one timing sample. Phases used by LeanRPC:
+        write, spawn, run (fresh process: import + elaboration), header (worker import),
+        elaborate (worker command), parse, cleanup, total (per public call, op = method name).
+    - incr(event): calls_<op>, cache_hits, cache_misses, timeouts, crashes, worker_starts,
+      fail_fast_aborts.
+    - add_hook(fn): fn(kind, name, value, op) is called for every sample/increment.
+    - snapshot() / to_prometheus() / write_jsonl(path): export.
+    Notes:
+      * LeanRPC(metrics=None) skips all of this; the disabled path costs one attribute check.
+    """
+
+    def __init__(self, buckets: Sequence[float] = _DEFAULT_BUCKETS) -> None:
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._hooks: List[Hook] = []
+        self._hist: Dict[Tuple[str, str], _Histogram] = {}
+        self._events: Dict[str, float] = {}
+
+    # ---------- Recording ----------
+
+    def add_hook(self, hook: Hook) -> None:
+        self._hooks.append(hook)
+
+    def observe(self, phase: str, seconds: float, op: str = "") -> None:
+        with self._lock:
+            h = self._hist.get((phase, op))
+            if h is None:
+                h = self._hist[(phase, op)] = _Histogram(len(self.buckets))
+            h.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            h.total += seconds
+            h.n += 1
+        for hook in self._hooks:
+            hook("phase", phase, seconds, op)
+
+    def incr(self, event: str, n: float = 1) -> None:
+        with self._lock:
+            self._events[event] = self._events.get(event, 0) + n
+        for hook in self._hooks:
+            hook("event", event, n, "")
+
+    @contextlib.contextmanager
+    def time(self, phase: str, op: str = "") -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - t0, op)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hist.clear()
+            self._events.clear()
+
+    # ---------- Export ----------
+
+    def snapshot(self) -> Dict[str, object]:
+        """Plain-dict copy: {"ts", "events": {..}, "phases": {"phase[/op]": {count, sum, p50, p99, buckets}}}."""
+        with self._lock:
+            phases = {}
+            for (phase, op), h in sorted(self._hist.items()):
+                phases[f"{phase}/{op}" if op else phase] = {
+                    "count": h.n,
+                    "sum": h.total,
+                    "p50": self._quantile(h, 0.50),
+                    "p99": self._quantile(h, 0.99),
+                    "buckets": dict(zip([*map(str, self.buckets), "+Inf"], h.counts)),
+                }
+            return {"ts": time.time(), "events": dict(sorted(self._events.items())), "phases": phases}
+
+    def to_prometheus(self, prefix: str = "qednet_lean") -> str:
+        """Prometheus text exposition format (cumulative buckets)."""
+        with self._lock:
+            lines = [f"# TYPE {prefix}_events_total counter"]
+            for event, n in sorted(self._events.items()):
+                lines.append(f'{prefix}_events_total{{event="{event}"}} {n:g}')
+            lines.append(f"# TYPE {prefix}_phase_seconds histogram")
+            for (phase, op), h in sorted(self._hist.items()):
+                labels = f'phase="{phase}"' + (f',op="{op}"' if op else "")
+                cum = 0
+                for le, c in zip([*map(repr, self.buckets), "+Inf"], h.counts):
+                    cum += c
+                    lines.append(f'{prefix}_phase_seconds_bucket{{{labels},le="{le}"}} {cum}')
+                lines.append(f"{prefix}_phase_seconds_sum{{{labels}}} {h.total:.6f}")
+                lines.append(f"{prefix}_phase_seconds_count{{{labels}}} {h.n}")
+        return "\n".join(lines) + "\n"
+
+    def write_jsonl(self, path: Union[str, Path]) -> None:
+        """Appends one snapshot as a JSON line (e.g. periodically from a training loop)."""
+        with Path(path).open("a", encoding="utf-8") as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+    # ---------- Internals ----------
+
+    def _quantile(self, h: _Histogram, q: float) -> Optional[float]:
+        """Upper bucket bound containing quantile q (None for an empty or +Inf-only answer)."""
+        if not h.n:
+            return None
+        rank, cum = q * h.n, 0
+        for i, c in enumerate(h.counts):
+            cum += c
+            if cum >= rank:
+                return self.buckets[i] if i < len(self.buckets) else None
+        return None
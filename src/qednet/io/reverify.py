@@ -0,0 +1,232 @@
+# src/qednet/io/reverify.py
+from __future__ import annotations
+
+import json
+import os
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from ..data.shards import iter_export
+from .governor import REASON_HEARTBEATS, REASON_TIMEOUT
+from .lean_pool import Job, LeanPool
+from .lean_rpc import StepResult
+
+STATUS_PASS = "pass"
+STATUS_FAIL = "fail"
+STATUS_TIMEOUT = "timeout"
+STATUS_SKIPPED = "skipped"  # nothing to replay: no statement, no actions or a tracing error
+STATUSES = (STATUS_PASS, STATUS_FAIL, STATUS_TIMEOUT, STATUS_SKIPPED)
+
+
+@dataclass
+class ProofJob:
+    theorem_id: str
+    goal: Optional[str]    # the statement's proposition (`stmt`)
+    script: Optional[str]  # top-level tactics of the trace, one per line (see proof_script)
+    steps: int
+    skip: Optional[str] = None  # why it cannot be replayed, if so
+
+
+def proof_script(steps: Iterable[Dict[str, Any]]) -> Optional[str]:
+    """
+    Rebuilds a theorem's tactic proof from its exported trace steps.
+    Traces list non-atomic tactics (`t1 <;> t2`, `· tac ...`) followed by the tactics nested
+    in them, so a step is dropped when its action occurs in the current top-level action after
+    the previous nested one, unless its state_before is that action's state_after (then it is
+    the next top-level tactic that merely repeats some text). Multi-line actions keep their
+    original indentation, which matches top-level tactics written at column 2.
+    Returns None when the trace has no actions or records a tracing error.
+    """
+    top: List[str] = []
+    outer, outer_before, outer_after, pos = "", None, None, 0
+    for st in steps:
+        if "_tactics_error" in st:
+            return None
+        act = st.get("action")
+        if not isinstance(act, str) or not act.strip():
+            continue
+        act = act.strip()
+        before = _state_before(st)
+        at = outer.find(act, pos) if outer else -1
+        follows = before is not None and before == outer_after and before != outer_before
+        if at >= 0 and not follows:
+            pos = at + len(act)
+            continue
+        top.append(act)
+        outer, outer_before, outer_after, pos = act, before, st.get("state_after"), 0
+    return "\n".join(top) or None
+
+
+def iter_proofs(export: Union[str, Path], shard: Tuple[int, int] = (0, 1)) -> Iterator[ProofJob]:
+    """
+    ProofJobs for the traces of exporter output (single JSON or sharded JSONL, see iter_export),
+    in export order. shard=(k, n) keeps the theorems with crc32(theorem_id) % n == k, so n
+    machines can split one export. Statements are read first, keeping only their `stmt`.
+    """
+    k, n = shard
+    if not 0 <= k < n:
+        raise ValueError(f"shard must be (k, n) with 0 <= k < n, got {shard!r}")
+    stmts: Dict[str, Optional[str]] = {}
+    for _, rec in iter_export(export, kinds=("statements",)):
+        if isinstance(rec.get("id"), str):
+            stmts[rec["id"]] = rec.get("stmt")
+    for _, rec in iter_export(export, kinds=("traces",)):
+        tid = rec.get("theorem_id")
+        if not isinstance(tid, str) or zlib.crc32(tid.encode("utf-8")) % n != k:
+            continue
+        steps = rec.get("steps") or []
+        goal, script = stmts.get(tid), proof_script(steps)
+        errors = [st["_tactics_error"] for st in steps if "_tactics_error" in st]
+        skip = None
+        if not goal:
+            skip = "no statement for this theorem in the export"
+        elif script is None:
+            skip = errors[0] if errors else "trace has no tactic actions"
+        yield ProofJob(theorem_id=tid, goal=goal, script=script, steps=len(steps), skip=skip)
+
+
+def load_checkpoint(path: Union[str, Path]) -> Dict[str, Dict[str, Any]]:
+    """
+    theorem_id -> result record of a previous (possibly crashed) run's output. A torn last line
+    is cut off the file, so appending to it afterwards yields valid JSONL.
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    data = path.read_bytes()
+    keep = data.rfind(b"\n") + 1
+    if keep < len(data):
+        with open(path, "r+b") as f:
+            f.truncate(keep)
+    done: Dict[str, Dict[str, Any]] = {}
+    for line in data[:keep].splitlines():
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(rec, dict) and isinstance(rec.get("theorem_id"), str):
+            done[rec["theorem_id"]] = rec
+    return done
+
+
+def reverify(
+    pool: LeanPool,
+    export: Union[str, Path],
+    out: Union[str, Path],
+    group_size: int = 16,
+    shard: Tuple[int, int] = (0, 1),
+    progress: Optional[Callable[[Dict[str, int]], None]] = None,
+) -> Dict[str, int]:
+    """
+    Replays every traced proof of `export` on `pool` and appends one record per theorem to
+    `out` (JSONL): {theorem_id, status: pass | fail | timeout | skipped, reason, error,
+    elapsed_sec, steps}. Theorems already in `out` are not re-run, so a crashed run resumes
+    where it stopped. Returns the status counts of `out` (plus "resumed" / "checked").
+    Notes:
+      * Each proof is one check_tactic on a warm persistent worker, so the imports are paid
+        once per worker rather than once per theorem, and elapsed_sec is the proof's own time.
+      * Theorems are submitted in groups of `group_size`; enough groups are kept in flight for
+        the pool's round-robin to use every worker, and a group's records are written and
+        fsynced when the whole group is done (the unit of checkpointing).
+      * "timeout" covers the wall-clock limit and maxHeartbeats; other resource failures are
+        "fail" with their `reason` (see qednet.io.governor).
+    """
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    done = load_checkpoint(out)
+    counts = {s: 0 for s in STATUSES}
+    for rec in done.values():
+        status = rec.get("status", STATUS_FAIL)
+        counts[status] = counts.get(status, 0) + 1
+    counts["resumed"] = len(done)
+    counts["checked"] = 0
+    seen: Set[str] = set(done)
+    window = max(2, -(-2 * pool.size // max(1, group_size)))
+    ex = ThreadPoolExecutor(max_workers=window, thread_name_prefix="qednet-reverify")
+    inflight: Set["Future[List[Dict[str, Any]]]"] = set()
+
+    with open(out, "a", encoding="utf-8") as f:
+
+        def write(recs: List[Dict[str, Any]], sync: bool = True) -> None:
+            for rec in recs:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                counts[rec["status"]] += 1
+            counts["checked"] += len(recs)
+            if not sync:  # skipped records need no Lean; the next group's fsync covers them
+                return
+            f.flush()
+            os.fsync(f.fileno())
+            if progress is not None:
+                progress(dict(counts))
+
+        def drain(block_until: int) -> None:
+            while len(inflight) > block_until:
+                finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    inflight.discard(fut)
+                    write(fut.result())
+
+        try:
+            group: List[ProofJob] = []
+            for job in iter_proofs(export, shard):
+                if job.theorem_id in seen:
+                    continue
+                seen.add(job.theorem_id)
+                if job.skip is not None:
+                    write([_record(job, None)], sync=False)
+                    continue
+                group.append(job)
+                if len(group) >= group_size:
+                    inflight.add(ex.submit(_run_group, pool, group))
+                    group = []
+                    drain(window - 1)
+            if group:
+                inflight.add(ex.submit(_run_group, pool, group))
+            drain(0)
+            write([])
+        finally:
+            ex.shutdown(cancel_futures=True)
+    return counts
+
+
+# ---------- Internals ----------
+
+def _state_before(step: Dict[str, Any]) -> Optional[str]:
+    if step.get("state_before") is not None:
+        return step["state_before"]
+    if step.get("goal") is not None:  # older traces: goal + ctx
+        return "\n".join([*step.get("ctx", []), step["goal"]])
+    return None
+
+
+def _run_group(pool: LeanPool, group: List[ProofJob]) -> List[Dict[str, Any]]:
+    jobs = [_check_job(j.goal or "", j.script or "") for j in group]
+    return [_record(j, res) for j, res in zip(group, pool.map(jobs))]
+
+
+def _check_job(goal: str, script: str) -> Job:
+    return lambda rpc: rpc.check_tactic(goal, script)
+
+
+def _record(job: ProofJob, res: Optional[StepResult]) -> Dict[str, Any]:
+    if res is None:
+        status, reason, error, elapsed = STATUS_SKIPPED, None, job.skip, None
+    else:
+        if res.valid:
+            status = STATUS_PASS
+        elif res.reason in (REASON_TIMEOUT, REASON_HEARTBEATS):
+            status = STATUS_TIMEOUT
+        else:
+            status = STATUS_FAIL
+        reason, error, elapsed = res.reason, res.error, res.elapsed_sec
+    return {
+        "theorem_id": job.theorem_id,
+        "status": status,
+        "reason": reason,
+        "error": error,
+        "elapsed_sec": None if elapsed is None else round(elapsed, 4),
+        "steps": job.steps,
+    }
@@ -0,0 +1,237 @@
+# src/qednet/io/verify_cache.py
+from __future__ import annotations
+
+import collections
+import dataclasses
+import hashlib
+import json
+import sqlite3
+import textwrap
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .governor import REASON_CRASH, REASON_HEARTBEATS, REASON_OOM, REASON_TIMEOUT
+from .lean_rpc import LeanState, StepResult
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size  INTEGER NOT NULL,
+    atime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_atime ON entries(atime);
+"""
+# Errors produced by the runner itself (not by Lean's verdict on the script): never cached.
+_TRANSIENT_PREFIXES = ("Lean timed out", "Lean worker failed", "Failed to run Lean")
+# Lean died instead of answering (a signal, a bare non-zero exit; see LeanRPC._exit_note).
+_TRANSIENT_MARKERS = ("(exit code ",)
+# Failures that depend on the budget / limits in force rather than on the script alone.
+_TRANSIENT_REASONS = (REASON_TIMEOUT, REASON_HEARTBEATS, REASON_OOM, REASON_CRASH)
+
+
+def toolchain_fingerprint(start: Optional[Path] = None) -> str:
+    """
+    Identifies the Lean toolchain + Mathlib revision governing `start` (default: cwd):
+    the nearest `lean-toolchain`, plus every package rev in `lake-manifest.json`
+    (falling back to the raw `lakefile.lean` when there is no manifest).
+    """
+    here = Path(start or Path.cwd()).resolve()
+    for d in (here, *here.parents):
+        if (d / "lean-toolchain").exists():
+            break
+    else:
+        return "unknown"
+    parts = [(d / "lean-toolchain").read_text(encoding="utf-8").strip()]
+    manifest = d / "lake-manifest.json"
+    lakefile = d / "lakefile.lean"
+    if manifest.exists():
+        pkgs = json.loads(manifest.read_text(encoding="utf-8")).get("packages", [])
+        parts += sorted(f"{p.get('name')}@{p.get('rev')}" for p in pkgs)
+    elif lakefile.exists():
+        parts.append(lakefile.read_text(encoding="utf-8"))
+    return "\n".join(parts)
+
+
+def step_to_dict(res: StepResult) -> Dict[str, Any]:
+    return dataclasses.asdict(res)
+
+
+def step_from_dict(d: Dict[str, Any]) -> StepResult:
+    d = dict(d)
+    if d.get("new_state") is not None:
+        d["new_state"] = state_from_dict(d["new_state"])
+    return StepResult(**d)
+
+
+def state_from_dict(d: Dict[str, Any]) -> LeanState:
+    d = dict(d)
+    d["hyp_graph_edges"] = [tuple(e) for e in d.get("hyp_graph_edges", [])]
+    return LeanState(**d)
+
+
+class VerificationCache:
+    """
+    Content-addressed cache for LeanRPC verdicts.
+    - key(...): sha256 over toolchain/Mathlib revision, imports, prelude and the normalized request.
+    - In-memory LRU in front of an optional SQLite file shared by any number of processes.
+    Notes:
+      * The disk store runs in WAL mode with a busy timeout, so concurrent readers/writers from
+        several trainer processes are safe; eviction drops least-recently-used rows once the
+        stored payload exceeds `max_disk_bytes`.
+      * Timeouts, resource failures (heartbeats, OOM), runner crashes and runs killed by a
+        signal (or failing without an error) are not cached: they depend on the limits in force
+        or on the machine, not just on the script.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_memory_items: int = 10_000,
+        max_disk_bytes: int = 1 << 30,
+        toolchain_root: Optional[Path] = None,
+    ) -> None:
+        self.path = Path(path) if path else None
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.fingerprint = toolchain_fingerprint(toolchain_root)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lru: "collections.OrderedDict[str, str]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    # ---------- Public API ----------
+
+    def key(self, kind: str, imports: List[str], extra_prelude: str, *parts: str) -> str:
+        h = hashlib.sha256()
+        for field in (self.fingerprint, kind, "\n".join(imports), extra_prelude, *parts):
+            h.update(field.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    @staticmethod
+    def normalize_goal(goal: str) -> str:
+        return " ".join(goal.split())
+
+    @staticmethod
+    def normalize_script(script: str) -> str:
+        """Tactic scripts that differ only in common indentation / surrounding blank lines match."""
+        return textwrap.dedent(script).strip()
+
+    def get_step(self, key: str) -> Optional[StepResult]:
+        raw = self._get(key)
+        return step_from_dict(json.loads(raw)) if raw is not None else None
+
+    def put_step(self, key: str, res: StepResult) -> None:
+        if not res.valid and self._transient(res):
+            return
+        self._put(key, json.dumps(step_to_dict(res), ensure_ascii=False))
+
+    def get_state(self, key: str) -> Optional[LeanState]:
+        raw = self._get(key)
+        return state_from_dict(json.loads(raw)) if raw is not None else None
+
+    def put_state(self, key: str, st: LeanState) -> None:
+        self._put(key, json.dumps(dataclasses.asdict(st), ensure_ascii=False))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_items": len(self._lru),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---------- Internals ----------
+
+    @staticmethod
+    def _transient(res: StepResult) -> bool:
+        """A failure that is not Lean's verdict on the script: no error at all, or a killed / crashed run."""
+        error = (res.error or "").strip()
+        if not error or res.reason in _TRANSIENT_REASONS or error.startswith(_TRANSIENT_PREFIXES):
+            return True
+        return any(m in text for m in _TRANSIENT_MARKERS for text in (error, res.stderr or ""))
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            raw = self._lru.get(key)
+            if raw is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return raw
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE entries SET atime = ? WHERE key = ?", (time.time(), key))
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def _put(self, key: str, raw: str) -> None:
+        with self._lock:
+            self._remember(key, raw)
+            if self._db is None:
+                return
+            size = len(key) + len(raw.encode("utf-8"))
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO entries(key, value, size, atime) VALUES (?, ?, ?, ?)",
+                (key, raw, size, time.time()),
+            )
+            self._disk_bytes += size if cur.rowcount else 0
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _remember(self, key: str, raw: str) -> None:
+        self._lru[key] = raw
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_memory_items:
+            self._lru.popitem(last=False)
+
+    def _evict(self) -> None:
+        # Other processes write too: re-read the true size, then trim LRU rows down to 90%.
+        assert self._db is not None
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            target = int(self.max_disk_bytes * 0.9)
+            if total > self.max_disk_bytes:
+                freed = 0
+                doomed = []
+                for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY atime"):
+                    if total - freed <= target:
+                        break
+                    doomed.append((key,))
+                    freed += size
+                self._db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+                self.evictions += len(doomed)
+                total -= freed
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._disk_bytes = total
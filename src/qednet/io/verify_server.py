@@ -0,0 +1,283 @@
+# src/qednet/io/verify_server.py
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import socket
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set, Tuple, Union
+
+from .lean_pool import LeanPool
+from .lean_rpc import LeanRPC, LeanState, StepResult
+from .verify_cache import VerificationCache, step_from_dict, step_to_dict
+
+_OPS = ("check_tactic", "fetch_goal", "stats")
+_LINE_LIMIT = 64 * 1024 * 1024  # one request / response line (goals can be large)
+
+Address = Union[str, Tuple[str, int]]
+
+
+def default_address() -> str:
+    """$QEDNET_SOCKET, else a per-user Unix socket in the temp dir."""
+    return os.environ.get("QEDNET_SOCKET") or os.path.join(tempfile.gettempdir(), f"qednet-{os.getuid()}.sock")
+
+
+def parse_address(text: str) -> Address:
+    """"host:port" -> TCP (localhost use only, no auth); anything else is a Unix socket path."""
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit() and "/" not in text:
+        return host or "127.0.0.1", int(port)
+    return text
+
+
+class VerificationServer:
+    """
+    Local verification service over one shared LeanPool, for many trainer processes.
+    - Protocol: newline-delimited JSON. Request {"id", "op": check_tactic | fetch_goal | stats,
+      "goal", "script", "theorem_name"}; response {"id", "result": StepResult dict} or {"id", "error"}.
+      Clients may pipeline: responses come back as they finish, matched by "id".
+    - serve_forever() (blocking) or start() / close() (background thread, e.g. tests).
+    Notes:
+      * Identical in-flight requests (normalized goal + script + theorem name) are coalesced:
+        the second client awaits the first one's Lean run instead of queueing its own.
+      * fetch_goal answers are StepResults too (`new_state` = the goal, errors as valid=False).
+      * Lean work runs on the pool's workers; up to `max_inflight` requests are dispatched at
+        once, so the pool always has a queue to round-robin over.
+      * No authentication: bind a Unix socket (default, see default_address) or localhost only.
+    """
+
+    def __init__(self, pool: LeanPool, address: Optional[Address] = None, max_inflight: Optional[int] = None) -> None:
+        self.pool = pool
+        self.address: Address = address if address is not None else default_address()
+        self.max_inflight = max_inflight or 4 * pool.size
+        self.requests = 0
+        self.coalesced = 0
+        self._inflight: Dict[Tuple[str, ...], "asyncio.Future[StepResult]"] = {}
+        self._executor = ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix="qednet-verify")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._ready = threading.Event()
+
+    # ---------- Public API ----------
+
+    def serve_forever(self) -> None:
+        asyncio.run(self._main())
+
+    def start(self) -> "VerificationServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="qednet-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def close(self) -> None:
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._shutdown)
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "workers": self.pool.size,
+        }
+
+    # ---------- Internals ----------
+
+    async def _main(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if isinstance(self.address, tuple):
+            self._server = await asyncio.start_server(self._client, *self.address, limit=_LINE_LIMIT)
+            self.address = self._server.sockets[0].getsockname()[:2]
+        else:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.address)  # a stale socket from a previous run
+            self._server = await asyncio.start_unix_server(self._client, self.address, limit=_LINE_LIMIT)
+        self._ready.set()
+        try:
+            async with self._server:
+                await self._server.wait_closed()
+        finally:
+            if isinstance(self.address, str):
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(self.address)
+
+    def _shutdown(self) -> None:
+        # wait_closed() also waits for open connections, so drop them with the listener.
+        assert self._server is not None
+        self._server.close()
+        for w in list(self._writers):
+            w.close()
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        lock = asyncio.Lock()
+        tasks = set()
+        self._writers.add(writer)
+        try:
+            try:
+                while line := await reader.readline():
+                    if line.strip():
+                        t = asyncio.create_task(self._answer(line, writer, lock))
+                        tasks.add(t)
+                        t.add_done_callback(tasks.discard)
+            except ValueError as e:  # a line over _LINE_LIMIT (readline's LimitOverrunError)
+                if tasks:
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                await self._write(writer, lock, {"id": None, "error": f"Request line too long: {e}"})
+                return
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _answer(self, line: bytes, writer: asyncio.StreamWriter, lock: asyncio.Lock) -> None:
+        rid = None
+        try:
+            req = json.loads(line)
+            rid = req.get("id")
+            op = req.get("op", "check_tactic")
+            if op not in _OPS:
+                raise ValueError(f"unknown op {op!r}")
+            if op == "stats":
+                resp: Dict[str, Any] = {"id": rid, "result": self.stats()}
+            else:
+                res = await self._run(op, req)
+                resp = {"id": rid, "result": step_to_dict(res)}
+        except Exception as e:
+            resp = {"id": rid, "error": f"{type(e).__name__}: {e}"}
+        await self._write(writer, lock, resp)
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, lock: asyncio.Lock, resp: Dict[str, Any]) -> None:
+        data = (json.dumps(resp, ensure_ascii=False) + "\n").encode("utf-8")
+        async with lock:
+            with contextlib.suppress(ConnectionError):  # the client went away; nothing to tell it
+                writer.write(data)
+                await writer.drain()
+
+    async def _run(self, op: str, req: Dict[str, Any]) -> StepResult:
+        self.requests += 1
+        name = str(req.get("theorem_name") or "__tmp")
+        if op == "fetch_goal":
+            key: Tuple[str, ...] = (op, name)
+            job = _goal_job(name)
+        else:
+            goal, script = req["goal"], req["script"]
+            key = (op, VerificationCache.normalize_goal(goal), VerificationCache.normalize_script(script), name)
+            job = lambda rpc: rpc.check_tactic(goal, script, theorem_name=name)
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+            return await asyncio.shield(fut)
+        assert self._loop is not None
+        fut = self._loop.run_in_executor(self._executor, lambda: self.pool.map([job])[0])
+        self._inflight[key] = fut
+        fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(fut)
+
+
+class VerificationClient:
+    """
+    Blocking client for VerificationServer; thread-safe and pipelined.
+    - submit(goal, script, theorem_name) -> Future[StepResult]; many may be outstanding.
+    - check_tactic(...) / fetch_goal(name) -> StepResult; stats() -> server counters.
+    """
+
+    def __init__(self, address: Optional[Address] = None, timeout_sec: Optional[float] = None) -> None:
+        addr = address if address is not None else default_address()
+        if isinstance(addr, str):
+            addr = parse_address(addr)
+        if isinstance(addr, tuple):
+            self._sock = socket.create_connection(addr, timeout=timeout_sec)
+        else:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(timeout_sec)
+            self._sock.connect(addr)
+        self._sock.settimeout(None)
+        self._rfile = self._sock.makefile("rb")
+        self._ids = itertools.count()
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_loop, name="qednet-client", daemon=True)
+        self._reader.start()
+
+    # ---------- Public API ----------
+
+    def submit(self, goal: str, script: str, theorem_name: str = "__tmp") -> "Future[StepResult]":
+        return self._send({"op": "check_tactic", "goal": goal, "script": script, "theorem_name": theorem_name})
+
+    def check_tactic(self, goal_type: str, tactic_script: str, theorem_name: str = "__tmp") -> StepResult:
+        return self.submit(goal_type, tactic_script, theorem_name).result()
+
+    def fetch_goal(self, theorem_name: str) -> StepResult:
+        return self._send({"op": "fetch_goal", "theorem_name": theorem_name}).result()
+
+    def stats(self) -> Dict[str, int]:
+        return self._send({"op": "stats"}).result()
+
+    def close(self) -> None:
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self._reader.join()
+
+    def __enter__(self) -> "VerificationClient":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # ---------- Internals ----------
+
+    def _send(self, req: Dict[str, Any]) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            rid = next(self._ids)
+            self._pending[rid] = fut
+            self._sock.sendall((json.dumps({"id": rid, **req}, ensure_ascii=False) + "\n").encode("utf-8"))
+        return fut
+
+    def _read_loop(self) -> None:
+        err: Exception = ConnectionError("Verification server closed the connection.")
+        try:
+            for line in self._rfile:
+                resp = json.loads(line)
+                with self._lock:
+                    fut = self._pending.pop(resp.get("id"), None)
+                if fut is None:
+                    continue
+                if "error" in resp:
+                    fut.set_exception(RuntimeError(resp["error"]))
+                elif isinstance(resp["result"], dict) and "valid" in resp["result"]:
+                    fut.set_result(step_from_dict(resp["result"]))
+                else:
+                    fut.set_result(resp["result"])
+        except (OSError, ValueError) as e:
+            err = e
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            fut.set_exception(err)
+
+
+def _goal_job(name: str) -> Callable[[LeanRPC], StepResult]:
+    def job(rpc: LeanRPC) -> StepResult:
+        st: LeanState = rpc.fetch_goal(name)
+        return StepResult(valid=True, new_state=st)
+
+    return job
+
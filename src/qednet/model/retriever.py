@@ -0,0 +1,210 @@
+# src/qednet/model/retriever.py
+from __future__ import annotations
+
+import json
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..data.lexer import LEAN_TOKEN
+from ..data.shards import StringColumn, load_array, load_blob
+
+_INDEX_VERSION = 1
+# Query terms (strongest first) whose best documents seed the MaxScore threshold.
+_SEED_TERMS = 3
+
+Hit = Tuple[str, float]
+
+
+def lean_tokens(text: str) -> List[str]:
+    """
+    Lean-aware lexical tokens: a dotted name yields itself, its components and, for
+    snake_case components, their words (Nat.succ_le -> nat.succ_le, nat, succ_le, succ, le);
+    operators and unicode symbols are kept as tokens, punctuation is dropped.
+    """
+    out: List[str] = []
+    for m in LEAN_TOKEN.finditer(text):
+        tok = m.group().lower()
+        out.append(tok)
+        if not (tok[0].isalpha() or tok[0] == "_"):
+            continue
+        parts = tok.split(".")
+        for part in parts if len(parts) > 1 else ():
+            out.append(part)
+        for part in parts:
+            words = [w for w in part.split("_") if w]
+            if len(words) > 1:
+                out.extend(words)
+    return out
+
+
+class PremiseRetriever:
+    """
+    BM25 premise retriever over exporter `statements`, served from memory-mapped postings.
+    - build(statements, out_dir): index "name + stmt" of every statement record.
+    - search(text, k) -> [(statement_id, score)]; search_many(texts, k, workers) for batches.
+    - hard_negatives(text, positives, k): top-k lexical look-alikes that are not positives.
+    Notes:
+      * Postings store precomputed BM25 impacts (float32) per (term, doc), grouped by term with
+        doc ids ascending; a query score is a sum of impacts.
+      * Top-k is exact with MaxScore pruning: the best documents of the strongest terms give a
+        threshold; terms whose summed maxima cannot reach it are never scanned, only probed
+        (binary search) for the candidates that can still make the top k.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        meta = json.loads((self.path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("version") != _INDEX_VERSION:
+            raise ValueError(f"Unsupported retriever index version: {meta.get('version')}")
+        self.meta = meta
+        self.num_docs: int = meta["num_docs"]
+        terms = json.loads((self.path / "vocab.json").read_text(encoding="utf-8"))
+        self.vocab: Dict[str, int] = {t: i for i, t in enumerate(terms)}
+        # Plain ndarray views of the maps: slicing np.memmap objects costs more than the lookups.
+        self.post_off = load_array(self.path / "post_off.npy").view(np.ndarray)
+        self.post_doc = load_array(self.path / "post_doc.npy").view(np.ndarray)
+        self.post_w = load_array(self.path / "post_w.npy").view(np.ndarray)
+        self.term_max = load_array(self.path / "term_max.npy").view(np.ndarray)
+        self.doc_ids = StringColumn(load_array(self.path / "doc_off.npy"), load_blob(self.path / "doc_ids.bin"))
+
+    # ---------- Building ----------
+
+    @classmethod
+    def build(
+        cls, statements: Iterable[Dict[str, object]], out_dir: Union[str, Path], k1: float = 1.2, b: float = 0.75
+    ) -> "PremiseRetriever":
+        """Indexes statement records ({"id", "name", "stmt", ...}); duplicate ids keep the first."""
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        vocab: Dict[str, int] = {}
+        seen = set()
+        ids: List[bytes] = []
+        dl: List[int] = []
+        t_parts: List[np.ndarray] = []
+        f_parts: List[np.ndarray] = []
+        for rec in statements:
+            sid = rec.get("id")
+            if not isinstance(sid, str) or sid in seen:
+                continue
+            seen.add(sid)
+            toks = lean_tokens(f"{rec.get('name') or ''} {rec.get('stmt') or ''}")
+            tf = Counter(vocab.setdefault(t, len(vocab)) for t in toks)
+            ids.append(sid.encode("utf-8"))
+            dl.append(len(toks))
+            t_parts.append(np.fromiter(tf.keys(), dtype=np.int64, count=len(tf)))
+            f_parts.append(np.fromiter(tf.values(), dtype=np.float64, count=len(tf)))
+
+        n, v = len(ids), len(vocab)
+        lens = np.array([len(t) for t in t_parts], dtype=np.int64)
+        terms = np.concatenate(t_parts) if t_parts else np.zeros(0, dtype=np.int64)
+        tfs = np.concatenate(f_parts) if f_parts else np.zeros(0)
+        docs = np.repeat(np.arange(n, dtype=np.int64), lens)
+        order = np.lexsort((docs, terms))
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+
+        df = np.bincount(terms, minlength=v)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        dl_arr = np.array(dl, dtype=np.float64)
+        avgdl = float(dl_arr.mean()) if n else 0.0
+        norm = k1 * (1 - b + b * dl_arr / (avgdl or 1.0))
+        w = (idf[terms] * tfs * (k1 + 1) / (tfs + norm[docs])).astype(np.float32)
+        post_off = np.zeros(v + 1, dtype=np.int64)
+        np.cumsum(df, out=post_off[1:])
+        term_max = np.maximum.reduceat(w, post_off[:-1]) if v else np.zeros(0, dtype=np.float32)
+
+        np.save(out / "post_off.npy", post_off)
+        np.save(out / "post_doc.npy", docs.astype(np.int32))
+        np.save(out / "post_w.npy", w)
+        np.save(out / "term_max.npy", term_max.astype(np.float32))
+        doc_off = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in ids], out=doc_off[1:])
+        np.save(out / "doc_off.npy", doc_off)
+        (out / "doc_ids.bin").write_bytes(b"".join(ids))
+        terms_by_id = [""] * v
+        for t, i in vocab.items():
+            terms_by_id[i] = t
+        (out / "vocab.json").write_text(json.dumps(terms_by_id, ensure_ascii=False), encoding="utf-8")
+        meta = {"version": _INDEX_VERSION, "num_docs": n, "num_terms": v, "avgdl": avgdl, "k1": k1, "b": b}
+        (out / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        return cls(out)
+
+    # ---------- Public API ----------
+
+    def search(self, text: str, k: int = 10) -> List[Hit]:
+        docs, scores = self._topk(text, k)
+        return [(self.doc_ids[int(d)], float(s)) for d, s in zip(docs, scores)]
+
+    def search_many(self, texts: Sequence[str], k: int = 10, workers: Optional[int] = None) -> List[List[Hit]]:
+        """Batch search; results are in input order. numpy releases the GIL in the heavy parts."""
+        if not workers or workers <= 1 or len(texts) < 2:
+            return [self.search(t, k) for t in texts]
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(lambda t: self.search(t, k), texts))
+
+    def hard_negatives(self, text: str, positives: Iterable[str], k: int = 10) -> List[str]:
+        """The k best-scoring statements for `text` that are not in `positives`."""
+        pos = set(positives)
+        return [sid for sid, _ in self.search(text, k + len(pos)) if sid not in pos][:k]
+
+    # ---------- Internals ----------
+
+    def _postings(self, t: int) -> Tuple[np.ndarray, np.ndarray]:
+        lo, hi = self.post_off[t], self.post_off[t + 1]
+        return self.post_doc[lo:hi], self.post_w[lo:hi]
+
+    def _score(self, cand: np.ndarray, terms: np.ndarray, qtf: np.ndarray) -> np.ndarray:
+        """Exact contribution of `terms` to each candidate doc (binary search per posting list)."""
+        out = np.zeros(len(cand), dtype=np.float64)
+        for t, m in zip(terms, qtf):
+            docs, w = self._postings(int(t))
+            idx = np.searchsorted(docs, cand)
+            idx[idx == len(docs)] = 0
+            hit = docs[idx] == cand if len(docs) else np.zeros(len(cand), dtype=bool)
+            out[hit] += m * w[idx[hit]]
+        return out
+
+    def _topk(self, text: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        tf = Counter(self.vocab[t] for t in lean_tokens(text) if t in self.vocab)
+        if not tf or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        terms = np.fromiter(tf.keys(), dtype=np.int64, count=len(tf))
+        qtf = np.fromiter(tf.values(), dtype=np.float64, count=len(tf))
+        maxes = self.term_max[terms] * qtf
+        order = np.argsort(maxes, kind="stable")
+        terms, qtf, maxes = terms[order], qtf[order], maxes[order]
+
+        # Threshold: exact k-th score among the best documents of the strongest few terms.
+        seeds = []
+        for t in terms[-_SEED_TERMS:]:
+            docs, w = self._postings(int(t))
+            seeds.append(docs if len(docs) <= k else docs[np.argpartition(-w, k - 1)[:k]])
+        seed = np.unique(np.concatenate(seeds))
+        seed_scores = self._score(seed, terms, qtf)
+        theta = float(np.partition(seed_scores, len(seed) - k)[len(seed) - k]) if len(seed) >= k else 0.0
+
+        # MaxScore split: docs matching only the weakest terms (summed maxima < theta) can't make
+        # it, so only the strong terms' postings are summed, per distinct doc they touch.
+        cum = np.cumsum(maxes)
+        n_weak = int(np.searchsorted(cum, theta, side="left")) if theta > 0 else 0
+        strong = [self._postings(int(t)) + (m,) for t, m in zip(terms[n_weak:], qtf[n_weak:])]
+        docs = np.concatenate([d for d, _, _ in strong])
+        contrib = np.concatenate([m * w.astype(np.float64) for _, w, m in strong])
+        uniq, inv = np.unique(docs, return_inverse=True)
+        acc = np.bincount(inv, weights=contrib, minlength=len(uniq))
+        weak_max = float(cum[n_weak - 1]) if n_weak else 0.0
+        keep = acc + weak_max >= max(theta, np.finfo(np.float64).tiny)
+        cand, scores = uniq[keep].astype(np.int64), acc[keep]
+        if n_weak:
+            scores += self._score(cand, terms[:n_weak], qtf[:n_weak])
+        if len(cand) > k:
+            # Keep every tie of the k-th score so the final order (score, then doc) is deterministic.
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = scores >= kth
+            cand, scores = cand[keep], scores[keep]
+        best = np.lexsort((cand, -scores))[:k]
+        return cand[best], scores[best]
+
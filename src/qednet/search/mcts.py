@@ -0,0 +1,241 @@
+# src/qednet/search/mcts.py
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from ..io.lean_pool import LeanPool
+from ..io.lean_rpc import LeanRPC, LeanState, StepResult
+from .tactics import SAFE_TACTICS
+
+_STALE = "Stale or foreign proof_state handle"
+
+
+@dataclass(eq=False)
+class SearchNode:
+    key: str                            # transposition key of `goals` (see state_key)
+    goals: List[LeanState]              # every open goal; [] = proof complete
+    parent: Optional["SearchNode"] = None
+    action: Optional[str] = None        # tactic that led here from `parent`
+    depth: int = 0
+    logprob: float = 0.0                # summed proposal log-priors along the path
+    handles: Dict[int, Optional[str]] = field(default_factory=dict, repr=False)  # id(rpc) -> proof_state there
+
+    @property
+    def solved(self) -> bool:
+        return not self.goals
+
+    def path(self) -> List["SearchNode"]:
+        """Nodes from the root down to this one."""
+        out: List[SearchNode] = []
+        node: Optional[SearchNode] = self
+        while node is not None:
+            out.append(node)
+            node = node.parent
+        return out[::-1]
+
+
+@dataclass
+class SearchResult:
+    proved: bool
+    reason: str                          # proved | exhausted | node_budget | time_budget | start_failed
+    trace: Optional[Dict[str, Any]]      # {"theorem_id", "steps": [...]} in the exporter's traces schema
+    nodes: int = 0                       # distinct proof states reached (transposition table size)
+    verifications: int = 0               # step() calls issued, replays excluded
+    transpositions: int = 0              # valid steps that reached an already-known state
+    elapsed_sec: float = 0.0
+    error: Optional[str] = None
+
+
+Proposer = Callable[[SearchNode], Sequence[Tuple[str, float]]]
+Scorer = Callable[[SearchNode], float]
+
+
+def state_key(goals: Sequence[LeanState]) -> str:
+    """Whitespace-normalized text of every goal (context + target): equal keys = same proof state."""
+    return "\n\n".join(
+        "\n".join([*(" ".join(h.split()) for h in g.pp_ctx), "⊢ " + " ".join(g.pp_goal.split())]) for g in goals
+    )
+
+
+def uniform_proposals(tactics: Sequence[str] = SAFE_TACTICS) -> Proposer:
+    """Proposes the same tactics for every node with a uniform log-prior."""
+    lp = -math.log(len(tactics)) if tactics else 0.0
+    cands = [(t, lp) for t in tactics]
+    return lambda node: cands
+
+
+def path_logprob(node: SearchNode) -> float:
+    return node.logprob
+
+
+class BestFirstSearch:
+    """
+    Best-first proof search driven by LeanRPC.start_proof() / step().
+    - prove(goal_type, theorem_name, theorem_id=None) -> SearchResult
+    - propose(node) -> [(tactic, log_prior)]: policy hook (default: SAFE_TACTICS, uniform).
+    - score(node) -> float: value hook, higher is better (default: summed log-priors).
+    Notes:
+      * The frontier holds (node, tactic) edges ranked by score(node) + log_prior; each round pops
+        the best `concurrency` edges and verifies them in parallel on a LeanPool (or inline on a
+        single LeanRPC). Rounds are synchronous, so results are processed in a deterministic order.
+      * A transposition table keyed by state_key() (whitespace-normalized goals with contexts)
+        merges states reached along different tactic paths: each state is expanded once, so no
+        (state, tactic) pair is verified twice. No-op tactics land on their own state and stop there.
+      * proof_state handles live in one worker; a node remembers its handle per worker and is
+        re-derived on another worker by replaying its tactic path from the nearest ancestor known
+        there (from start_proof() after a worker restart).
+      * Budgets: max_nodes distinct states, time_limit_sec wall time (checked between rounds),
+        max_depth tactics per path.
+    """
+
+    def __init__(
+        self,
+        verifier: Union[LeanRPC, LeanPool],
+        propose: Optional[Proposer] = None,
+        score: Optional[Scorer] = None,
+        concurrency: Optional[int] = None,
+        max_nodes: int = 1000,
+        time_limit_sec: float = 60.0,
+        max_depth: int = 32,
+    ) -> None:
+        self.verifier = verifier
+        self.propose = propose or uniform_proposals()
+        self.score = score or path_logprob
+        default = verifier.size if isinstance(verifier, LeanPool) else 1
+        self.concurrency = max(1, concurrency or default)
+        self.max_nodes = max_nodes
+        self.time_limit_sec = time_limit_sec
+        self.max_depth = max_depth
+
+    # ---------- Public API ----------
+
+    def prove(self, goal_type: str, theorem_name: str = "__tmp", theorem_id: Optional[str] = None) -> SearchResult:
+        t0 = time.perf_counter()
+        deadline = t0 + self.time_limit_sec
+        root = SearchNode(key="", goals=[])
+        opened = self._map([lambda rpc: self._open(rpc, root, goal_type, theorem_name)])[0]
+        if not opened.valid:
+            return SearchResult(False, "start_failed", None, error=opened.error, elapsed_sec=time.perf_counter() - t0)
+        root.goals = list(opened.goals or [])
+        root.key = state_key(root.goals)
+        table: Dict[str, SearchNode] = {root.key: root}
+        res = SearchResult(False, "exhausted", None, nodes=1)
+
+        seq = itertools.count()
+        frontier: List[Tuple[float, int, int, SearchNode, str, float]] = []
+
+        def push(node: SearchNode) -> None:
+            if node.depth >= self.max_depth:
+                return
+            base = self.score(node)
+            for tac, lp in self.propose(node):
+                heapq.heappush(frontier, (-(base + lp), len(node.goals), next(seq), node, tac, lp))
+
+        solved = root if root.solved else None
+        push(root)
+        while frontier and solved is None:
+            if len(table) >= self.max_nodes:
+                res.reason = "node_budget"
+                break
+            if time.perf_counter() >= deadline:
+                res.reason = "time_budget"
+                break
+            batch = [heapq.heappop(frontier)[3:] for _ in range(min(self.concurrency, len(frontier)))]
+            owners = [0] * len(batch)
+            jobs = [self._step_job(node, tac, goal_type, theorem_name, owners, i) for i, (node, tac, _) in enumerate(batch)]
+            results = self._map(jobs)
+            res.verifications += len(batch)
+            for (node, tac, lp), r, owner in zip(batch, results, owners):
+                if not r.valid:
+                    continue
+                key = state_key(r.goals or [])
+                if key in table:
+                    res.transpositions += 1
+                    continue
+                child = SearchNode(key, list(r.goals or []), node, tac, node.depth + 1, node.logprob + lp)
+                child.handles[owner] = r.new_state.proof_state if r.new_state else None
+                table[key] = child
+                if child.solved:
+                    solved = child
+                    break
+                push(child)
+
+        res.nodes = len(table)
+        res.elapsed_sec = time.perf_counter() - t0
+        if solved is not None:
+            res.proved, res.reason = True, "proved"
+            res.trace = proof_trace(solved, theorem_id or f"lean:{theorem_name}")
+        return res
+
+    # ---------- Internals ----------
+
+    def _map(self, jobs: Sequence[Callable[[LeanRPC], StepResult]]) -> List[StepResult]:
+        if isinstance(self.verifier, LeanPool):
+            return self.verifier.map(jobs)
+        out: List[StepResult] = []
+        for job in jobs:
+            try:
+                out.append(job(self.verifier))
+            except Exception as e:
+                out.append(StepResult(valid=False, error=f"{type(e).__name__}: {e}"))
+        return out
+
+    @staticmethod
+    def _open(rpc: LeanRPC, root: SearchNode, goal_type: str, theorem_name: str) -> StepResult:
+        st = rpc.start_proof(goal_type, theorem_name=theorem_name)
+        root.handles[id(rpc)] = st.proof_state
+        return StepResult(valid=True, new_state=st, goals=[st])
+
+    def _step_job(
+        self, node: SearchNode, tactic: str, goal_type: str, theorem_name: str, owners: List[int], i: int
+    ) -> Callable[[LeanRPC], StepResult]:
+        def job(rpc: LeanRPC) -> StepResult:
+            owners[i] = id(rpc)
+            r = rpc.step(self._state_on(rpc, node, goal_type, theorem_name), tactic)
+            if not r.valid and (r.error or "").startswith(_STALE):
+                r = rpc.step(self._state_on(rpc, node, goal_type, theorem_name, fresh=True), tactic)
+            return r
+
+        return job
+
+    def _state_on(
+        self, rpc: LeanRPC, node: SearchNode, goal_type: str, theorem_name: str, fresh: bool = False
+    ) -> LeanState:
+        """`node`'s first goal carrying a handle valid in `rpc`, replaying its tactic path if needed."""
+        key = id(rpc)
+        chain: List[SearchNode] = []
+        cur: Optional[SearchNode] = node
+        while cur is not None and (fresh or cur.handles.get(key) is None):
+            chain.append(cur)
+            cur = cur.parent
+        if cur is None:
+            cur = chain.pop()
+            self._open(rpc, cur, goal_type, theorem_name)
+        for nxt in reversed(chain):
+            r = rpc.step(self._at(cur, key), nxt.action or "")
+            if not r.valid:
+                if not fresh and (r.error or "").startswith(_STALE):
+                    return self._state_on(rpc, node, goal_type, theorem_name, fresh=True)
+                raise RuntimeError(f"Replaying '{nxt.action}' failed: {r.error}")
+            nxt.handles[key] = r.new_state.proof_state if r.new_state else None
+            cur = nxt
+        return self._at(node, key)
+
+    @staticmethod
+    def _at(node: SearchNode, key: int) -> LeanState:
+        return replace(node.goals[0], proof_state=node.handles[key])
+
+
+def proof_trace(node: SearchNode, theorem_id: str) -> Dict[str, Any]:
+    """The root -> `node` path as a traces record: one step per tactic, on the goal it was run on."""
+    steps = []
+    nodes = node.path()
+    for i, (before, after) in enumerate(zip(nodes, nodes[1:])):
+        g = before.goals[0]
+        steps.append({"i": i, "goal": f"⊢ {g.pp_goal}", "ctx": list(g.pp_ctx), "action": after.action, "ok": True})
+    return {"theorem_id": theorem_id, "steps": steps}
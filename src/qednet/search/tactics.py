@@ -0,0 +1,40 @@
+# src/qednet/search/tactics.py
+from __future__ import annotations
+
+from typing import Tuple
+
+# Tactics that need no arguments and are cheap to try on any goal: closers first, then
+# normalizers and goal-structure moves. Default proposals of the search until a policy exists.
+SAFE_TACTICS: Tuple[str, ...] = (
+    "rfl",
+    "trivial",
+    "decide",
+    "norm_num",
+    "simp",
+    "simp_all",
+    "omega",
+    "linarith",
+    "nlinarith",
+    "positivity",
+    "ring",
+    "ring_nf",
+    "field_simp",
+    "norm_cast",
+    "push_cast",
+    "assumption",
+    "contradiction",
+    "tauto",
+    "aesop",
+    "constructor",
+    "intro",
+    "intros",
+    "rintro ⟨⟩",
+    "ext",
+    "funext",
+    "congr",
+    "split",
+    "left",
+    "right",
+    "exfalso",
+    "by_contra",
+)
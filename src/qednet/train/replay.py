@@ -0,0 +1,379 @@
+# src/qednet/train/replay.py
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from ..data.state_store import PREFIX, StateStore, is_state_id
+
+_FORMAT_VERSION = 2
+_META = "meta.json"
+_LIVE = "live"  # the writable column memmaps of a path=... buffer
+# One preallocated array per column; strings are interned (see _VOCAB_COLUMNS) or hashed (state).
+_COLUMNS: Dict[str, str] = {
+    "state": "S32",        # hex digest of a StateStore id (without the "hash:" prefix)
+    "action": "int32",     # -> vocab["action"]
+    "theorem_id": "int32",  # -> vocab["theorem_id"]
+    "outcome": "int32",    # -> vocab["outcome"] (trajectory outcome, repeated on each step)
+    "trajectory": "int64",  # insertion ordinal of the trajectory
+    "i": "int32",
+    "logp": "float32",
+    "value": "float32",
+    "reward": "float32",
+    "seq": "int64",        # global insertion number: tells a live slot from one overwritten since sampling
+    "priority": "float64",  # sum-tree leaf (priority ** alpha)
+}
+_VOCAB_COLUMNS = ("action", "theorem_id", "outcome")
+_DEFAULTS: Dict[str, Any] = {"i": 0, "logp": 0.0, "value": 0.0, "reward": 0.0, "outcome": None, "trajectory": -1}
+
+
+class SumTree:
+    """
+    Binary sum-tree over `capacity` non-negative leaves (capacity rounded up to a power of two).
+    - update(idx, values) / rebuild(values): O(k log n) / O(n), both vectorized level by level.
+    - find(u) -> leaf indices whose prefix-sum interval contains each u (proportional sampling).
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.n = 1 << max(0, int(capacity) - 1).bit_length()
+        self.depth = self.n.bit_length() - 1
+        self.tree = np.zeros(2 * self.n, dtype=np.float64)
+
+    @property
+    def total(self) -> float:
+        return float(self.tree[1])
+
+    def update(self, idx: np.ndarray, values: np.ndarray) -> None:
+        pos = np.asarray(idx, dtype=np.int64) + self.n
+        self.tree[pos] = values
+        for _ in range(self.depth):
+            pos = np.unique(pos >> 1)
+            self.tree[pos] = self.tree[2 * pos] + self.tree[2 * pos + 1]
+
+    def rebuild(self, values: np.ndarray) -> None:
+        self.tree[:] = 0.0
+        self.tree[self.n : self.n + len(values)] = values
+        lo = self.n
+        while lo > 1:
+            lo //= 2
+            self.tree[lo : 2 * lo] = self.tree[2 * lo : 4 * lo : 2] + self.tree[2 * lo + 1 : 4 * lo : 2]
+
+    def find(self, u: np.ndarray) -> np.ndarray:
+        u = np.array(u, dtype=np.float64)
+        idx = np.ones(len(u), dtype=np.int64)
+        for _ in range(self.depth):
+            left = self.tree[2 * idx]
+            right = u >= left
+            u -= np.where(right, left, 0.0)
+            idx = 2 * idx + right
+        return idx - self.n
+
+
+@dataclass
+class ReplayBatch:
+    index: np.ndarray           # buffer slots; pass back to update_priorities() with `seq`
+    seq: np.ndarray
+    weight: np.ndarray          # importance-sampling weights, max-normalized to 1
+    data: Dict[str, np.ndarray]  # column -> values at `index` (vocab columns as ids)
+    vocab: Dict[str, List[str]]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def states(self) -> List[str]:
+        """StateStore ids ("hash:...") of the sampled steps."""
+        return [PREFIX + s.decode("ascii") for s in self.data["state"]]
+
+    def strings(self, column: str) -> List[Optional[str]]:
+        """Decoded values of an interned column (action, theorem_id, outcome)."""
+        words = self.vocab[column]
+        return [words[i] if i >= 0 else None for i in self.data[column].tolist()]
+
+
+class ReplayBuffer:
+    """
+    Prioritized replay over preallocated column arrays with FIFO eviction.
+    - add(columns, priority=None): vectorized insert of k steps -> their slots.
+    - add_trajectories(records, store=None): flattens `replay` records ({trajectory_id,
+      theorem_id, steps: [{i, state, action, logp, value, reward}], outcome}).
+    - sample(batch_size, beta) -> ReplayBatch; update_priorities(index, priorities, seq).
+    - snapshot(path=None) / ReplayBuffer.load(path): memory-mapped persistence and resume.
+    Notes:
+      * Sampling is proportional to priority ** alpha through a SumTree, stratified over the
+        batch; new steps enter at the largest priority seen so far, so each is seen early.
+        What the priority measures ("learning progress": |TD error|, loss change, ...) is the
+        trainer's choice.
+      * States are stored as StateStore ids, never as text; plain-text states are interned
+        into the `store` passed to add_trajectories(). The action / theorem_id / outcome
+        vocabularies are compacted to the words of live slots on snapshot() and whenever one
+        outgrows twice the capacity, so they stay bounded however long the run.
+      * A buffer created with path=... (or loaded) keeps its columns in .npy memmaps under
+        <path>/live. snapshot() copies them into a fresh <dir>/snap-* directory and then
+        atomically points meta.json at it, so later adds never touch a snapshot: it stays the
+        consistency point a resumed run starts from. The tree is rebuilt from the priority
+        column on load.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        alpha: float = 0.6,
+        eps: float = 1e-6,
+        path: Optional[Union[str, Path]] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        if capacity <= 0:
+            raise ValueError("ReplayBuffer capacity must be positive.")
+        self.capacity = int(capacity)
+        self.alpha = alpha
+        self.eps = eps
+        self.path = Path(path) if path else None
+        self.rng = np.random.default_rng(seed)
+        self.size = 0
+        self.cursor = 0
+        self.inserted = 0
+        self.trajectories = 0
+        self.max_priority = 1.0
+        self.vocab: Dict[str, List[str]] = {c: [] for c in _VOCAB_COLUMNS}
+        self._ids: Dict[str, Dict[str, int]] = {c: {} for c in _VOCAB_COLUMNS}
+        self.tree = SumTree(self.capacity)
+        self.cols = self._columns(self.path)
+
+    def __len__(self) -> int:
+        return self.size
+
+    # ---------- Public API ----------
+
+    def add(self, columns: Mapping[str, Any], priority: Optional[Union[float, Sequence[float]]] = None) -> np.ndarray:
+        """
+        Inserts k steps given column-wise (state ids, action/theorem_id/outcome strings, numbers);
+        missing numeric columns take defaults. Returns their slots; beyond capacity the oldest go.
+        """
+        states = list(columns["state"])
+        k = len(states)
+        if k == 0:
+            return np.zeros(0, dtype=np.int64)
+        bad = next((s for s in states if not is_state_id(s)), None)
+        if bad is not None:
+            raise ValueError(f"ReplayBuffer stores StateStore ids, got {bad!r}; intern states first.")
+        vals: Dict[str, np.ndarray] = {"state": np.array([s[len(PREFIX):] for s in states], dtype="S32")}
+        for c in _VOCAB_COLUMNS:
+            vals[c] = self._intern(c, columns.get(c), k)
+        for c in ("trajectory", "i", "logp", "value", "reward"):
+            v = columns.get(c)
+            vals[c] = np.full(k, _DEFAULTS[c]) if v is None else np.asarray(v)
+        vals["seq"] = np.arange(self.inserted, self.inserted + k, dtype=np.int64)
+        if priority is None:
+            prio = np.full(k, self.max_priority)
+        else:
+            prio = np.abs(np.broadcast_to(np.asarray(priority, dtype=np.float64), (k,))) + self.eps
+            self.max_priority = max(self.max_priority, float(prio.max()))
+        vals["priority"] = prio ** self.alpha
+
+        if k > self.capacity:  # only the newest `capacity` steps survive anyway
+            vals = {c: v[-self.capacity :] for c, v in vals.items()}
+            self.inserted += k - self.capacity
+            k = self.capacity
+        slots = (self.cursor + np.arange(k)) % self.capacity
+        for c, v in vals.items():
+            self.cols[c][slots] = v
+        self.tree.update(slots, vals["priority"])
+        self.inserted += k
+        self.cursor = int((self.cursor + k) % self.capacity)
+        self.size = min(self.capacity, self.size + k)
+        if any(len(words) > 2 * self.capacity for words in self.vocab.values()):
+            self._compact()
+        return slots
+
+    def add_trajectories(
+        self, records: Iterable[Mapping[str, Any]], store: Optional[StateStore] = None,
+        priority: Optional[float] = None,
+    ) -> np.ndarray:
+        """Adds every step of `replay` records in one insert; text states need a StateStore."""
+        cols: Dict[str, List[Any]] = {c: [] for c in ("state", "action", "theorem_id", "outcome", "trajectory",
+                                                      "i", "logp", "value", "reward")}
+        traj = self.trajectories - 1
+        for traj, rec in enumerate(records, start=self.trajectories):
+            for j, st in enumerate(rec.get("steps") or []):
+                cols["state"].append(st.get("state"))
+                cols["action"].append(st.get("action"))
+                cols["theorem_id"].append(rec.get("theorem_id"))
+                cols["outcome"].append(rec.get("outcome"))
+                cols["trajectory"].append(traj)
+                cols["i"].append(st.get("i", j))
+                for c in ("logp", "value", "reward"):
+                    v = st.get(c)
+                    cols[c].append(_DEFAULTS[c] if v is None else v)
+        text = [i for i, s in enumerate(cols["state"]) if not is_state_id(s)]
+        if text:
+            if store is None or any(not isinstance(cols["state"][i], str) for i in text):
+                raise ValueError("Replay steps with plain-text (or missing) states need a StateStore to intern them.")
+            for i, sid in zip(text, store.put_many([cols["state"][i] for i in text])):
+                cols["state"][i] = sid
+        slots = self.add(cols, priority=priority)
+        self.trajectories = traj + 1
+        return slots
+
+    def sample(self, batch_size: int, beta: float = 0.4, rng: Optional[np.random.Generator] = None) -> ReplayBatch:
+        """Proportional, stratified sample of `batch_size` steps (with replacement); 0 -> an empty batch."""
+        if batch_size < 0:
+            raise ValueError(f"batch_size must be non-negative, got {batch_size}.")
+        if self.size == 0:
+            raise ValueError("Cannot sample from an empty ReplayBuffer.")
+        if batch_size == 0:
+            idx = np.zeros(0, dtype=np.int64)
+            data = {c: np.asarray(v[idx]) for c, v in self.cols.items() if c not in ("seq", "priority")}
+            return ReplayBatch(index=idx, seq=np.zeros(0, dtype=np.int64), weight=np.zeros(0, dtype=np.float32),
+                               data=data, vocab=self.vocab)
+        rng = rng or self.rng
+        total = self.tree.total
+        u = (np.arange(batch_size) + rng.random(batch_size)) * (total / batch_size)
+        idx = self.tree.find(np.minimum(u, np.nextafter(total, 0.0)))
+        leaf = self.cols["priority"]
+        bad = (idx >= self.size) | (leaf[np.minimum(idx, self.capacity - 1)] <= 0)
+        if bad.any():  # float rounding at an interval edge: fall back to a uniform live slot
+            idx[bad] = rng.integers(0, self.size, int(bad.sum()))
+        p = np.asarray(leaf[idx], dtype=np.float64) / total
+        weight = (self.size * p) ** (-beta)
+        weight /= weight.max()
+        data = {c: np.asarray(v[idx]) for c, v in self.cols.items() if c not in ("seq", "priority")}
+        return ReplayBatch(index=idx, seq=np.asarray(self.cols["seq"][idx]), weight=weight.astype(np.float32),
+                           data=data, vocab=self.vocab)
+
+    def update_priorities(
+        self, index: np.ndarray, priorities: Union[float, Sequence[float], np.ndarray],
+        seq: Optional[np.ndarray] = None,
+    ) -> int:
+        """
+        Sets new priorities for sampled slots; with `seq` (ReplayBatch.seq), slots overwritten
+        since sampling are left alone. Returns the number of slots updated.
+        """
+        index = np.asarray(index, dtype=np.int64)
+        prio = np.abs(np.broadcast_to(np.asarray(priorities, dtype=np.float64), index.shape)) + self.eps
+        if seq is not None:
+            live = np.asarray(self.cols["seq"][index]) == np.asarray(seq)
+            index, prio = index[live], prio[live]
+        if len(index):
+            self.max_priority = max(self.max_priority, float(prio.max()))
+            leaves = prio ** self.alpha
+            self.cols["priority"][index] = leaves
+            self.tree.update(index, leaves)
+        return len(index)
+
+    def snapshot(self, path: Optional[Union[str, Path]] = None) -> Path:
+        """Persists the buffer under `path` (default: its own directory) for ReplayBuffer.load()."""
+        out = Path(path) if path else self.path
+        if out is None:
+            raise ValueError("In-memory ReplayBuffer: snapshot() needs a path.")
+        out.mkdir(parents=True, exist_ok=True)
+        self._compact()
+        snap = Path(tempfile.mkdtemp(prefix="snap-", dir=out))
+        for c, v in self.cols.items():
+            with open(snap / f"{c}.npy", "wb") as f:
+                np.save(f, np.asarray(v))
+                f.flush()
+                os.fsync(f.fileno())
+        meta = {
+            "version": _FORMAT_VERSION,
+            "capacity": self.capacity,
+            "alpha": self.alpha,
+            "eps": self.eps,
+            "size": self.size,
+            "cursor": self.cursor,
+            "inserted": self.inserted,
+            "trajectories": self.trajectories,
+            "max_priority": self.max_priority,
+            "vocab": self.vocab,
+            "columns": snap.name,
+        }
+        tmp = out / f"{_META}.tmp"
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, out / _META)
+        for old in out.glob("snap-*"):  # earlier snapshots (or ones a crash left half-written)
+            if old.name != snap.name:
+                shutil.rmtree(old, ignore_errors=True)
+        return out
+
+    @classmethod
+    def load(cls, path: Union[str, Path], seed: Optional[int] = None) -> "ReplayBuffer":
+        """
+        Reopens the snapshot at `path`: its columns are copied into fresh live memmaps under
+        <path>/live, and later snapshot() calls write new snapshots there.
+        """
+        root = Path(path)
+        meta = json.loads((root / _META).read_text(encoding="utf-8"))
+        if meta.get("version") != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported replay snapshot version: {meta.get('version')}")
+        buf = cls.__new__(cls)
+        buf.capacity = meta["capacity"]
+        buf.alpha = meta["alpha"]
+        buf.eps = meta["eps"]
+        buf.path = root
+        buf.rng = np.random.default_rng(seed)
+        buf.size = meta["size"]
+        buf.cursor = meta["cursor"]
+        buf.inserted = meta["inserted"]
+        buf.trajectories = meta["trajectories"]
+        buf.max_priority = meta["max_priority"]
+        buf.vocab = {c: list(meta["vocab"].get(c, [])) for c in _VOCAB_COLUMNS}
+        buf._ids = {c: {w: i for i, w in enumerate(words)} for c, words in buf.vocab.items()}
+        buf.cols = buf._columns(root)
+        for c in _COLUMNS:
+            buf.cols[c][:] = np.load(root / meta["columns"] / f"{c}.npy", mmap_mode="r")
+        buf.tree = SumTree(buf.capacity)
+        buf.tree.rebuild(np.where(np.arange(buf.capacity) < buf.size, buf.cols["priority"], 0.0))
+        return buf
+
+    # ---------- Internals ----------
+
+    def _columns(self, path: Optional[Path]) -> Dict[str, np.ndarray]:
+        if path is None:
+            return {c: np.zeros(self.capacity, dtype=dt) for c, dt in _COLUMNS.items()}
+        live = path / _LIVE
+        live.mkdir(parents=True, exist_ok=True)
+        for c in _COLUMNS:  # unlink, not truncate: another buffer may still map the old files
+            (live / f"{c}.npy").unlink(missing_ok=True)
+        return {
+            c: np.lib.format.open_memmap(live / f"{c}.npy", mode="w+", dtype=dt, shape=(self.capacity,))
+            for c, dt in _COLUMNS.items()
+        }
+
+    def _compact(self) -> None:
+        # Drops the vocabulary words no live slot refers to any more and renumbers the columns.
+        # New lists replace the old ones, so ReplayBatches sampled earlier keep decoding.
+        vocab = dict(self.vocab)
+        for c in _VOCAB_COLUMNS:
+            col = self.cols[c]
+            ids = np.asarray(col[: self.size])
+            used = np.unique(ids[ids >= 0])
+            if len(used) == len(vocab[c]):
+                continue
+            remap = np.full(len(vocab[c]), -1, dtype=np.int32)
+            remap[used] = np.arange(len(used), dtype=np.int32)
+            col[: self.size] = np.where(ids >= 0, remap[np.maximum(ids, 0)], -1)
+            vocab[c] = [vocab[c][i] for i in used.tolist()]
+            self._ids[c] = {w: i for i, w in enumerate(vocab[c])}
+        self.vocab = vocab
+
+    def _intern(self, column: str, values: Optional[Iterable[Optional[str]]], k: int) -> np.ndarray:
+        if values is None:
+            return np.full(k, -1, dtype=np.int32)
+        ids, words = self._ids[column], self.vocab[column]
+        out = np.empty(k, dtype=np.int32)
+        for j, w in enumerate(values):
+            if w is None:
+                out[j] = -1
+                continue
+            i = ids.get(w)
+            if i is None:
+                i = ids[w] = len(words)
+                words.append(w)
+            out[j] = i
+        return out
@@ -54,3 +54,16 @@ def leanrpc(lean_installed):
     imports = _default_imports()
     # If you run tests inside a Lake project, LeanRPC will prefer `lake env lean`
     return LeanRPC(imports=imports, timeout_sec=timeout)
+
+# --- Fake Lean (tests/fixtures/fake_lean.py) for toolchain-free tests ---
+FAKE_LEAN = ROOT / "tests" / "fixtures" / "fake_lean.py"
+
+@pytest.fixture(scope="session")
+def fake_lean_cmd() -> List[str]:
+    """Command that behaves like `lean <file>`."""
+    return [sys.executable, str(FAKE_LEAN)]
+
+@pytest.fixture(scope="session")
+def fake_repl_cmd() -> List[str]:
+    """Command that speaks the Lean REPL JSON protocol."""
+    return [sys.executable, str(FAKE_LEAN), "--repl"]
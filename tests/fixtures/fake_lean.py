@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Deterministic stand-in for `lean <file>`, `lake env lean <file>` and the Lean REPL, used by tests
+and benchmarks that must run without a Lean/Mathlib toolchain.
+
+Usage:
+  python tests/fixtures/fake_lean.py [--json] FILE        # behaves like `lean [--json] FILE`
+  python tests/fixtures/fake_lean.py env lean FILE        # `lake env lean FILE` (shimmed as lake)
+  python tests/fixtures/fake_lean.py --repl | repl        # JSON commands on stdin, like leanprover-community/repl
+
+Behaviour (per source line of a command/file):
+  - `import X`           accepted (spends FAKE_LEAN_IMPORT_SEC once per process/file)
+  - `#check NAME`        info "NAME : <type>"; names starting with `missing` are unknown identifiers
+  - `sorry`              warning "declaration uses 'sorry'"
+  - contains `FAIL`      error "unsolved goals" at that line
+  - contains `SLEEP`     hangs (use to exercise timeouts)
+  - contains `CRASH`     the process dies immediately
+  - `theorem X : T := by sorry` (REPL) reports a sorry with a fresh proofState for goal `⊢ T`
+  REPL tactic mode ({"tactic": .., "proofState": n}) on the first goal:
+  - `intro a b`          adds hypotheses `a b : ℕ`
+  - `constructor`        splits the goal in two
+  - trivial/simp/rfl     closes the goal; `FAIL` is an error; anything else is a no-op
+
+Load model (environment variables):
+  FAKE_LEAN_IMPORT_SEC   cost of the imports, paid once per process (default 0)
+  FAKE_LEAN_ELAB_SEC     cost of every non-import command / file (default 0)
+  FAKE_LEAN_BUSY=1       spend those costs spinning on the CPU instead of sleeping
+  FAKE_LEAN_ERROR_RATE   fraction of `theorem` sources that fail with "simulated error"
+  FAKE_LEAN_TIMEOUT_RATE fraction of `theorem` sources that hang for FAKE_LEAN_HANG_SEC (default 3600)
+  Which sources fail/hang is a pure function of their text (crc32), so runs are repeatable.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+import zlib
+
+TYPES = {
+    "Nat.add_comm": "∀ (n m : ℕ), n + m = m + n",
+    "Nat.mul_comm": "∀ (n m : ℕ), n * m = m * n",
+}
+
+
+def _sleep(var: str) -> None:
+    sec = float(os.getenv(var, "0") or 0)
+    if sec <= 0:
+        return
+    if os.getenv("FAKE_LEAN_BUSY") == "1":
+        end = time.perf_counter() + sec
+        while time.perf_counter() < end:
+            pass
+    else:
+        time.sleep(sec)
+
+
+def _roll(src: str) -> float:
+    """Deterministic pseudo-random number in [0, 1) for a source text."""
+    return zlib.crc32(src.encode("utf-8")) / 2**32
+
+
+def elaborate(src: str, emit=None) -> list[dict]:
+    """
+    Returns REPL-shaped messages for `src` (1-based lines, 0-based columns); `emit(msg)` is called
+    as soon as each one is produced, like Lean printing diagnostics while it elaborates.
+    """
+    msgs: list[dict] = []
+    if emit is not None:
+        msgs = _Emitting(emit)
+    imported = False
+    for lineno, line in enumerate(src.splitlines(), start=1):
+        stripped = line.strip()
+        if stripped.startswith("import "):
+            if not imported:
+                _sleep("FAKE_LEAN_IMPORT_SEC")
+                imported = True
+            continue
+        if "CRASH" in line:
+            sys.stdout.flush()
+            os._exit(134)
+        if "SLEEP" in line:
+            time.sleep(3600)
+        col = len(line) - len(line.lstrip())
+        if stripped.startswith("#check "):
+            name = stripped[len("#check "):].strip().lstrip("@")
+            if name.split(".")[-1].startswith("missing"):
+                msgs.append({"severity": "error", "pos": {"line": lineno, "column": col + 7},
+                             "data": f"unknown identifier '{name}'"})
+            else:
+                msgs.append({"severity": "info", "pos": {"line": lineno, "column": col},
+                             "data": f"{name} : {TYPES.get(name, 'True')}"})
+        elif stripped == "sorry":
+            msgs.append({"severity": "warning", "pos": {"line": lineno, "column": col},
+                         "data": "declaration uses 'sorry'"})
+        elif "FAIL" in line:
+            msgs.append({"severity": "error", "pos": {"line": lineno, "column": col}, "data": "unsolved goals"})
+
+    hang = float(os.getenv("FAKE_LEAN_TIMEOUT_RATE", "0") or 0)
+    fail = float(os.getenv("FAKE_LEAN_ERROR_RATE", "0") or 0)
+    if hang or fail:
+        for lineno, script in _theorem_scripts(src):
+            roll = _roll(script)
+            if roll < hang:
+                time.sleep(float(os.getenv("FAKE_LEAN_HANG_SEC", "3600")))
+            elif roll < hang + fail:
+                msgs.append({"severity": "error", "pos": {"line": lineno, "column": 0}, "data": "simulated error"})
+    return msgs
+
+
+def _theorem_scripts(src: str) -> list[tuple[int, str]]:
+    """(line of `theorem`, its indented tactic lines) for every theorem, however it is wrapped."""
+    out: list[tuple[int, list[str]]] = []
+    for lineno, line in enumerate(src.splitlines(), start=1):
+        if line.startswith("theorem "):
+            out.append((lineno, []))
+        elif out and line[:1].isspace() and line.strip():
+            out[-1][1].append(line.strip())
+    return [(lineno, "\n".join(body)) for lineno, body in out]
+
+
+class _Emitting(list):
+    def __init__(self, emit) -> None:
+        super().__init__()
+        self._emit = emit
+
+    def append(self, msg: dict) -> None:
+        super().append(msg)
+        self._emit(msg)
+
+
+def run_file(path: str, as_json: bool = False) -> int:
+    with open(path, encoding="utf-8") as f:
+        src = f.read()
+    _sleep("FAKE_LEAN_ELAB_SEC")
+
+    def emit(m: dict) -> None:
+        if as_json:
+            sev = "information" if m["severity"] == "info" else m["severity"]
+            print(json.dumps({**m, "severity": sev, "fileName": path}, ensure_ascii=False))
+        elif m["severity"] == "info":
+            print(m["data"])
+        else:
+            print(f"{path}:{m['pos']['line']}:{m['pos']['column']}: {m['severity']}: {m['data']}")
+        sys.stdout.flush()
+
+    msgs = elaborate(src, emit)
+    return 1 if any(m["severity"] == "error" for m in msgs) else 0
+
+
+CLOSERS = {"trivial", "simp", "rfl", "decide", "omega", "done"}
+
+
+def apply_tactic(goals: list[str], tactic: str) -> list[str]:
+    first, rest = goals[0], goals[1:]
+    if tactic.startswith("intro "):
+        ctx, _, target = first.rpartition("⊢ ")
+        hyp = " ".join(tactic.split()[1:]) + " : ℕ\n"
+        return [ctx + hyp + "⊢ " + target] + rest
+    if tactic == "constructor":
+        return [first, first] + rest
+    if tactic in CLOSERS:
+        return rest
+    return goals
+
+
+def run_repl() -> int:
+    envs = 0
+    states: dict[int, list[str]] = {}
+    buf: list[str] = []
+    for line in sys.stdin:
+        if line.strip():
+            buf.append(line)
+            continue
+        if not buf:
+            continue
+        req = json.loads("".join(buf))
+        buf = []
+        if req.get("env") is not None or "tactic" in req:
+            _sleep("FAKE_LEAN_ELAB_SEC")
+        if "tactic" in req:
+            goals = states.get(req["proofState"])
+            if goals is None:
+                resp = {"message": f"Unknown proof state: {req['proofState']}"}
+            elif "FAIL" in req["tactic"] or not goals:
+                resp = {"message": "Lean error:\nunsolved goals"}
+            else:
+                states[len(states)] = apply_tactic(goals, req["tactic"].strip())
+                resp = {"proofState": len(states) - 1, "goals": states[len(states) - 1]}
+            sys.stdout.write(json.dumps(resp, ensure_ascii=False, indent=1) + "\n\n")
+            sys.stdout.flush()
+            continue
+        cmd = req.get("cmd", "")
+        msgs = elaborate(cmd)
+        resp = {"env": envs}
+        envs += 1
+        if msgs:
+            resp["messages"] = msgs
+        for line in cmd.splitlines():
+            if line.startswith("theorem ") and " : " in line and "sorry" in cmd:
+                goal = line.split(" : ", 1)[1].rsplit(" := by", 1)[0]
+                states[len(states)] = [f"⊢ {goal}"]
+                resp["sorries"] = [{"goal": f"⊢ {goal}", "proofState": len(states) - 1}]
+        sys.stdout.write(json.dumps(resp, ensure_ascii=False, indent=1) + "\n\n")
+        sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--repl" in args or (args and os.path.basename(args[-1]) == "repl"):
+        sys.exit(run_repl())
+    sys.exit(run_file(args[-1], as_json="--json" in args))
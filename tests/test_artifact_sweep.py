@@ -0,0 +1,55 @@
+# tests/test_artifact_sweep.py
+import io
+import json
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+sys.path.insert(0, str(ROOT / "data" / "scripts"))
+import artifact_sweep  # noqa: E402
+
+
+def _rows(doc, chunk=None, monkeypatch=None):
+    if chunk is not None:
+        monkeypatch.setattr(artifact_sweep, "_CHUNK", chunk)
+    return list(artifact_sweep.iter_json_rows(io.StringIO(json.dumps(doc))))
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 1 << 20])
+def test_incremental_parse_matches_legacy_order(chunk, monkeypatch):
+    doc = {
+        "name": "Top.decl",
+        "kind": "def",
+        "tactics": [{"name": "ignored"} for _ in range(50)],
+        "rows": [{"full_name": "R.one", "type": "Nat"}, 12345, "x"],
+        "decls": [{"decl_name": "D.one", "k": "axiom"}, {"name": "no_type"}],
+    }
+    assert _rows(doc, chunk, monkeypatch) == [
+        {"full_name": "D.one", "type": None, "kind": "axiom"},
+        {"full_name": "R.one", "type": "Nat", "kind": None},
+        {"full_name": "Top.decl", "type": None, "kind": "def"},
+    ]
+    arr = [{"name": f"A.{i}", "ty": 1.5e10} for i in range(30)] + [None, [1, 2]]
+    assert len(_rows(arr, chunk, monkeypatch)) == 30
+
+
+def test_sweep_reports_skips_and_keeps_input_order(tmp_path):
+    (tmp_path / "a.json").write_text(json.dumps([{"name": "A", "type": "T"}]))
+    (tmp_path / "b.json").write_text('[{"name": "B", "type": "T"}')
+    (tmp_path / "c.jsonl").write_text('{"name": "C", "kind": "thm"}\nnot json\n\n{"x": 1}\n')
+    (tmp_path / "d.json").write_bytes(b"\xff\xfe")
+    paths = sorted(artifact_sweep.find_artifacts(tmp_path))
+
+    for workers, executor in ((1, "process"), (2, "thread"), (2, "process")):
+        sweep = artifact_sweep.ArtifactSweep(workers=workers, executor=executor)
+        results = list(sweep.run(paths, cached=lambda p: [{"full_name": "cached"}] if p.name == "a.json" else None))
+        assert [r.path.name for r in results] == ["a.json", "b.json", "c.jsonl", "d.json"]
+        assert [r.rows for r in results] == [
+            [{"full_name": "cached"}], [], [{"full_name": "C", "type": None, "kind": "thm"}], []
+        ]
+        st = sweep.stats
+        assert (st.files, st.cached, st.rows, st.bad_lines) == (4, 1, 2, 1)
+        assert st.skipped == {"invalid_json": 1, "not_utf8": 1}
+        assert len(st.timings) == 3 and "skipped: invalid_json=1" in st.summary()
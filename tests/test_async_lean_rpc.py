@@ -0,0 +1,57 @@
+# tests/test_async_lean_rpc.py
+import asyncio
+import time
+
+from qednet.io.async_lean_rpc import AsyncLeanRPC
+
+
+def test_async_mirrors_blocking_api(fake_lean_cmd):
+    async def go():
+        rpc = AsyncLeanRPC(lean_cmd=fake_lean_cmd)
+        st = await rpc.fetch_goal("Nat.add_comm")
+        res = await rpc.check_tactics(st.pp_goal, ["intro m n\nsimp", "FAIL"])
+        return st, res
+
+    st, res = asyncio.run(go())
+    assert st.pp_goal == "∀ (n m : ℕ), n + m = m + n"
+    assert res[0].valid and not res[1].valid
+    assert "unsolved goals" in res[1].error
+
+
+def test_per_call_deadline(fake_lean_cmd):
+    async def go():
+        rpc = AsyncLeanRPC(lean_cmd=fake_lean_cmd)
+        t0 = time.perf_counter()
+        res = await rpc.check_tactic("True", "SLEEP", timeout_sec=0.5)
+        return res, time.perf_counter() - t0
+
+    res, elapsed = asyncio.run(go())
+    assert not res.valid and "timed out" in res.error
+    assert elapsed < 5
+
+
+def test_cancel_kills_lean_process(fake_lean_cmd, monkeypatch):
+    procs = []
+    spawn = asyncio.create_subprocess_exec
+
+    async def recording_spawn(*args, **kwargs):
+        proc = await spawn(*args, **kwargs)
+        procs.append(proc)
+        return proc
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", recording_spawn)
+
+    async def go():
+        rpc = AsyncLeanRPC(lean_cmd=fake_lean_cmd)
+        task = asyncio.create_task(rpc.check_tactic("True", "SLEEP"))
+        while not procs:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return task.cancelled()
+
+    assert asyncio.run(go())
+    assert procs[0].returncode is not None
@@ -0,0 +1,25 @@
+# tests/test_bench_verification.py
+import importlib.util
+import sys
+
+from conftest import ROOT
+
+spec = importlib.util.spec_from_file_location("bench_verification", ROOT / "benchmarks" / "bench_verification.py")
+bench_verification = importlib.util.module_from_spec(spec)
+sys.modules["bench_verification"] = bench_verification
+spec.loader.exec_module(bench_verification)
+
+
+def test_bench_smoke_runs_every_variant(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", "")
+    monkeypatch.setenv("FAKE_LEAN_ERROR_RATE", "0.5")
+    bench_verification.install_fake_toolchain(tmp_path / "bin")
+    rows = bench_verification.bench(levels=[1, 2], calls=4)
+    assert {(r.variant, r.concurrency) for r in rows} == {
+        (v, c) for v in bench_verification.VARIANTS for c in (1, 2)
+    }
+    # Every variant sees the same deterministic failures (cached uses a smaller distinct set).
+    bad = {r.invalid for r in rows if r.variant != "cached"}
+    assert len(bad) == 1
+    assert all(r.calls == 4 and r.calls_per_sec > 0 for r in rows)
+    assert "calls/s" in bench_verification.format_table(rows)
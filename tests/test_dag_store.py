@@ -0,0 +1,73 @@
+# tests/test_dag_store.py
+import json
+
+import numpy as np
+
+from conftest import ROOT
+
+from qednet.dag.store import DagStore
+
+
+def _chain(n):
+    dag = DagStore()
+    dag.add_nodes([f"g{i}" for i in range(n)], "goal")
+    dag.add_edges([f"g{i}" for i in range(n - 1)], [f"g{i + 1}" for i in range(n - 1)], "decomposes")
+    return dag
+
+
+def test_add_record_scopes_goals_and_shares_lemmas():
+    recs = json.loads((ROOT / "data" / "example.json").read_text(encoding="utf-8"))["dag"]
+    dag = DagStore()
+    for rec in recs + [dict(recs[0], theorem_id="lean:Other")]:
+        dag.add_record(rec)
+    assert dag.num_nodes == 4  # two scoped goals + two shared lemmas
+    g0 = "lean:Mathlib.Algebra.Group.pow_mul#g0"
+    lemma = "lean:Mathlib.Algebra.Group.mul_comm"
+    assert dag.names[dag.predecessors(g0, ["justifies"])[0]] == lemma
+    assert sorted(dag.names[i] for i in dag.successors(lemma)) == [g0, "lean:Other#g0"]
+    assert dag.frontier("goal").size == 0
+    assert [dag.type_names[t] for t in dag.node_types([lemma, g0])] == ["lemma", "goal"]
+
+
+def test_reachability_matches_python_bfs_across_appends():
+    rng = np.random.default_rng(0)
+    dag = DagStore()
+    dag.add_nodes([str(i) for i in range(300)], "goal")
+    adj = {i: set() for i in range(300)}
+    for round_ in range(6):  # queries between appends exercise both CSR and the pending tail
+        src = rng.integers(0, 299, 400)
+        dst = np.minimum(src + rng.integers(1, 20, 400), 299)
+        dag.add_edges(src, dst, "a" if round_ % 2 else "b")
+        for s, d in zip(src.tolist(), dst.tolist()):
+            adj[s].add(d)
+        start = rng.integers(0, 300, 3)
+        seen, todo = set(), list(start.tolist())
+        while todo:
+            for d in adj[todo.pop()]:
+                if d not in seen:
+                    seen.add(d)
+                    todo.append(d)
+        assert dag.descendants(start).tolist() == sorted(seen)
+    dag.compact()
+    back = dag.ancestors([299], max_depth=1)
+    assert back.tolist() == sorted(s for s, ds in adj.items() if 299 in ds)
+
+
+def test_frontier_degrees_and_edge_exports():
+    dag = _chain(5)
+    dag.add_nodes(["x"], "lemma")
+    dag.add_edges(["x"], ["g0"], "justifies")
+    assert dag.frontier("goal", ["justifies"]).tolist() == [1, 2, 3, 4]
+    assert dag.frontier(None).tolist() == [5]
+    assert dag.in_degree().tolist() == [1, 1, 1, 1, 1, 0]
+
+    ei, et = dag.edge_index()
+    assert ei.shape == (2, 5) and ei.dtype == np.int64
+    assert [dag.etype_names[t] for t in et] == ["decomposes"] * 4 + ["justifies"]
+    nodes, sub, _ = dag.subgraph(["g1", "g2", "g4"])
+    assert nodes.tolist() == [1, 2, 4] and sub.tolist() == [[0], [1]]
+
+    b = dag.batch([["g0", "g1"], ["g3", "g4", "x"]])
+    assert b["batch"].tolist() == [0, 0, 1, 1, 1]
+    assert b["edge_index"].tolist() == [[0, 2], [1, 3]]
+    assert b["node_type"].tolist() == [0, 0, 0, 0, 1]
@@ -0,0 +1,74 @@
+# tests/test_encoder.py
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from qednet.encoders.bridge import CLS, PAD, SEP, LeanVocab, StateEncoder, state_tokens
+from qednet.io.lean_rpc import LeanState, parse_goal
+
+
+def test_tokens_and_vocab_ids():
+    assert state_tokens("h : ∀ (n : ℕ), Nat.succ n ≤ f⁻¹ x := rfl") == [
+        "h", ":", "∀", "(", "n", ":", "ℕ", ")", ",", "Nat.succ", "n", "≤", "f", "⁻¹", "x", ":=", "rfl",
+    ]
+    assert state_tokens("x✝¹ = a✝") == ["x", "✝¹", "=", "a", "✝"]
+    vocab = LeanVocab(buckets=64)
+    assert "⁻¹" in vocab and "✝" in vocab
+    a, b = vocab.ids(["Nat.succ_le_iff"]), vocab.ids(["Nat.succ_le"])
+    assert len(a) == len(b) == 2 and a[0] == b[0] == vocab.ids(["Nat"])[0]  # unseen name: its components
+    assert all(len(vocab) - 64 <= i < len(vocab) for i in (a[1], b[1]))
+    built = LeanVocab.build(["Nat.succ_le_iff a", "Nat.succ_le_iff b"], min_freq=2, buckets=8)
+    assert "Nat.succ_le_iff" in built and "a" not in built
+    assert built.ids(["Nat.succ_le_iff"]) == [len(built) - 8 - 1]
+
+
+def test_vocab_loads_lazily(tmp_path):
+    path = LeanVocab.build(["x + y", "x * y"], min_freq=1, buckets=16).save(tmp_path / "vocab.json")
+    vocab = LeanVocab(path)
+    assert not vocab.loaded and vocab.buckets == 1024
+    enc = StateEncoder(vocab)
+    enc.encode_batch(["⊢ x + y"])
+    assert vocab.loaded and vocab.buckets == 16 and "x" in vocab
+    # Importing the package does not pull in the encoder (or numpy).
+    code = "import sys, qednet; print('numpy' in sys.modules, 'qednet.encoders.bridge' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT / "src")
+    assert out.stdout.split() == ["False", "False"]
+
+
+def test_encode_batch_pads_and_batches_graphs():
+    s1 = parse_goal("a b : ℕ\nh : a ≤ b\n⊢ a + 0 ≤ b", "t1")
+    s2 = "⊢ True"
+    enc = StateEncoder(max_len=64)
+    out = enc.encode_batch([s1, s2, s1])
+    B, L = out["tokens"].shape
+    assert B == 3 and L == out["lengths"].max() == out["lengths"][0]
+    assert np.array_equal(out["mask"], np.arange(L) < out["lengths"][:, None])
+    assert (out["tokens"][~out["mask"]] == PAD).all() and (out["token_node"][~out["mask"]] == -1).all()
+    row = out["tokens"][1, : out["lengths"][1]].tolist()
+    assert row[0] == CLS and row[-1] == SEP and len(row) == 3
+    assert out["num_nodes"].tolist() == [3, 1, 3]
+    assert out["batch"].tolist() == [0, 0, 0, 1, 2, 2, 2]
+    # h mentions a and b (node 1 -> node 2), so does the goal (node 1 -> node 0).
+    edges = out["edge_index"].T.tolist()
+    assert edges == [[1, 2], [1, 0], [5, 6], [5, 4]]
+    assert set(out["token_node"][0, : out["lengths"][0]].tolist()) == {0, 1, 2}
+    assert enc.stats()["hits"] == 1 and enc.stats()["misses"] == 2
+    with pytest.raises(ValueError):
+        enc.encode(s1)[0][0] = 5
+
+    short = StateEncoder(max_len=6).encode_batch([s1])
+    assert short["tokens"].shape == (1, 6) and short["num_nodes"].tolist() == [3]
+    empty = enc.encode_batch([])
+    assert empty["tokens"].shape == (0, 0) and empty["edge_index"].shape == (2, 0)
+
+
+def test_cache_key_includes_edges():
+    parsed = parse_goal("a b : ℕ\nh : a ≤ b\n⊢ a ≤ b", "t")
+    bare = LeanState(name="t", pp_goal=parsed.pp_goal, pp_ctx=parsed.pp_ctx, hyp_graph_edges=[])
+    enc = StateEncoder()
+    assert enc.encode(bare)[2].shape == (2, 0)
+    assert enc.encode(parsed)[2].shape[1] == 2
+    assert enc.stats()["misses"] == 2
@@ -0,0 +1,67 @@
+# tests/test_export_io.py
+import gzip
+import json
+import sys
+
+from conftest import ROOT
+
+sys.path.insert(0, str(ROOT / "data" / "scripts"))
+import export_io  # noqa: E402
+
+
+def _records(n):
+    return [{"id": f"lean:T{i}", "stmt": "True"} for i in range(n)]
+
+
+def test_sharded_writer_rolls_shards_and_writes_manifest(tmp_path):
+    w = export_io.ShardedJsonlWriter(tmp_path / "out", shard_size=2)
+    for rec in _records(5):
+        w.add("statements", rec)
+    w.add("traces", {"theorem_id": "lean:T0", "steps": []})
+    manifest_path = w.finish({"repo": "r", "repo_commit": "c", "traced_root": "/t"})
+
+    manifest = json.loads(manifest_path.read_text())
+    assert manifest["counts"] == {"statements": 5, "traces": 1}
+    assert manifest["shards"]["statements"] == [
+        "statements-00000.jsonl.gz", "statements-00001.jsonl.gz", "statements-00002.jsonl.gz"
+    ]
+    assert manifest["repo_commit"] == "c" and manifest["compression"] == "gzip"
+    with gzip.open(tmp_path / "out" / "statements-00002.jsonl.gz", "rt") as f:
+        assert [json.loads(line) for line in f] == [{"id": "lean:T4", "stmt": "True"}]
+    assert list(export_io.read_shards(tmp_path / "out", "statements")) == _records(5)
+
+
+def test_payload_writer_matches_legacy_layout(tmp_path):
+    w = export_io.JsonPayloadWriter(tmp_path / "x.json")
+    for rec in _records(2):
+        w.add("statements", rec)
+    w.finish({"repo": "r", "repo_commit": "c", "traced_root": "/t"})
+    payload = json.loads((tmp_path / "x.json").read_text())
+    assert list(payload) == ["statements", "traces", "meta"]
+    assert payload["meta"] == {
+        "repo": "r", "repo_commit": "c", "traced_root": "/t", "counts": {"statements": 2, "traces": 0}
+    }
+
+
+def test_export_cache_reuses_unchanged_files_only(tmp_path):
+    src = tmp_path / "A.lean"
+    src.write_text("theorem a : True := trivial")
+    recs = [{"theorem_id": "lean:a", "steps": []}]
+
+    cache = export_io.ExportCache(tmp_path / "cache", salt="v1")
+    key = cache.digest(src)
+    assert cache.get_traces("A.lean", key, ["lean:a"]) is None
+    cache.put_traces("A.lean", key, recs)
+    cache.save()
+
+    cache = export_io.ExportCache(tmp_path / "cache", salt="v1")
+    assert cache.get_traces("A.lean", cache.digest(src), ["lean:a"]) == recs
+    assert cache.get_traces("A.lean", cache.digest(src), ["lean:a", "lean:b"]) is None
+    src.write_text("theorem a : True := by trivial")
+    assert cache.get_traces("A.lean", cache.digest(src), ["lean:a"]) is None
+
+    # A new salt (toolchain bump) drops everything, and save() removes orphaned blobs.
+    cache = export_io.ExportCache(tmp_path / "cache", salt="v2")
+    assert cache.get_traces("A.lean", key, ["lean:a"]) is None
+    cache.save()
+    assert list((tmp_path / "cache" / "blobs").iterdir()) == []
@@ -0,0 +1,44 @@
+# tests/test_export_traces.py
+import json
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import ROOT
+
+pytest.importorskip("lean_dojo")
+sys.path.insert(0, str(ROOT / "data" / "scripts"))
+import export_mathlib4_statements_traces as exporter  # noqa: E402
+
+
+class _Tactic:
+    def __init__(self, name, k):
+        self.state_before, self.state_after, self.tactic = f"⊢ {name} {k}", f"⊢ {name} {k + 1}", f"tac{k}"
+
+    def get_annotated_tactic(self):
+        return f"<a>{self.tactic}</a>", [{"full_name": "Nat.add_comm"}]
+
+
+class _Traced:
+    def __init__(self, file, name, n, broken=False):
+        self.theorem = SimpleNamespace(file_path=file, full_name=name)
+        self.n, self.broken = n, broken
+
+    def get_traced_tactics(self, atomic_only=False):
+        if self.broken:
+            raise RuntimeError("no AST for this theorem")
+        return [_Tactic(self.theorem.full_name, k) for k in range(self.n)]
+
+
+def test_parallel_traces_match_serial_output():
+    theorems = [
+        _Traced(f"Mathlib/F{i // 3}.lean", f"T{i}", n=i % 4, broken=(i == 7))
+        for i in range(20)
+    ]
+    wanted = [i for i in range(20) if i != 11]
+    serial = [json.dumps(r, ensure_ascii=False) for r in exporter.iter_traces(theorems, wanted, workers=1)]
+    parallel = [json.dumps(r, ensure_ascii=False) for r in exporter.iter_traces(theorems, wanted, workers=3)]
+    assert parallel == serial
+    assert [json.loads(r)["theorem_id"] for r in serial] == [f"lean:T{i}" for i in wanted]
+    assert "_tactics_error" in json.loads(serial[wanted.index(7)])["steps"][0]
@@ -0,0 +1,83 @@
+# tests/test_governor.py
+import subprocess
+import sys
+
+import pytest
+
+from qednet.io.governor import AdaptiveBudget, ResourceLimits, failure_reason, spawn
+from qednet.io.lean_rpc import LeanRPC, StepResult
+from qednet.io.lean_worker import LeanWorker
+
+
+def test_failure_reasons():
+    assert failure_reason("Lean timed out after 5s running step: x") == "timeout"
+    assert failure_reason("t.lean:3:2: error: (deterministic) timeout at `whnf`, maximum number of heartbeats "
+                          "(200000) has been reached") == "heartbeats"
+    assert failure_reason("Lean worker failed: Lean REPL exited unexpectedly. (exit code -9)") == "crash"
+    assert failure_reason("Lean worker failed: Lean REPL exited unexpectedly. (exit code -24)") == "timeout"
+    assert failure_reason("Lean worker failed: Lean REPL closed its stdin") == "crash"
+    assert failure_reason("t.lean:5:2: error: unsolved goals") == "error"
+    assert StepResult(valid=False, error="INTERNAL PANIC: out of memory").reason == "oom"
+    assert StepResult(valid=True).reason is None
+
+
+@pytest.mark.parametrize("prlimit_binary", [True, False])
+def test_rlimits_reach_the_child(prlimit_binary, monkeypatch):
+    if not prlimit_binary:
+        monkeypatch.setattr("qednet.io.governor.shutil.which", lambda _: None)  # prlimit(2) after spawn
+    limits = ResourceLimits(memory_mb=1024, cpu_sec=100)
+    code = ("import resource, time; time.sleep(0.2); "
+            "print(resource.getrlimit(resource.RLIMIT_AS)[0], resource.getrlimit(resource.RLIMIT_CPU)[0])")
+    proc = spawn([sys.executable, "-c", code], limits, stdout=subprocess.PIPE, text=True)
+    out, _ = proc.communicate()
+    assert out.split() == [str(1024 << 20), "100"]
+    assert ResourceLimits(max_requests=3).command(["lean"]) == ["lean"]
+
+
+def test_worker_recycles_after_requests_and_rss(fake_repl_cmd):
+    with LeanWorker("import Mathlib\n", repl_cmd=fake_repl_cmd, limits=ResourceLimits(max_requests=2)) as w:
+        for _ in range(5):
+            assert "env" in w.command("#check Nat.add_comm\n")
+        assert w.recycles == 2 and w.restarts == 2 and w.epoch == 3
+    with LeanWorker("import Mathlib\n", repl_cmd=fake_repl_cmd, limits=ResourceLimits(max_rss_mb=1)) as w:
+        for _ in range(2):
+            assert "env" in w.command("#check Nat.add_comm\n")
+        assert w.recycles == 2  # any live REPL is over 1 MB: recycled before every command
+
+
+def test_adaptive_budget_tightens_timeouts_and_scales_heartbeats():
+    b = AdaptiveBudget(min_timeout_sec=0.5, max_timeout_sec=60, slack=4, min_samples=4)
+    assert b.budget("⊢ p") == (60, 200_000)
+    for _ in range(10):
+        b.observe("⊢ fast", 0.1)
+    b.observe("⊢  slow", 1.0)
+    b.observe("⊢ never", 30.0, reason="timeout")  # censored: ignored
+    timeout, hb = b.budget("⊢ fast")
+    assert timeout == 0.5 and hb == 200_000
+    timeout, hb = b.budget("⊢ slow")
+    assert timeout == 4.0 and hb == 1_000_000
+    assert b.snapshot()["samples"] == 11
+
+
+def test_budget_drives_check_tactic_and_step(fake_repl_cmd):
+    budget = AdaptiveBudget(min_timeout_sec=0.5, min_samples=1)
+    with LeanRPC(persistent=True, repl_cmd=fake_repl_cmd, budget=budget) as rpc:
+        assert rpc.check_tactic("True", "trivial").valid
+        slow = rpc.check_tactic("True", "SLEEP")
+        assert not slow.valid and slow.reason == "timeout"
+        assert slow.elapsed_sec < 5
+        bad = rpc.check_tactic("True", "FAIL")
+        assert bad.reason == "error"
+        st = rpc.start_proof("P")
+        assert rpc.step(st, "intro h").valid
+    assert budget.snapshot()["samples"] == 3  # two completed checks + one step
+    assert "set_option maxHeartbeats 123\n" in LeanRPC(lean_cmd=["lean"])._check_body("True", "rfl", "t", 123)
+
+
+@pytest.mark.parametrize("fail_fast", [False, True])
+def test_file_mode_signal_exit_is_classified(fail_fast):
+    # A Lean that runs out of CPU budget: RLIMIT_CPU's soft limit sends SIGXCPU.
+    cmd = [sys.executable, "-c", "import os, signal; os.kill(os.getpid(), signal.SIGXCPU)"]
+    res = LeanRPC(lean_cmd=cmd, fail_fast=fail_fast).check_tactic("True", "trivial")
+    assert not res.valid and res.reason == "timeout"
+    assert res.error == "Lean killed by signal 24 (exit code -24)"
@@ -0,0 +1,29 @@
+# tests/test_lean_pool.py
+import time
+
+from qednet.io.lean_pool import LeanPool
+
+
+def test_check_tactics_keeps_input_order(fake_repl_cmd):
+    scripts = ["trivial", "FAIL", "simp", "FAIL", "rfl"]
+    with LeanPool(size=3, repl_cmd=fake_repl_cmd) as pool:
+        res = pool.check_tactics("True", scripts)
+    assert [r.valid for r in res] == [True, False, True, False, True]
+
+
+def test_check_tactics_many_cross_goal(fake_repl_cmd):
+    items = [("True", "trivial"), ("1 = 1", "FAIL"), ("2 = 2", "rfl")]
+    with LeanPool(size=2, repl_cmd=fake_repl_cmd) as pool:
+        res = pool.check_tactics_many(items)
+    assert [r.new_state.pp_goal if r.valid else None for r in res] == ["True", None, "2 = 2"]
+
+
+def test_pool_runs_workers_in_parallel(fake_repl_cmd, monkeypatch):
+    monkeypatch.setenv("FAKE_LEAN_ELAB_SEC", "0.2")
+    with LeanPool(size=4, repl_cmd=fake_repl_cmd) as pool:
+        pool.check_tactics("True", ["trivial"] * 4)  # warm every worker
+        t0 = time.perf_counter()
+        res = pool.check_tactics("True", ["trivial"] * 8)
+        elapsed = time.perf_counter() - t0
+    assert all(r.valid for r in res)
+    assert elapsed < 8 * 0.2 * 0.75  # serial would take 1.6s
@@ -55,3 +55,65 @@ def test_check_tactic_failure_reports_error():
     assert not res.valid, "Expected tactic to fail but it succeeded unexpectedly."
     # Ensure we get a helpful error message back
     assert isinstance(res.error, str) and len(res.error) > 0
+
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_fetch_goal_many_attributes_by_line(fake_lean_cmd, fake_repl_cmd, persistent):
+    rpc = LeanRPC(lean_cmd=fake_lean_cmd, repl_cmd=fake_repl_cmd, persistent=persistent)
+    names = ["Nat.add_comm", "Foo.missing_lemma", "Nat.mul_comm", "Bar.baz"]
+    batch = rpc.fetch_goal_many(names, chunk_size=3)
+    rpc.close()
+    assert batch.states["Nat.add_comm"].pp_goal == "∀ (n m : ℕ), n + m = m + n"
+    assert batch.states["Nat.mul_comm"].pp_goal == "∀ (n m : ℕ), n * m = m * n"
+    assert batch.states["Bar.baz"].pp_goal == "True"
+    assert set(batch.errors) == {"Foo.missing_lemma"}
+    assert "unknown identifier" in batch.errors["Foo.missing_lemma"]
+
+
+def test_fetch_goal_many_bisects_crashing_chunk(fake_lean_cmd):
+    rpc = LeanRPC(lean_cmd=fake_lean_cmd)
+    batch = rpc.fetch_goal_many(["Nat.add_comm", "CRASH", "Nat.mul_comm"])
+    assert set(batch.states) == {"Nat.add_comm", "Nat.mul_comm"}
+    assert set(batch.errors) == {"CRASH"}
+    with pytest.raises(ValueError):
+        rpc.fetch_goal_many(["Nat.add_comm"], chunk_size=0)
+
+
+def test_split_signature_skips_binder_colons():
+    assert LeanRPC._split_signature("Nat.add_comm (n m : ℕ) : n + m = m + n") == "n + m = m + n"
+    assert LeanRPC._split_signature("foo : ∀ (n : ℕ), n = n") == "∀ (n : ℕ), n = n"
+
+
+def test_fail_fast_stops_at_first_error(fake_lean_cmd):
+    rpc = LeanRPC(lean_cmd=fake_lean_cmd, fail_fast=True, timeout_sec=20)
+    assert rpc.check_tactic("True", "trivial").valid  # a full run seeds the saved-time estimate
+    res = rpc.check_tactic("True", "FAIL\nSLEEP")
+    assert not res.valid and res.error.endswith("error: unsolved goals")
+    assert res.elapsed_sec < 10
+    assert res.saved_sec is not None and res.saved_sec >= 0
+
+
+def test_fail_fast_bounds_captured_output(fake_lean_cmd):
+    rpc = LeanRPC(lean_cmd=fake_lean_cmd, fail_fast=True, max_output_bytes=64)
+    res = rpc.check_tactic("True", "\n".join(f"#check Foo{i}" for i in range(200)) + "\nFAIL")
+    assert not res.valid and "unsolved goals" in res.error
+    assert len(res.stdout.encode()) < 64 + 200
+
+
+@pytest.mark.parametrize("isolation", ["namespace", "section"])
+def test_check_tactic_batch_routes_errors_by_block(fake_lean_cmd, isolation):
+    rpc = LeanRPC(lean_cmd=fake_lean_cmd)
+    items = [("True", "trivial"), ("1 = 1", "rfl\nFAIL"), ("2 = 2", "sorry"), ("3 = 3", "rfl")]
+    res = rpc.check_tactic_batch(items, isolation=isolation, chunk_size=3)
+    assert [r.valid for r in res] == [True, False, False, True]
+    assert "unsolved goals" in res[1].error
+    assert "sorry" in res[2].error
+    assert res[3].new_state.pp_goal == "3 = 3"
+
+
+def test_check_tactic_batch_bisects_crash(fake_lean_cmd):
+    rpc = LeanRPC(lean_cmd=fake_lean_cmd)
+    res = rpc.check_tactic_batch([("True", "trivial"), ("True", "CRASH"), ("True", "FAIL"), ("True", "simp")])
+    assert [r.valid for r in res] == [True, False, False, True]
+    with pytest.raises(ValueError):
+        rpc.check_tactic_batch([("True", "trivial")], chunk_size=0)
@@ -0,0 +1,83 @@
+# tests/test_lean_worker.py
+import pytest
+
+from qednet.io.lean_rpc import LeanRPC, LeanState, parse_goal
+from qednet.io.lean_worker import LeanWorker, LeanWorkerTimeout
+
+
+def test_worker_loads_header_once_and_reuses_env(fake_repl_cmd):
+    with LeanWorker("import Mathlib\n", repl_cmd=fake_repl_cmd) as w:
+        first = w.command("#check Nat.add_comm\n")
+        second = w.command("#check Nat.mul_comm\n")
+        assert first["messages"][0]["data"].startswith("Nat.add_comm : ")
+        assert second["env"] > first["env"]
+        assert w.restarts == 0
+
+
+def test_worker_restarts_after_timeout(fake_repl_cmd):
+    w = LeanWorker("import Mathlib\n", repl_cmd=fake_repl_cmd, timeout_sec=0.5)
+    try:
+        with pytest.raises(LeanWorkerTimeout):
+            w.command("theorem t : True := by\n  SLEEP\n")
+        assert not w.alive
+        assert "messages" not in w.command("theorem t : True := by\n  trivial\n")
+        assert w.restarts == 1
+    finally:
+        w.close()
+
+
+def test_persistent_rpc_matches_file_mode(fake_lean_cmd, fake_repl_cmd):
+    with LeanRPC(lean_cmd=fake_lean_cmd) as once, LeanRPC(persistent=True, repl_cmd=fake_repl_cmd) as warm:
+        for rpc in (once, warm):
+            st = rpc.fetch_goal("Nat.add_comm")
+            assert st.pp_goal == "∀ (n m : ℕ), n + m = m + n"
+            assert rpc.check_tactic(st.pp_goal, "intro m n\nsimp").valid
+            bad = rpc.check_tactic(st.pp_goal, "intro m n\nFAIL")
+            assert not bad.valid and "error: unsolved goals" in bad.error
+
+
+def test_persistent_rpc_survives_crash(fake_repl_cmd):
+    with LeanRPC(persistent=True, repl_cmd=fake_repl_cmd) as rpc:
+        res = rpc.check_tactic("True", "CRASH")
+        assert not res.valid and "Lean worker failed" in res.error
+        assert rpc.check_tactic("True", "trivial").valid
+
+
+def test_step_decomposes_goals_and_extends_branch(fake_repl_cmd):
+    with LeanRPC(persistent=True, repl_cmd=fake_repl_cmd) as rpc:
+        root = rpc.start_proof("P ∧ P")
+        assert root.pp_goal == "P ∧ P" and root.proof_state
+
+        split = rpc.step(root, "constructor")
+        assert split.valid and len(split.goals) == 2
+
+        intro = rpc.step(split.new_state, "intro m n")
+        assert intro.new_state.pp_ctx == ["m n : ℕ"]
+        assert intro.new_state.proof_state != split.new_state.proof_state
+
+        bad = rpc.step(intro.new_state, "FAIL")
+        assert not bad.valid and "unsolved goals" in bad.error
+
+        # The old snapshot is still usable: branches share their prefix.
+        done = rpc.step(split.new_state, "simp")
+        assert done.valid and len(done.goals) == 1
+        assert rpc.step(done.new_state, "simp").goals == []
+
+
+def test_step_rejects_stale_handle_after_restart(fake_repl_cmd):
+    with LeanRPC(persistent=True, repl_cmd=fake_repl_cmd) as rpc:
+        root = rpc.start_proof("True")
+        rpc.check_tactic("True", "CRASH")
+        res = rpc.step(root, "trivial")
+        assert not res.valid and "Stale" in res.error
+        with pytest.raises(ValueError, match="Malformed proof_state"):
+            rpc.step(LeanState(name="t", pp_goal="True", pp_ctx=[], hyp_graph_edges=[], proof_state="3"), "trivial")
+    with pytest.raises(RuntimeError, match="persistent=True"):
+        LeanRPC(lean_cmd=["lean"]).step(root, "trivial")
+
+
+def test_parse_goal_context_and_edges():
+    st = parse_goal("case succ\nn : ℕ\nih : P n\n  ∧ Q n\n⊢ P (n + 1)", "t")
+    assert st.pp_ctx == ["n : ℕ", "ih : P n ∧ Q n"]
+    assert st.pp_goal == "P (n + 1)"
+    assert ("n", "ih") in st.hyp_graph_edges and ("n", "⊢") in st.hyp_graph_edges
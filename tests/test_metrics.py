@@ -0,0 +1,52 @@
+# tests/test_metrics.py
+import json
+
+from qednet.io.lean_rpc import LeanRPC
+from qednet.io.metrics import LeanMetrics
+from qednet.io.verify_cache import VerificationCache
+
+
+def test_file_mode_phases_and_counters(fake_lean_cmd, tmp_path):
+    metrics = LeanMetrics()
+    seen = []
+    metrics.add_hook(lambda kind, name, value, op: seen.append((kind, name)))
+    rpc = LeanRPC(lean_cmd=fake_lean_cmd, metrics=metrics, cache=VerificationCache(), timeout_sec=1)
+    rpc.check_tactic("True", "trivial")
+    rpc.check_tactic("True", "trivial")
+    rpc.check_tactic("True", "SLEEP")
+
+    snap = metrics.snapshot()
+    assert snap["events"]["calls_check_tactic"] == 3
+    assert snap["events"]["cache_hits"] == 1 and snap["events"]["cache_misses"] == 2
+    assert snap["events"]["timeouts"] == 1
+    for phase in ("write", "spawn", "run", "parse", "cleanup", "total/check_tactic"):
+        assert snap["phases"][phase]["count"] >= 1, phase
+    assert ("event", "timeouts") in seen and ("phase", "spawn") in seen
+
+    text = metrics.to_prometheus()
+    assert 'qednet_lean_events_total{event="timeouts"} 1' in text
+    assert 'qednet_lean_phase_seconds_count{phase="total",op="check_tactic"} 3' in text
+
+    out = tmp_path / "m.jsonl"
+    metrics.write_jsonl(out)
+    assert json.loads(out.read_text())["events"]["timeouts"] == 1
+
+
+def test_worker_mode_header_and_crash(fake_repl_cmd):
+    metrics = LeanMetrics()
+    with LeanRPC(persistent=True, repl_cmd=fake_repl_cmd, metrics=metrics) as rpc:
+        rpc.check_tactic("True", "CRASH")
+        rpc.check_tactic("True", "trivial")
+    snap = metrics.snapshot()
+    assert snap["events"]["crashes"] == 1 and snap["events"]["worker_starts"] == 2
+    assert snap["phases"]["header"]["count"] == 2
+    assert snap["phases"]["elaborate"]["count"] == 2
+
+
+def test_histogram_quantiles():
+    metrics = LeanMetrics(buckets=[0.1, 1.0])
+    for v in (0.05, 0.05, 0.5, 5.0):
+        metrics.observe("run", v)
+    snap = metrics.snapshot()["phases"]["run"]
+    assert snap["p50"] == 0.1 and snap["p99"] is None
+    assert snap["buckets"] == {"0.1": 2, "1.0": 1, "+Inf": 1}
@@ -0,0 +1,130 @@
+# tests/test_replay.py
+import json
+
+import numpy as np
+import pytest
+
+from qednet.data.state_store import StateStore, state_id
+from qednet.train.replay import ReplayBuffer, SumTree
+
+
+def _ids(n, start=0):
+    return [state_id(f"⊢ goal {i}") for i in range(start, start + n)]
+
+
+def test_sum_tree_find_matches_prefix_sums():
+    rng = np.random.default_rng(0)
+    tree = SumTree(37)
+    vals = rng.random(37)
+    vals[[3, 10]] = 0.0
+    tree.rebuild(vals)
+    assert tree.total == pytest.approx(vals.sum())
+    tree.update(np.array([5, 5, 20]), np.array([2.0, 2.0, 0.5]))
+    vals[5], vals[20] = 2.0, 0.5
+    u = rng.random(1000) * vals.sum()
+    expect = np.searchsorted(np.cumsum(vals), u, side="right")
+    assert np.array_equal(tree.find(u), expect)
+
+
+def test_sampling_is_proportional_and_updates_apply():
+    buf = ReplayBuffer(8, alpha=1.0, eps=0.0, seed=1)
+    buf.add({"state": _ids(4)}, priority=[1.0, 0.0, 3.0, 0.0])
+    batch = buf.sample(4000)
+    counts = np.bincount(batch.index, minlength=4)
+    assert counts[1] == counts[3] == 0
+    assert abs(counts[2] / counts[0] - 3.0) < 0.3
+    assert np.allclose(batch.weight[batch.index == 2], batch.weight.min())
+
+    buf.update_priorities(np.array([0]), [0.0])
+    assert set(buf.sample(100).index.tolist()) == {2}
+
+
+def test_fifo_eviction_and_stale_priority_updates():
+    buf = ReplayBuffer(3, seed=0)
+    buf.add({"state": _ids(2), "action": ["a", "b"]})
+    batch = buf.sample(2)
+    buf.add({"state": _ids(2, start=2), "action": ["c", "d"]})  # overwrites slot 0
+    assert len(buf) == 3 and buf.cursor == 1
+    live = buf.sample(64)
+    assert set(live.strings("action")) == {"b", "c", "d"}
+    stale = batch.index == 0
+    assert buf.update_priorities(batch.index, 5.0, seq=batch.seq) == int((~stale).sum())
+    big = buf.add({"state": _ids(5, start=10)})  # more than capacity: newest three survive
+    assert len(big) == 3
+    assert set(buf.sample(64).states()) == set(_ids(3, start=12))
+
+
+def test_add_trajectories_interns_text_states():
+    recs = [
+        {"trajectory_id": "t:1", "theorem_id": "lean:X", "outcome": "success",
+         "steps": [{"i": 0, "state": "⊢ p", "action": "intro h", "logp": -0.4, "value": 0.3, "reward": 0.0},
+                   {"i": 1, "state": state_id("⊢ q"), "action": "simp", "logp": -0.2, "reward": 1.0}]},
+    ]
+    buf = ReplayBuffer(16)
+    with pytest.raises(ValueError):
+        buf.add_trajectories(recs)
+    with StateStore() as store:
+        store.put("⊢ q")
+        buf.add_trajectories(recs, store=store)
+        b = buf.sample(32)
+        assert set(store.get_many(b.states())) <= {"⊢ p", "⊢ q"}
+    assert set(b.strings("outcome")) == {"success"}
+    by_action = dict(zip(b.strings("action"), b.data["reward"].tolist()))
+    assert by_action == {"intro h": 0.0, "simp": 1.0}
+
+
+def test_snapshot_and_resume(tmp_path):
+    buf = ReplayBuffer(6, path=tmp_path / "live", seed=0)
+    buf.add({"state": _ids(4), "action": list("abcd")}, priority=[1, 2, 3, 4])
+    buf.snapshot()
+    buf.add({"state": _ids(1, start=9)})  # after the snapshot: not part of it
+
+    back = ReplayBuffer.load(tmp_path / "live")
+    assert len(back) == 4 and back.inserted == 4
+    assert back.tree.total == pytest.approx(sum(p ** 0.6 for p in [1, 2, 3, 4]), rel=1e-6)
+    back.add({"state": _ids(3, start=4), "action": ["e", "f", "g"]})
+    assert len(back) == 6 and back.cursor == 1
+    back.snapshot()
+    assert set(ReplayBuffer.load(tmp_path / "live").sample(200).strings("action")) == set("bcdefg")
+
+    mem = ReplayBuffer(4)
+    mem.add({"state": _ids(2)})
+    mem.snapshot(tmp_path / "copy")
+    assert set(ReplayBuffer.load(tmp_path / "copy").sample(50).states()) == set(_ids(2))
+
+
+def test_snapshot_is_not_touched_by_later_adds(tmp_path):
+    buf = ReplayBuffer(3, path=tmp_path / "buf", seed=0)
+    buf.add({"state": _ids(3), "action": ["a", "b", "c"]})
+    buf.snapshot()
+    buf.add({"state": _ids(1, start=3), "action": ["NEW"]})  # full buffer: overwrites slot 0 in place
+
+    back = ReplayBuffer.load(tmp_path / "buf")
+    assert back.vocab["action"] == ["a", "b", "c"]
+    assert back.cols["action"].tolist() == [0, 1, 2]
+    assert set(back.sample(64).strings("action")) == {"a", "b", "c"}
+    assert len(list((tmp_path / "buf").glob("snap-*"))) == 1
+
+
+def test_vocabularies_stay_bounded(tmp_path):
+    buf = ReplayBuffer(4, seed=0)
+    for n in range(50):
+        buf.add({"state": _ids(1, start=n), "action": [f"tac {n}"], "theorem_id": ["X"]})
+    assert len(buf.vocab["action"]) <= 8 and buf.vocab["theorem_id"] == ["X"]
+    before = buf.sample(16)
+    buf.snapshot(tmp_path)
+    assert buf.vocab["action"] == [f"tac {n}" for n in range(46, 50)]
+    assert set(before.strings("action")) <= {f"tac {n}" for n in range(46, 50)}  # still decodes
+    assert set(buf.sample(64).strings("action")) == set(buf.vocab["action"])
+    assert json.loads((tmp_path / "meta.json").read_text())["vocab"]["action"] == buf.vocab["action"]
+
+
+def test_sample_empty():
+    buf = ReplayBuffer(4)
+    with pytest.raises(ValueError, match="empty"):
+        buf.sample(8)
+    buf.add({"state": _ids(2)})
+    batch = buf.sample(0)
+    assert len(batch) == 0 and batch.weight.shape == (0,) and batch.states() == []
+    with pytest.raises(ValueError):
+        buf.sample(-1)
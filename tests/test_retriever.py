@@ -0,0 +1,51 @@
+# tests/test_retriever.py
+import random
+from collections import Counter
+
+import numpy as np
+
+from qednet.model.retriever import PremiseRetriever, lean_tokens
+
+STATEMENTS = [
+    {"id": "lean:Mathlib.Algebra.Group.pow_succ", "name": "pow_succ", "stmt": "∀ (a : M) (n : ℕ), a ^ (n + 1) = a ^ n * a"},
+    {"id": "lean:Mathlib.Algebra.Group.mul_comm", "name": "mul_comm", "stmt": "∀ (a b : G), a * b = b * a"},
+    {"id": "lean:Mathlib.Algebra.Group.pow_mul_comm", "name": "pow_mul_comm", "stmt": "a ^ n * a = a * a ^ n"},
+    {"id": "lean:Mathlib.Topology.Basic.isOpen_univ", "name": "isOpen_univ", "stmt": "IsOpen Set.univ"},
+    {"id": "lean:Mathlib.Order.Basic.le_refl", "name": "le_refl", "stmt": "∀ (a : α), a ≤ a"},
+]
+
+
+def test_lean_tokens_split_names_and_keep_operators():
+    toks = lean_tokens("Nat.succ_le_iff : succ m ≤ n ↔ m < n := h₁ mul_comm'")
+    assert toks[:6] == ["nat.succ_le_iff", "nat", "succ_le_iff", "succ", "le", "iff"]
+    assert "≤" in toks and "↔" in toks and "<" in toks and "h₁" in toks and "mul_comm'" in toks
+    assert ":" not in toks
+
+
+def test_search_ranks_lexical_matches(tmp_path):
+    r = PremiseRetriever.build(STATEMENTS, tmp_path / "idx")
+    top = [sid for sid, _ in r.search("⊢ a ^ (n + 1) = a ^ n * a", k=2)]
+    assert top[0] == "lean:Mathlib.Algebra.Group.pow_succ"
+    assert r.search("IsOpen Set.univ", k=1)[0][0] == "lean:Mathlib.Topology.Basic.isOpen_univ"
+    assert r.search("completely unknown tokens", k=3) == []
+    negs = r.hard_negatives("a ^ n * a", ["lean:Mathlib.Algebra.Group.pow_succ"], k=2)
+    assert "lean:Mathlib.Algebra.Group.pow_succ" not in negs and len(negs) == 2
+    assert r.search_many(["IsOpen", "le_refl"], k=1, workers=2) == [r.search("IsOpen", 1), r.search("le_refl", 1)]
+
+
+def test_maxscore_topk_matches_exhaustive_scoring(tmp_path):
+    rng = random.Random(0)
+    words = [f"w{i}" for i in range(300)]
+    weights = [1 / (i + 1) for i in range(len(words))]
+    stmts = [{"id": f"lean:T{i}", "stmt": " ".join(rng.choices(words, weights, k=rng.randint(2, 25)))} for i in range(3000)]
+    r = PremiseRetriever.build(stmts, tmp_path / "idx")
+    for _ in range(50):
+        q = " ".join(rng.choices(words, weights, k=rng.randint(1, 8)))
+        tf = Counter(r.vocab[t] for t in lean_tokens(q) if t in r.vocab)
+        full = np.zeros(r.num_docs)
+        for t, m in tf.items():
+            docs, w = r._postings(t)
+            full[docs] += m * w
+        order = np.lexsort((np.arange(r.num_docs), -full))[:10]
+        expect = [f"lean:T{i}" for i in order if full[i] > 0]
+        assert [sid for sid, _ in r.search(q, k=10)] == expect
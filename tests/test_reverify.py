@@ -0,0 +1,88 @@
+# tests/test_reverify.py
+import json
+import shlex
+import sys
+
+from conftest import ROOT
+from qednet.cli.main import main
+from qednet.io.lean_pool import LeanPool
+from qednet.io.reverify import iter_proofs, proof_script, reverify
+
+sys.path.insert(0, str(ROOT / "data" / "scripts"))
+import export_io  # noqa: E402
+
+
+def _step(action, before, after):
+    return {"state_before": before, "state_after": after, "action": action}
+
+
+def test_proof_script_keeps_top_level_tactics():
+    steps = [
+        _step("constructor <;> simp", "⊢ p ∧ q", "no goals"),
+        _step("constructor", "⊢ p ∧ q", "case left\n⊢ p\n\ncase right\n⊢ q"),
+        _step("simp", "case left\n⊢ p", "no goals"),
+    ]
+    assert proof_script(steps) == "constructor <;> simp"
+    steps = [
+        _step("simp at h", "h : a\n⊢ b", "h : c\n⊢ b"),
+        _step("simp", "h : c\n⊢ b", "no goals"),  # repeats text of the previous tactic, but follows it
+    ]
+    assert proof_script(steps) == "simp at h\nsimp"
+    steps = [
+        _step("constructor", "⊢ p ∧ q", "case left\n⊢ p\n\ncase right\n⊢ q"),
+        _step("· trivial", "case left\n⊢ p\n\ncase right\n⊢ q", "case right\n⊢ q"),
+        _step("trivial", "case left\n⊢ p", "no goals"),
+        _step("· trivial", "case right\n⊢ q", "no goals"),
+        _step("trivial", "case right\n⊢ q", "no goals"),
+    ]
+    assert proof_script(steps) == "constructor\n· trivial\n· trivial"
+    assert proof_script([{"_tactics_error": "boom"}]) is None
+    assert [j.script for j in iter_proofs(ROOT / "data" / "example.json")] == [
+        "induction n\nsimp\nrw [pow_succ, ih]"
+    ]
+
+
+def _export(path):
+    w = export_io.ShardedJsonlWriter(path, shard_size=2, compress=False)
+    stmts = {"A": "True", "B": "True", "C": "True", "E": "True"}
+    for name, stmt in stmts.items():
+        w.add("statements", {"id": f"lean:{name}", "stmt": stmt})
+    w.add("traces", {"theorem_id": "lean:A", "steps": [_step("trivial", "⊢ True", "no goals")]})
+    w.add("traces", {"theorem_id": "lean:B", "steps": [_step("FAIL", "⊢ True", "no goals")]})
+    w.add("traces", {"theorem_id": "lean:C", "steps": [_step("SLEEP", "⊢ True", "no goals")]})
+    w.add("traces", {"theorem_id": "lean:D", "steps": [_step("rfl", "⊢ 1 = 1", "no goals")]})  # no statement
+    w.add("traces", {"theorem_id": "lean:E", "steps": [{"_tactics_error": "KeyError: 'x'"}]})
+    w.finish({"repo": "r", "repo_commit": "c", "traced_root": "/t"})
+    return path
+
+
+def _results(path):
+    return {r["theorem_id"]: r for r in map(json.loads, path.read_text().splitlines())}
+
+
+def test_reverify_writes_statuses_and_resumes(fake_repl_cmd, tmp_path, capsys):
+    export, out = _export(tmp_path / "export"), tmp_path / "res" / "results.jsonl"
+    argv = ["reverify", str(export), "--out", str(out), "--workers", "2", "--timeout", "1", "--group-size", "2",
+            "--repl-cmd", shlex.join(fake_repl_cmd)]
+    assert main(argv) == 0
+    res = _results(out)
+    statuses = {k: r["status"] for k, r in res.items()}
+    assert statuses == {
+        "lean:A": "pass", "lean:B": "fail", "lean:C": "timeout", "lean:D": "skipped", "lean:E": "skipped",
+    }
+    assert res["lean:C"]["reason"] == "timeout" and res["lean:E"]["error"] == "KeyError: 'x'"
+    assert res["lean:A"]["elapsed_sec"] >= 0 and res["lean:A"]["steps"] == 1
+    assert "pass=1 fail=1 timeout=1 skipped=2" in capsys.readouterr().err
+
+    # A crash mid-write: keep two records plus a torn line; the rerun only checks the rest.
+    lines = out.read_text().splitlines(keepends=True)
+    out.write_text("".join(lines[:2]) + lines[2][:10])
+    with LeanPool(size=2, repl_cmd=fake_repl_cmd, timeout_sec=1) as pool:
+        counts = reverify(pool, export, out)
+        assert counts["resumed"] == 2 and counts["checked"] == 3
+        assert reverify(pool, export, out)["checked"] == 0
+    assert {k: r["status"] for k, r in _results(out).items()} == statuses
+    assert len(out.read_text().splitlines()) == 5
+
+    shards = [{j.theorem_id for j in iter_proofs(export, shard=(k, 3))} for k in range(3)]
+    assert set().union(*shards) == set(res) and sum(map(len, shards)) == 5
@@ -0,0 +1,45 @@
+# tests/test_search_loop.py
+from qednet.io.lean_pool import LeanPool
+from qednet.io.lean_rpc import LeanRPC
+from qednet.search.mcts import BestFirstSearch, uniform_proposals
+
+
+def test_pool_search_finds_proof_and_returns_trace(fake_repl_cmd):
+    tactics = uniform_proposals(["skip", "intro h", "constructor", "trivial"])
+    with LeanPool(size=2, repl_cmd=fake_repl_cmd) as pool:
+        res = BestFirstSearch(pool, propose=tactics, concurrency=3).prove("P ∧ Q", "conj", theorem_id="lean:X.conj")
+    assert res.proved and res.reason == "proved"
+    trace = res.trace
+    assert trace["theorem_id"] == "lean:X.conj"
+    assert [s["i"] for s in trace["steps"]] == list(range(len(trace["steps"])))
+    assert set(trace["steps"][0]) == {"i", "goal", "ctx", "action", "ok"}
+    assert trace["steps"][0]["goal"] == "⊢ P ∧ Q"
+    # The trace replays on a fresh worker.
+    with LeanRPC(persistent=True, repl_cmd=fake_repl_cmd) as rpc:
+        st = rpc.start_proof("P ∧ Q")
+        for s in trace["steps"]:
+            r = rpc.step(st, s["action"])
+            assert r.valid
+            st = r.new_state
+        assert r.goals == []
+
+
+def test_transpositions_are_verified_once(fake_repl_cmd):
+    # "skip" is a no-op: it always reaches its own parent state, which is never expanded again.
+    with LeanRPC(persistent=True, repl_cmd=fake_repl_cmd) as rpc:
+        search = BestFirstSearch(rpc, propose=uniform_proposals(["intro a", "skip"]), max_depth=3)
+        res = search.prove("P")
+    assert not res.proved and res.reason == "exhausted"
+    assert res.nodes == 4  # root + three intros
+    assert res.verifications == 2 * 3  # two tactics on every state above max_depth
+    assert res.transpositions == 3
+
+
+def test_budgets_and_start_failure(fake_repl_cmd):
+    with LeanRPC(persistent=True, repl_cmd=fake_repl_cmd) as rpc:
+        res = BestFirstSearch(rpc, propose=uniform_proposals(["intro a"]), max_nodes=3).prove("P")
+        assert res.reason == "node_budget" and res.nodes == 3
+        res = BestFirstSearch(rpc, propose=uniform_proposals(["intro a"]), time_limit_sec=0).prove("P")
+        assert res.reason == "time_budget" and res.verifications == 0
+        res = BestFirstSearch(rpc).prove("FAIL")
+        assert res.reason == "start_failed" and res.error
@@ -0,0 +1,63 @@
+# tests/test_shards.py
+import json
+import pickle
+
+import pytest
+
+from conftest import ROOT
+from qednet.data.shards import ShardDataset, ShardWriter, convert_export
+
+EXAMPLE = ROOT / "data" / "example.json"
+
+
+def test_example_round_trips_through_shards(tmp_path):
+    ds = convert_export(EXAMPLE, tmp_path / "ds", rows_per_shard=1)
+    payload = json.loads(EXAMPLE.read_text(encoding="utf-8"))
+    for kind in ("statements", "traces", "dag", "replay", "retrieval", "verifier"):
+        assert list(ds[kind]) == payload[kind]
+    hits = ds.by_theorem("lean:Mathlib.Algebra.Group.pow_mul")
+    assert hits["traces"][0]["steps"][2]["action"] == "rw [pow_succ, ih]"
+    assert set(hits) == {"statements", "traces", "dag", "replay", "retrieval", "verifier"}
+    # Pickles as a path, for DataLoader workers.
+    assert pickle.loads(pickle.dumps(ds))["retrieval"][0]["positives"] == payload["retrieval"][0]["positives"]
+
+
+def test_columns_are_memory_mapped_and_sliceable(tmp_path):
+    with ShardWriter(tmp_path / "ds", rows_per_shard=4) as w:
+        for i in range(10):
+            rec = {"theorem_id": f"lean:T{i % 5}", "score": i / 2, "steps": [{"i": j, "goal": "⊢ " * j} for j in range(i % 3)]}
+            if i == 3:
+                rec["note"] = None
+            w.add("traces", rec)
+    rs = ShardDataset(tmp_path / "ds")["traces"]
+    assert len(rs) == 10 and rs.num_shards == 3
+    assert rs.find("lean:T2") == [2, 7] and rs.find("lean:nope") == []
+    assert rs[3] == {"theorem_id": "lean:T3", "score": 1.5, "steps": [], "note": None}
+    assert "note" not in rs[4]
+
+    shard = rs.shard(1)
+    ids = shard.column("theorem_id")
+    view = ids[1:3]
+    assert view.blob is ids.blob and view.to_list() == ["lean:T0", "lean:T1"]
+    steps, off = shard.child("steps")
+    assert list(off) == [0, 1, 3, 3, 4]
+    assert steps.column("goal")[2] == "⊢ " and steps.column("i").tolist() == [0, 0, 1, 0]
+    assert shard.column("score")[1:3].tolist() == [2.5, 3.0]
+
+
+def test_column_files_do_not_collide(tmp_path):
+    rec = {"id": "lean:X", "α": 1, ";1": 2, "a.b": 3, "a%2eb": 4}
+    with ShardWriter(tmp_path / "ds") as w:
+        w.add("statements", rec)
+    assert ShardDataset(tmp_path / "ds")["statements"][0] == rec
+
+
+def test_index_key_is_checked_on_every_row(tmp_path):
+    with pytest.raises(ValueError, match="record 2"):
+        with ShardWriter(tmp_path / "bad", rows_per_shard=2) as w:
+            for rec in [{"id": "a"}, {"id": "b"}, {"theorem_id": "c"}]:
+                w.add("statements", rec)
+    with ShardWriter(tmp_path / "ds", keys={"dag": "src"}) as w:
+        w.add_many("dag", [{"src": "lean:A", "theorem_id": "lean:B"}, {"src": "lean:B"}])
+    rs = ShardDataset(tmp_path / "ds")["dag"]
+    assert rs.key_field == "src" and rs.find("lean:B") == [1]
@@ -0,0 +1,41 @@
+# tests/test_state_store.py
+import pytest
+
+from qednet.data.state_store import StateStore, is_state_id, state_id
+
+
+def _steps():
+    a, b, c = "a b : G\n⊢ a * b = b * a", "a b : G\n⊢ b * a = b * a", "no goals"
+    return [
+        {"i": 0, "state_before": a, "state_after": b, "ctx": ["a b : G"], "action": "rw [mul_comm]"},
+        {"i": 1, "state_before": b, "state_after": c, "ctx": ["a b : G"], "action": "rfl"},
+        {"_tactics_error": "ValueError: boom"},
+    ]
+
+
+def test_intern_and_resolve_round_trip(tmp_path):
+    store = StateStore(tmp_path / "states.sqlite")
+    steps = _steps()
+    store.intern_steps(steps)
+    assert is_state_id(steps[0]["state_before"]) and steps[0]["state_after"] == steps[1]["state_before"]
+    assert steps[0]["action"] == "rw [mul_comm]" and is_state_id(steps[1]["ctx"][0])
+    stats = store.stats()
+    assert stats["states"] == 4 and stats["puts"] == 6 and stats["dedup_hits"] == 2
+    store.close()
+
+    # A fresh process sees the same ids and texts.
+    reopened = StateStore(tmp_path / "states.sqlite")
+    reopened.resolve_steps(steps)
+    assert steps == _steps()
+    assert state_id("no goals") in reopened
+    with pytest.raises(KeyError):
+        reopened.get(state_id("never stored"))
+
+
+def test_get_many_batches_and_keeps_order():
+    store = StateStore(max_memory_items=10)
+    texts = [f"⊢ x = {i}" for i in range(1200)]
+    ids = store.put_many(texts)
+    assert store.get_many(ids[::-1]) == texts[::-1]
+    assert store.put_many(texts[:5]) == ids[:5]
+    assert store.stats()["states"] == 1200
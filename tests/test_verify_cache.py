@@ -0,0 +1,74 @@
+# tests/test_verify_cache.py
+import multiprocessing as mp
+import sys
+
+from qednet.io.lean_rpc import LeanRPC, StepResult
+from qednet.io.verify_cache import VerificationCache
+
+
+def test_rpc_hits_cache_for_equivalent_requests(fake_lean_cmd, tmp_path):
+    cache = VerificationCache(tmp_path / "verify.sqlite")
+    rpc = LeanRPC(lean_cmd=fake_lean_cmd, cache=cache)
+    first = rpc.check_tactic("True", "  trivial\n")
+    # Same goal modulo whitespace, same script modulo indentation.
+    again = rpc.check_tactic("True ", "trivial")
+    assert first.valid and again.valid
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    st = rpc.fetch_goal("Nat.add_comm")
+    assert rpc.fetch_goal("Nat.add_comm") == st
+    cache.close()
+
+    reopened = VerificationCache(tmp_path / "verify.sqlite")
+    assert LeanRPC(lean_cmd=fake_lean_cmd, cache=reopened).check_tactic("True", "trivial") == first
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_key_depends_on_header():
+    cache = VerificationCache()
+    assert cache.key("tactic", ["Mathlib"], "", "g", "s") != cache.key("tactic", ["Mathlib"], "open Nat", "g", "s")
+
+
+def test_timeouts_are_not_cached():
+    cache = VerificationCache()
+    cache.put_step("k", StepResult(valid=False, error="Lean timed out after 60s running x"))
+    assert cache.get_step("k") is None
+
+
+def test_killed_runs_are_not_cached():
+    cache = VerificationCache()
+    cache.put_step("empty", StepResult(valid=False, error=""))
+    cache.put_step("killed", StepResult(valid=False, error="Lean killed by signal 9 (exit code -9)"))
+    assert cache.get_step("empty") is None and cache.get_step("killed") is None
+    cmd = [sys.executable, "-c", "import os, signal; os.kill(os.getpid(), signal.SIGKILL)"]
+    rpc = LeanRPC(lean_cmd=cmd, cache=cache)
+    for _ in range(2):
+        assert not rpc.check_tactic("True", "trivial").valid
+    assert cache.stats()["hits"] == 0 and cache.stats()["memory_items"] == 0
+
+
+def test_disk_eviction_is_size_bounded(tmp_path):
+    cache = VerificationCache(tmp_path / "c.sqlite", max_memory_items=1, max_disk_bytes=4000)
+    for i in range(100):
+        cache.put_step(f"k{i}", StepResult(valid=True, stdout="x" * 100))
+    stats = cache.stats()
+    assert stats["evictions"] > 0 and stats["disk_bytes"] <= 4000
+    assert cache.get_step("k99") is not None
+
+
+def _writer(path, start):
+    cache = VerificationCache(path)
+    for i in range(start, start + 50):
+        cache.put_step(f"k{i}", StepResult(valid=True))
+    cache.close()
+
+
+def test_processes_share_disk_store(tmp_path):
+    path = tmp_path / "shared.sqlite"
+    procs = [mp.get_context("spawn").Process(target=_writer, args=(path, 50 * i)) for i in range(3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    cache = VerificationCache(path)
+    assert all(cache.get_step(f"k{i}") is not None for i in range(150))
@@ -0,0 +1,68 @@
+# tests/test_verify_server.py
+import io
+import json
+import shlex
+import socket
+
+from qednet.cli.main import main
+from qednet.io.lean_pool import LeanPool
+from qednet.io.verify_server import VerificationClient, VerificationServer, parse_address
+
+
+def test_parse_address():
+    assert parse_address("127.0.0.1:8765") == ("127.0.0.1", 8765)
+    assert parse_address(":9") == ("127.0.0.1", 9)
+    assert parse_address("/tmp/q.sock") == "/tmp/q.sock"
+
+
+def test_server_pipelines_and_coalesces(fake_repl_cmd, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_LEAN_ELAB_SEC", "0.3")
+    sock = str(tmp_path / "q.sock")
+    with LeanPool(size=2, repl_cmd=fake_repl_cmd) as pool:
+        server = VerificationServer(pool, sock).start()
+        try:
+            a, b = VerificationClient(sock), VerificationClient(sock)
+            futs = [a.submit("True", "trivial"), a.submit("True", "FAIL"), b.submit(" True ", "trivial")]
+            assert [f.result().valid for f in futs] == [True, False, True]
+            assert b.fetch_goal("Nat.add_comm").new_state.pp_goal == "∀ (n m : ℕ), n + m = m + n"
+            stats = a.stats()
+            assert stats["requests"] == 4 and stats["coalesced"] == 1
+            a.close()
+            b.close()
+        finally:
+            server.close()
+    assert not (tmp_path / "q.sock").exists()
+
+
+def test_verify_streams_jsonl_in_input_order(fake_repl_cmd, monkeypatch, capsys):
+    lines = [
+        {"id": "a", "goal": "True", "script": "trivial"},
+        {"id": "b", "goal": "True", "script": "FAIL"},
+        "not json",
+        {"goal": "1 = 1", "script": "rfl"},
+    ]
+    text = "\n".join(x if isinstance(x, str) else json.dumps(x) for x in lines) + "\n"
+    monkeypatch.setattr("sys.stdin", io.StringIO(text))
+    assert main(["verify", "--workers", "2", "--repl-cmd", shlex.join(fake_repl_cmd)]) == 0
+    out = [json.loads(l) for l in capsys.readouterr().out.splitlines()]
+    assert [(r["i"], r.get("id"), r["valid"]) for r in out] == [(0, "a", True), (1, "b", False), (2, None, False),
+                                                                 (3, None, True)]
+    assert out[2]["error"].startswith("Bad request") and "stdout" not in out[0]
+
+
+def test_oversized_request_gets_an_error_reply(fake_repl_cmd, tmp_path, monkeypatch):
+    monkeypatch.setattr("qednet.io.verify_server._LINE_LIMIT", 1024)
+    sock_path = str(tmp_path / "q.sock")
+    with LeanPool(size=1, repl_cmd=fake_repl_cmd) as pool:
+        server = VerificationServer(pool, sock_path).start()
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.connect(sock_path)
+                ok = json.dumps({"id": 1, "goal": "True", "script": "trivial"})
+                big = json.dumps({"id": 2, "goal": "True", "script": "simp" + " " * 4096})
+                s.sendall(f"{ok}\n{big}\n".encode())
+                replies = [json.loads(l) for l in s.makefile("rb")]  # until the server closes
+            assert replies[0]["id"] == 1 and replies[0]["result"]["valid"]
+            assert replies[1]["id"] is None and "too long" in replies[1]["error"]
+        finally:
+            server.close()